@@ -0,0 +1,358 @@
+# _buttons.py
+
+import collections
+import glob
+import mmap
+import os
+import threading
+import time
+
+# Bit assigned to each button in a sampled mask. A set bit means "pressed".
+BTN_A = 1 << 0
+BTN_B = 1 << 1
+BTN_C = 1 << 2
+BTN_LEFT = 1 << 3
+BTN_RIGHT = 1 << 4
+BTN_UP = 1 << 5
+BTN_DOWN = 1 << 6
+
+# Input queue defaults
+DEBOUNCE_TIME = 0.03  # seconds, applied per button to press/release edges
+REPEAT_DELAY = 0.35  # seconds a direction must be held before it auto-repeats
+REPEAT_RATE = 10  # auto-repeated presses per second while a direction is held
+POLL_INTERVAL = 0.005  # seconds between background samples
+QUEUE_LENGTH = 32  # Buffered events before the oldest are dropped
+EDGE_WAIT_TIMEOUT = 1.0  # seconds an edge wait blocks before the poller checks whether it should stop
+
+BUTTON_BITS = {
+    'A': BTN_A,
+    'B': BTN_B,
+    'C': BTN_C,
+    'left': BTN_LEFT,
+    'right': BTN_RIGHT,
+    'up': BTN_UP,
+    'down': BTN_DOWN
+}
+
+
+class ButtonEvent(str):
+    """
+    A queued press: the button name (compares equal to 'A', 'left', ...) plus
+    the time of the press edge, for latency measurements.
+    """
+    __slots__ = ('time',)
+
+    def __new__(cls, name, time):
+        event = super().__new__(cls, name)
+        event.time = time
+        return event
+
+
+class ButtonReader:
+    """
+    Samples every button with one bulk read and returns a bitmask of pressed buttons.
+
+    Backends are tried in order:
+      1. 'gpiomem' - a single read of the GPLEV0 level register through /dev/gpiomem
+         (BCM2835/6/7 and BCM2711 based Pis).
+      2. 'gpiod'   - one line request covering every offset, read with get_values().
+         The DigitalInOut pins are released first, as they hold the same lines.
+      3. 'digitalio' - the old per-pin DigitalInOut reads, used when nothing else works.
+
+    With libgpiod 2.x the request also reports edges, so wait_edge() can block
+    until a button changes (can_wait is True). gpiomem, libgpiod 1.x and
+    digitalio have no edge events here; they can only be polled.
+    """
+    GPIOMEM_PATH = "/dev/gpiomem"
+    GPIOCHIP_PATTERN = "/dev/gpiochip*"
+    # Labels of the chip driving the 40-pin header; on a Pi 5 it is the RP1, not always gpiochip0
+    GPIOCHIP_LABELS = ("pinctrl-rp1", "pinctrl-bcm2711", "pinctrl-bcm2835")
+    DEVICE_TREE_COMPATIBLE = "/proc/device-tree/compatible"
+    SUPPORTED_SOCS = (b'brcm,bcm2835', b'brcm,bcm2836', b'brcm,bcm2837', b'brcm,bcm2711')
+    GPLEV0_OFFSET = 0x34  # GPIO pin level register for pins 0-31
+    CONSUMER = "modulo2048"
+
+    def __init__(self, pins, buttons=None, make_buttons=None):
+        """
+        Args:
+            pins (dict): Button name -> BCM GPIO number (e.g. {'A': 5, ...}).
+            buttons (dict): Button name -> DigitalInOut, used by the fallback backend.
+            make_buttons (callable): Returns new DigitalInOut buttons, to claim the pins
+                again if the gpiod backend released them and then failed.
+        """
+        self.pins = pins
+        self.buttons = buttons
+        self.make_buttons = make_buttons
+        self.backend = None
+        self._read = None
+        self._mem = None
+        self._regs = None
+        self._request = None
+        self.can_wait = False  # wait_edge() blocks on edge events (libgpiod 2.x only)
+        # (pin bit in the level register, button bit in the mask)
+        self._bit_map = [(1 << pin, BUTTON_BITS[name]) for name, pin in pins.items()]
+        # (index in get_values(), button bit in the mask)
+        self._index_map = [(index, BUTTON_BITS[name]) for index, name in enumerate(pins)]
+
+        for opener in (self._open_gpiomem, self._open_gpiod):
+            try:
+                if opener():
+                    break
+            except Exception as e:
+                print(f"Button backend {opener.__name__} unavailable:", e)
+        if self.backend is None:
+            self.backend = 'digitalio'
+            self._read = self._read_digitalio
+        print(f"Button reader using '{self.backend}' backend.")
+
+    def _open_gpiomem(self):
+        if max(self.pins.values()) > 31 or not os.path.exists(self.GPIOMEM_PATH):
+            return False
+        with open(self.DEVICE_TREE_COMPATIBLE, 'rb') as f:
+            compatible = f.read()
+        if not any(soc in compatible for soc in self.SUPPORTED_SOCS):
+            return False
+        fd = os.open(self.GPIOMEM_PATH, os.O_RDONLY | os.O_SYNC)
+        try:
+            self._mem = mmap.mmap(fd, mmap.PAGESIZE, mmap.MAP_SHARED, mmap.PROT_READ)
+        finally:
+            os.close(fd)
+        # 32-bit view so the register is fetched with a single aligned load
+        self._regs = memoryview(self._mem).cast('I')
+        self._gplev0 = self.GPLEV0_OFFSET // 4
+        self.backend = 'gpiomem'
+        self._read = self._read_gpiomem
+        return True
+
+    def _find_gpiochip(self, gpiod):
+        """Path of the gpiochip whose label is one of GPIOCHIP_LABELS."""
+        for path in sorted(glob.glob(self.GPIOCHIP_PATTERN)):
+            try:
+                if hasattr(gpiod, 'request_lines'):
+                    with gpiod.Chip(path) as chip:
+                        label = chip.get_info().label
+                else:
+                    chip = gpiod.Chip(path)
+                    label = chip.label()
+                    chip.close()
+            except OSError:
+                continue
+            if label in self.GPIOCHIP_LABELS:
+                return path
+        raise OSError(f"No GPIO chip labelled {' or '.join(self.GPIOCHIP_LABELS)}.")
+
+    def _open_gpiod(self):
+        import gpiod
+        offsets = list(self.pins.values())
+        chip_path = self._find_gpiochip(gpiod)
+        # The DigitalInOut pins hold these lines; the request fails with EBUSY until they are released
+        for button in (self.buttons or {}).values():
+            button.deinit()
+        try:
+            if hasattr(gpiod, 'request_lines'):
+                # libgpiod 2.x
+                from gpiod.line import Direction, Bias, Edge, Value
+                self._request = gpiod.request_lines(
+                    chip_path,
+                    consumer=self.CONSUMER,
+                    config={tuple(offsets): gpiod.LineSettings(direction=Direction.INPUT, bias=Bias.PULL_UP,
+                                                               edge_detection=Edge.BOTH)}
+                )
+                self._offsets = offsets
+                self._inactive = Value.INACTIVE
+                self._read = self._read_gpiod_v2
+                self.can_wait = True
+            else:
+                # libgpiod 1.x
+                chip = gpiod.Chip(chip_path)
+                self._request = chip.get_lines(offsets)
+                self._request.request(
+                    consumer=self.CONSUMER,
+                    type=gpiod.LINE_REQ_DIR_IN,
+                    flags=getattr(gpiod, 'LINE_REQ_FLAG_BIAS_PULL_UP', 0)
+                )
+                self._read = self._read_gpiod_v1
+        except Exception:
+            if self.buttons and self.make_buttons is not None:
+                self.buttons = self.make_buttons()  # Claim the pins again for the digitalio backend
+            raise
+        self.backend = 'gpiod'
+        return True
+
+    def read_mask(self):
+        """Returns a bitmask of the currently pressed buttons (see BUTTON_BITS)."""
+        return self._read()
+
+    def wait_edge(self, timeout):
+        """
+        Blocks until a button line changes or timeout seconds pass (libgpiod 2.x).
+
+        Returns:
+            bool: True if there was an edge. The edges are discarded; read_mask()
+            gives the levels.
+        """
+        if not self._request.wait_edge_events(timeout):
+            return False
+        self._request.read_edge_events()
+        return True
+
+    def _read_gpiomem(self):
+        levels = self._regs[self._gplev0]
+        mask = 0
+        for pin_bit, button_bit in self._bit_map:
+            if not levels & pin_bit:  # Buttons pull the line low when pressed
+                mask |= button_bit
+        return mask
+
+    def _read_gpiod_v2(self):
+        values = self._request.get_values(self._offsets)
+        mask = 0
+        for index, button_bit in self._index_map:
+            if values[index] == self._inactive:
+                mask |= button_bit
+        return mask
+
+    def _read_gpiod_v1(self):
+        values = self._request.get_values()
+        mask = 0
+        for index, button_bit in self._index_map:
+            if not values[index]:
+                mask |= button_bit
+        return mask
+
+    def _read_digitalio(self):
+        mask = 0
+        for name, button in self.buttons.items():
+            if not button.value:
+                mask |= BUTTON_BITS[name]
+        return mask
+
+    def close(self):
+        """Releases the register mapping or line request."""
+        if self._regs is not None:
+            self._regs.release()
+            self._regs = None
+        if self._mem is not None:
+            self._mem.close()
+            self._mem = None
+        if self._request is not None:
+            self._request.release()
+            self._request = None
+
+
+class InputQueue:
+    """
+    Buffers button presses in the background so presses made while the game is
+    rendering are not lost.
+
+    A poller thread samples the ButtonReader mask, turns press edges into events
+    (debounced per button), and auto-repeats held buttons listed in repeat_buttons
+    after repeat_delay seconds at repeat_rate events per second.
+
+    Several queues may share one threading.Condition so a single loop can wait
+    on all of them (see server.py).
+    """
+    def __init__(self, reader, debounce_time=DEBOUNCE_TIME, repeat_delay=REPEAT_DELAY, repeat_rate=REPEAT_RATE,
+                 repeat_buttons=('left', 'right', 'up', 'down'), poll_interval=POLL_INTERVAL,
+                 max_length=QUEUE_LENGTH, condition=None):
+        self.reader = reader
+        self.debounce_time = debounce_time
+        self.repeat_delay = repeat_delay
+        self.repeat_interval = 1.0 / repeat_rate if repeat_rate else None
+        self.repeat_buttons = set(repeat_buttons)
+        self.poll_interval = poll_interval
+        self.events = collections.deque(maxlen=max_length)
+        self._condition = condition if condition is not None else threading.Condition()
+        self._stable = 0  # Debounced mask of buttons currently held down
+        self._last_edge = {name: 0.0 for name in BUTTON_BITS}
+        self._next_repeat = {name: 0.0 for name in BUTTON_BITS}
+        self._thread = None
+        self._running = False
+        self.dropped = 0  # Events pushed out of a full queue
+        # Block on the reader's edge events between samples while nothing is held
+        # (set by IdleManager); readers without edge events keep polling
+        self.edge_wait = False
+
+    def start(self):
+        """Starts the background poller thread."""
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="InputQueue", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the background poller thread."""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while self._running:
+            try:
+                self.poll()
+            except Exception as e:
+                print("Error polling buttons:", e)
+            if self.edge_wait and getattr(self.reader, 'can_wait', False) and not self._stable:
+                # Held buttons still need samples for release edges and auto-repeat
+                try:
+                    self.reader.wait_edge(EDGE_WAIT_TIMEOUT)
+                    continue
+                except Exception as e:
+                    print("Error waiting for button edges:", e)
+            time.sleep(self.poll_interval)
+
+    def poll(self, now=None):
+        """Samples the buttons once and queues any new press or repeat events."""
+        if now is None:
+            now = time.time()
+        mask = self.reader.read_mask()
+        changed = mask ^ self._stable
+        new_events = []
+        for name, bit in BUTTON_BITS.items():
+            if changed & bit:
+                # Ignore contact bounce right after the previous edge of this button
+                if now - self._last_edge[name] < self.debounce_time:
+                    continue
+                self._last_edge[name] = now
+                if mask & bit:
+                    self._stable |= bit
+                    self._next_repeat[name] = now + self.repeat_delay
+                    new_events.append(ButtonEvent(name, now))
+                else:
+                    self._stable &= ~bit
+            elif (self._stable & bit and self.repeat_interval
+                  and name in self.repeat_buttons and now >= self._next_repeat[name]):
+                # Schedule from now so a stalled poller does not burst repeats
+                self._next_repeat[name] = now + self.repeat_interval
+                new_events.append(ButtonEvent(name, now))
+        if new_events:
+            with self._condition:
+                overflow = len(self.events) + len(new_events) - self.events.maxlen
+                if overflow > 0:
+                    self.dropped += overflow  # The oldest events fall off the front
+                self.events.extend(new_events)
+                self._condition.notify_all()
+
+    def wait(self, timeout=None):
+        """Blocks until at least one event is queued or the timeout expires."""
+        with self._condition:
+            if not self.events:
+                self._condition.wait(timeout)
+            return bool(self.events)
+
+    def get_events(self, limit=None):
+        """Removes and returns queued events (at most limit of them), oldest first."""
+        with self._condition:
+            if limit is None or limit >= len(self.events):
+                events = list(self.events)
+                self.events.clear()
+            else:
+                events = [self.events.popleft() for _ in range(limit)]
+        return events
+
+    def clear(self):
+        """Discards queued events (e.g. presses made during a blocking message)."""
+        with self._condition:
+            self.events.clear()
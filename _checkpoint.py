@@ -0,0 +1,194 @@
+# _checkpoint.py
+
+import os  # Atomic snapshot replace and fsync
+import struct  # Fixed-layout snapshot and journal records
+import time
+import zlib  # Snapshot checksum
+import numpy as np # Boards are arrays of tile codes
+from _engine import get_engine, DIRECTIONS
+
+CHECKPOINT_DIR = "checkpoints"
+SNAPSHOT_INTERVAL = 64  # Moves journaled before a full snapshot replaces the log
+FSYNC_BATCH = 8  # Journaled moves per fsync
+FSYNC_INTERVAL = 1.0  # seconds an unsynced move may wait (see sync())
+
+NO_SPAWN = 0xFF  # Spawn cell of a move that added no tile
+
+
+class CheckpointJournal:
+    """
+    Crash-resume state for one session, so a restart by systemd lands back in
+    the game that was being played.
+
+    Two files are kept in CHECKPOINT_DIR:
+      <name>.snap - full state (board, score, modulo counter, moves, state),
+                    written to a temp file and renamed into place.
+      <name>.log  - append-only journal of the moves made since that snapshot,
+                    4 bytes per move: direction | modulo counter << 2, spawn cell,
+                    spawn code and a check byte.
+
+    Moves are written straight to the file descriptor, so a crash of the
+    process loses nothing; fsync (for power loss) runs every FSYNC_BATCH moves
+    or FSYNC_INTERVAL seconds. A new snapshot is written every
+    SNAPSHOT_INTERVAL moves and whenever something other than a move changes
+    the game (new game, undo or redo, a password or save slot load, leaving
+    the game screen).
+
+    restore() replays the journal on top of the snapshot through the move
+    tables; a torn record at the end of the journal ends the replay.
+    """
+    SNAPSHOT_MAGIC = b'M2CP'
+    JOURNAL_MAGIC = b'M2JL'
+    VERSION = 1
+    SNAPSHOT_HEADER = struct.Struct('<4sBBxxIIIBd')  # magic, version, size, generation, score, moves, counter, elapsed
+    JOURNAL_HEADER = struct.Struct('<4sI')  # magic, generation of the snapshot it extends
+    RECORD = struct.Struct('<BBBB')
+    STATES = ('MAIN_MENU', 'GAME', 'GAME_OVER', 'PASSWORD_SAVE', 'SLOT_SAVE')  # Anything else is stored as MAIN_MENU
+
+    def __init__(self, name, grid_size=4, directory=CHECKPOINT_DIR, snapshot_interval=SNAPSHOT_INTERVAL,
+                 fsync_batch=FSYNC_BATCH, fsync_interval=FSYNC_INTERVAL):
+        self.engine = get_engine(grid_size)  # Replays journaled moves
+        self.snapshot_interval = snapshot_interval
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        os.makedirs(directory, exist_ok=True)
+        self.snapshot_path = os.path.join(directory, f"{name}.snap")
+        self.journal_path = os.path.join(directory, f"{name}.log")
+        self.generation = 0
+        self._fd = None
+        self._moves = 0  # Moves journaled since the last snapshot
+        self._unsynced = 0
+        self._last_sync = time.time()
+
+    def _check_byte(self, first, cell, code):
+        return (first + cell + code + 0x5A) & 0xFF
+
+    def restore(self):
+        """
+        Loads the latest consistent state.
+
+        Returns:
+            dict: grid, score, moves_since_last_modulo_block, move_count, elapsed and
+            state, or None if there is no usable checkpoint.
+        """
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        size = self.engine.size
+        header_size = self.SNAPSHOT_HEADER.size
+        if len(data) != header_size + size * size + 5:
+            print("Checkpoint snapshot has the wrong size. Ignoring it.")
+            return None
+        crc, = struct.unpack_from('<I', data, len(data) - 4)
+        if zlib.crc32(data[:-4]) != crc:
+            print("Checkpoint snapshot is corrupted. Ignoring it.")
+            return None
+        magic, version, snapshot_size, generation, score, move_count, counter, elapsed = \
+            self.SNAPSHOT_HEADER.unpack_from(data)
+        if magic != self.SNAPSHOT_MAGIC or version != self.VERSION or snapshot_size != size:
+            print("Checkpoint snapshot is for another version or board size. Ignoring it.")
+            return None
+        grid = np.frombuffer(data, dtype=np.uint8, count=size * size, offset=header_size).reshape(size, size).copy()
+        state = self.STATES[data[header_size + size * size]]
+        self.generation = generation
+
+        # Replay the moves journaled after this snapshot
+        replayed = 0
+        try:
+            with open(self.journal_path, 'rb') as f:
+                journal = f.read()
+        except OSError:
+            journal = b''
+        if journal[:self.JOURNAL_HEADER.size] == self.JOURNAL_HEADER.pack(self.JOURNAL_MAGIC, generation):
+            for first, cell, code, check in self.RECORD.iter_unpack(
+                    journal[self.JOURNAL_HEADER.size:][:(len(journal) - self.JOURNAL_HEADER.size) // 4 * 4]):
+                if check != self._check_byte(first, cell, code):
+                    break  # Torn write at the end of the journal
+                grid, changed, move_score = self.engine.move(grid, DIRECTIONS[first & 3])
+                score += move_score
+                if cell != NO_SPAWN:
+                    grid.flat[cell] = code
+                counter = first >> 2
+                move_count += 1
+                replayed += 1
+        self._moves = replayed
+        print(f"Checkpoint restored: snapshot {generation} + {replayed} journaled move(s).")
+        return {
+            'grid': grid,
+            'score': score,
+            'moves_since_last_modulo_block': counter,
+            'move_count': move_count,
+            'elapsed': elapsed,
+            'state': state,
+        }
+
+    def snapshot(self, grid, score, modulo_counter, move_count, elapsed, state):
+        """Writes the full state and starts a new, empty journal."""
+        self.generation = (self.generation + 1) & 0xFFFFFFFF
+        size = self.engine.size
+        data = self.SNAPSHOT_HEADER.pack(self.SNAPSHOT_MAGIC, self.VERSION, size, self.generation,
+                                         score, move_count, modulo_counter, elapsed)
+        data += grid.astype(np.uint8).tobytes()
+        data += bytes([self.STATES.index(state) if state in self.STATES else 0])
+        data += struct.pack('<I', zlib.crc32(data))
+        temp_path = self.snapshot_path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.snapshot_path)
+
+        # The old journal belongs to the previous generation; start a new one
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = os.open(self.journal_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        os.write(self._fd, self.JOURNAL_HEADER.pack(self.JOURNAL_MAGIC, self.generation))
+        self._moves = 0
+        self._unsynced = 0
+        self._last_sync = time.time()
+
+    def log_move(self, direction, spawn_cell, spawn_code, modulo_counter):
+        """
+        Appends one move to the journal.
+
+        Args:
+            direction (str): 'LEFT', 'RIGHT', 'UP' or 'DOWN'.
+            spawn_cell (int): Flat index of the spawned tile, or None.
+            spawn_code (int): Tile code of the spawned tile.
+            modulo_counter (int): moves_since_last_modulo_block after the move.
+
+        Returns:
+            bool: True if the journal is due for a new snapshot.
+        """
+        if self._fd is None:
+            return True  # No snapshot to extend yet
+        first = DIRECTIONS.index(direction) | (min(modulo_counter, 63) << 2)
+        cell = NO_SPAWN if spawn_cell is None else spawn_cell
+        code = 0 if spawn_cell is None else spawn_code
+        os.write(self._fd, self.RECORD.pack(first, cell, code, self._check_byte(first, cell, code)))
+        self._moves += 1
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_batch:
+            self.sync()
+        return self._moves >= self.snapshot_interval
+
+    def sync(self, now=None):
+        """fsyncs journaled moves. With now given, only once fsync_interval has passed."""
+        if self._fd is None or not self._unsynced:
+            return
+        if now is None:
+            now = time.time()
+        elif now - self._last_sync < self.fsync_interval:
+            return
+        os.fsync(self._fd)
+        self._unsynced = 0
+        self._last_sync = now
+
+    def close(self):
+        """fsyncs and closes the journal."""
+        if self._fd is not None:
+            self.sync()
+            os.close(self._fd)
+            self._fd = None
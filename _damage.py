@@ -0,0 +1,112 @@
+# _damage.py
+
+import numpy as np # Frames are (height, width, 3) uint8 arrays
+
+BLOCK_SIZE = 16  # Frames are compared in BLOCK_SIZE x BLOCK_SIZE pixel blocks
+WINDOW_COST = 1024  # Pixels worth of bus time one extra window costs (commands, ioctl, Python)
+MAX_WINDOWS = 16  # More changed rectangles than this are sent as their bounding box
+
+
+class DamageTracker:
+    """
+    Finds the parts of the screen that changed since the last frame sent to a
+    display, so only those are transferred.
+
+    The last frame sent is kept as an array. A new frame is compared with it
+    block by block, changed blocks are joined into rectangles (runs along a
+    block row, then equal runs of neighbouring rows), and rectangles are merged
+    while the extra area sent is cheaper than another window. The result is
+    independent of what drew the frame, so every screen benefits.
+    """
+    def __init__(self, width, height, block=BLOCK_SIZE, window_cost=WINDOW_COST, max_windows=MAX_WINDOWS):
+        self.width = width
+        self.height = height
+        self.block = block
+        self.window_cost = window_cost
+        self.max_windows = max_windows
+        self.rows = -(-height // block)
+        self.columns = -(-width // block)
+        self.shown = None  # Last frame sent, or None when the display content is unknown
+        self.frames = 0
+        self.pixels_sent = 0
+
+    def reset(self):
+        """Forgets the display content; the next frame is sent whole."""
+        self.shown = None
+
+    def dirty_blocks(self, frame):
+        """Returns a (rows, columns) bool array of the blocks that differ from the last frame sent."""
+        changed = (frame != self.shown).any(axis=2)
+        padded = np.zeros((self.rows * self.block, self.columns * self.block), dtype=bool)
+        padded[:self.height, :self.width] = changed
+        return padded.reshape(self.rows, self.block, self.columns, self.block).any(axis=(1, 3))
+
+    def damage(self, frame):
+        """
+        Records frame as sent and returns what has to be sent for it.
+
+        Returns:
+            list: (x0, y0, x1, y1) rectangles in pixels, end exclusive; empty if nothing changed.
+        """
+        self.frames += 1
+        if self.shown is None:
+            self.shown = np.array(frame)
+            self.pixels_sent += self.width * self.height
+            return [(0, 0, self.width, self.height)]
+        rectangles = []
+        for row0, row1, column0, column1 in self._merge(self._block_rectangles(self.dirty_blocks(frame))):
+            box = (column0 * self.block, row0 * self.block,
+                   min(column1 * self.block, self.width), min(row1 * self.block, self.height))
+            self.shown[box[1]:box[3], box[0]:box[2]] = frame[box[1]:box[3], box[0]:box[2]]
+            self.pixels_sent += (box[2] - box[0]) * (box[3] - box[1])
+            rectangles.append(box)
+        return rectangles
+
+    @staticmethod
+    def _block_rectangles(dirty):
+        """Covers the dirty blocks with (row0, row1, column0, column1) rectangles, ends exclusive."""
+        rectangles = []
+        open_runs = {}  # (column0, column1) -> index of the rectangle ending at the previous row
+        for row in range(dirty.shape[0]):
+            padded = np.concatenate(([False], dirty[row], [False]))
+            edges = np.flatnonzero(padded[1:] != padded[:-1])
+            runs = {}
+            for column0, column1 in zip(edges[::2], edges[1::2]):
+                span = (int(column0), int(column1))
+                index = open_runs.get(span)
+                if index is not None:
+                    rectangles[index][1] = row + 1  # Extend the same span down one row
+                else:
+                    index = len(rectangles)
+                    rectangles.append([row, row + 1, span[0], span[1]])
+                runs[span] = index
+            open_runs = runs
+        return rectangles
+
+    def _merge(self, rectangles):
+        """Merges rectangles while the wasted area is cheaper than the window it saves."""
+        if len(rectangles) > self.max_windows * 4:
+            rectangles = [self._union(rectangles)]
+        area = lambda r: (r[1] - r[0]) * (r[3] - r[2]) * self.block * self.block
+        merged = True
+        while merged and len(rectangles) > 1:
+            merged = False
+            best = None
+            for i in range(len(rectangles)):
+                for j in range(i + 1, len(rectangles)):
+                    union = self._union((rectangles[i], rectangles[j]))
+                    waste = area(union) - area(rectangles[i]) - area(rectangles[j])
+                    if waste <= self.window_cost and (best is None or waste < best[0]):
+                        best = (waste, i, j, union)
+            if best is not None:
+                _, i, j, union = best
+                rectangles = [r for k, r in enumerate(rectangles) if k not in (i, j)] + [union]
+                merged = True
+        if len(rectangles) > self.max_windows:
+            rectangles = [self._union(rectangles)]
+        return rectangles
+
+    @staticmethod
+    def _union(rectangles):
+        return [min(r[0] for r in rectangles), max(r[1] for r in rectangles),
+                min(r[2] for r in rectangles), max(r[3] for r in rectangles)]
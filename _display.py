@@ -0,0 +1,279 @@
+# _display.py
+
+import math
+import time
+import numpy as np # Frames are converted to RGB565 in one pass
+
+SPI_BAUDRATE = 24000000  # The Pi divides its core clock: 41.7 and 62.5 MHz are common fast settings
+SPIDEV_BUFSIZ_PATH = "/sys/module/spidev/parameters/bufsiz"
+DEFAULT_BUFSIZ = 4096  # spidev's default; raise it with spidev.bufsiz=65536 on the kernel command line
+
+# ST7789 commands
+SWRESET = 0x01
+SLPOUT = 0x11
+NORON = 0x13
+INVON = 0x21
+DISPON = 0x29
+CASET = 0x2A
+RASET = 0x2B
+RAMWR = 0x2C
+MADCTL = 0x36
+COLMOD = 0x3A
+
+# Memory access control: row/column exchange (MV) and mirroring (MX, MY)
+MADCTL_MY = 0x80
+MADCTL_MX = 0x40
+MADCTL_MV = 0x20
+MADCTL_TURN = {0: 0, 90: MADCTL_MX | MADCTL_MV, 180: MADCTL_MX | MADCTL_MY, 270: MADCTL_MY | MADCTL_MV}  # Clockwise
+# adafruit_rgb_display's ST7789 sets MX|MY (a half turn) at init and turns every image counter-clockwise
+# by its rotation in software. The same picture, done by the controller alone:
+ADAFRUIT_MADCTL_TURN = 180
+MADCTL_ROTATION = {rotation: MADCTL_TURN[(ADAFRUIT_MADCTL_TURN - rotation) % 360] for rotation in MADCTL_TURN}
+
+CONTROLLER_WIDTH = 240  # ST7789 frame memory is 240 columns x 320 rows
+CONTROLLER_HEIGHT = 320
+
+
+def to_rgb565(pixels):
+    """Converts an (h, w, 3) uint8 array to big-endian RGB565 bytes, as the panel reads them."""
+    pixels = np.asarray(pixels, dtype=np.uint16)
+    packed = ((pixels[..., 0] & 0xF8) << 8) | ((pixels[..., 1] & 0xFC) << 3) | (pixels[..., 2] >> 3)
+    return packed.astype('>u2').tobytes()
+
+
+def panel_origin(box, width, height, rotation):
+    """
+    Where a window of the screen lands in panel coordinates when a driver
+    rotates images itself (adafruit_rgb_display's image() turns each image
+    counter-clockwise by rotation but leaves its x, y as given).
+
+    Args:
+        box (tuple): (x0, y0, x1, y1) on the screen, end exclusive.
+        width, height: Screen size in pixels.
+
+    Returns:
+        tuple: (x, y) to pass to image() with the cropped window.
+    """
+    x0, y0, x1, y1 = box
+    if rotation == 90:
+        return y0, width - x1
+    if rotation == 180:
+        return width - x1, height - y1
+    if rotation == 270:
+        return height - y1, x0
+    return x0, y0
+
+
+def from_rgb565(data, width, height):
+    """Expands big-endian RGB565 bytes back to an (h, w, 3) uint8 array (the low bits are zero)."""
+    packed = np.frombuffer(data, dtype='>u2').reshape(height, width)
+    pixels = np.empty((height, width, 3), dtype=np.uint8)
+    pixels[..., 0] = (packed >> 8) & 0xF8
+    pixels[..., 1] = (packed >> 3) & 0xFC
+    pixels[..., 2] = (packed << 3) & 0xF8
+    return pixels
+
+
+class SpidevBus:
+    """
+    A /dev/spidevB.D device written with writebytes2, which hands the whole
+    buffer to the driver in as few ioctls as spidev's bufsiz allows (one per
+    bufsiz bytes) instead of one Python call per small chunk.
+    """
+    backend = 'spidev'
+
+    def __init__(self, bus=0, device=0, baudrate=SPI_BAUDRATE):
+        import spidev
+        self.spi = spidev.SpiDev()
+        self.spi.open(bus, device)
+        self.spi.mode = 0
+        self.spi.max_speed_hz = baudrate
+        self.baudrate = baudrate
+        try:
+            with open(SPIDEV_BUFSIZ_PATH) as f:
+                self.bufsiz = int(f.read())
+        except (OSError, ValueError):
+            self.bufsiz = DEFAULT_BUFSIZ
+        self.transfers = 0
+        self.bytes_sent = 0
+        print(f"SPI bus {bus}.{device} at {baudrate / 1e6:g} MHz, {self.bufsiz} bytes per transfer.")
+
+    def write(self, data):
+        self.spi.writebytes2(data)
+        self.transfers += math.ceil(len(data) / self.bufsiz)
+        self.bytes_sent += len(data)
+
+    def close(self):
+        self.spi.close()
+
+
+class FakePin:
+    """Stand-in for a DigitalInOut output pin."""
+    def __init__(self):
+        self.value = True
+
+    def switch_to_output(self, value=True):
+        self.value = value
+
+
+class FakePanel:
+    """
+    SPI bus backend that decodes the ST7789 command stream into a model of the
+    controller's frame memory, for checking the transport without hardware.
+    The panel glass shows memory rows 0..height-1; its dc pin tells commands
+    from data, like the real one.
+
+    Bus time is modelled from the clock: bytes * 8 / baudrate, plus a fixed
+    cost per transfer.
+    """
+    backend = 'fake'
+    TRANSFER_OVERHEAD = 20e-6  # seconds of driver work per ioctl
+
+    def __init__(self, width=240, height=240, baudrate=SPI_BAUDRATE, bufsiz=65536):
+        self.width = width
+        self.height = height
+        self.baudrate = baudrate
+        self.bufsiz = bufsiz
+        self.dc = FakePin()
+        self.reset = FakePin()
+        self.memory = np.zeros((CONTROLLER_HEIGHT, CONTROLLER_WIDTH, 3), dtype=np.uint8)
+        self.madctl = 0
+        self.columns = (0, CONTROLLER_WIDTH - 1)
+        self.rows = (0, CONTROLLER_HEIGHT - 1)
+        self._command = None
+        self._params = b''
+        self.transfers = 0
+        self.bytes_sent = 0
+        self.bus_time = 0.0
+
+    def write(self, data):
+        data = bytes(data)
+        self.transfers += math.ceil(len(data) / self.bufsiz)
+        self.bytes_sent += len(data)
+        self.bus_time += len(data) * 8 / self.baudrate + math.ceil(len(data) / self.bufsiz) * self.TRANSFER_OVERHEAD
+        if not self.dc.value:
+            self._command = data[-1]
+            self._params = b''
+            return
+        if self._command == RAMWR:
+            self._write_memory(data)
+            return
+        self._params += data
+        if self._command == MADCTL:
+            self.madctl = self._params[0]
+        elif self._command in (CASET, RASET) and len(self._params) >= 4:
+            start = (self._params[0] << 8) | self._params[1]
+            end = (self._params[2] << 8) | self._params[3]
+            if self._command == CASET:
+                self.columns = (start, end)
+            else:
+                self.rows = (start, end)
+
+    def _write_memory(self, data):
+        (x0, x1), (y0, y1) = self.columns, self.rows
+        pixels = from_rgb565(data, x1 - x0 + 1, y1 - y0 + 1)
+        rows, cols = np.mgrid[y0:y1 + 1, x0:x1 + 1]
+        if self.madctl & MADCTL_MV:
+            rows, cols = cols, rows
+        if self.madctl & MADCTL_MX:
+            cols = CONTROLLER_WIDTH - 1 - cols
+        if self.madctl & MADCTL_MY:
+            rows = CONTROLLER_HEIGHT - 1 - rows
+        self.memory[rows, cols] = pixels
+
+    def glass(self):
+        """Returns what the panel shows, as an (h, w, 3) array in frame memory order."""
+        return self.memory[:self.height, :self.width].copy()
+
+    def close(self):
+        pass
+
+
+class ST7789:
+    """
+    ST7789 driver over a raw SPI bus (SpidevBus or FakePanel).
+
+    Every window is sent as CASET/RASET/RAMWR followed by the whole RGB565
+    buffer in one bus write. Rotation is done by the controller (MADCTL), so
+    frames are not rotated in software, and the panel shows the same picture
+    as with the adafruit_rgb_display driver at the same rotation.
+
+    x_offset/y_offset are the adafruit driver's offsets (y_offset=80 for a
+    240x240 panel at any rotation); they are converted to the window offsets
+    of the MADCTL setting in use.
+
+    image() accepts the same arguments as the adafruit_rgb_display driver, so
+    sessions work with either.
+    """
+    def __init__(self, bus, dc, reset=None, width=240, height=240, rotation=180, x_offset=0, y_offset=80,
+                 invert=True):
+        if rotation not in MADCTL_ROTATION:
+            raise ValueError("Rotation must be 0, 90, 180 or 270.")
+        self.bus = bus
+        self.dc = dc
+        self.reset = reset
+        self.width = width
+        self.height = height
+        self.rotation = rotation
+        madctl = MADCTL_ROTATION[rotation]
+        # The adafruit offsets count from the far edges of frame memory (it mirrors both axes)
+        row_offset = y_offset if madctl & MADCTL_MY else CONTROLLER_HEIGHT - height - y_offset
+        column_offset = x_offset if madctl & MADCTL_MX else CONTROLLER_WIDTH - width - x_offset
+        if madctl & MADCTL_MV:
+            self.x_offset, self.y_offset = row_offset, column_offset  # Screen x runs along memory rows
+        else:
+            self.x_offset, self.y_offset = column_offset, row_offset
+        self.frames = 0
+        self.dc.switch_to_output(value=True)
+        if self.reset is not None:
+            self.reset.switch_to_output(value=True)
+            self.reset.value = False
+            time.sleep(0.01)
+            self.reset.value = True
+            time.sleep(0.12)
+        self._command(SWRESET)
+        time.sleep(0.15)
+        self._command(SLPOUT)
+        time.sleep(0.12)
+        self._command(COLMOD, b'\x55')  # 16 bits per pixel
+        self._command(MADCTL, bytes([madctl]))
+        if invert:
+            self._command(INVON)  # IPS panels show true colours inverted
+        self._command(NORON)
+        self._command(DISPON)
+
+    def _command(self, command, data=None):
+        self.dc.value = False
+        self.bus.write(bytes([command]))
+        if data:
+            self.dc.value = True
+            self.bus.write(data)
+        self.dc.value = True
+
+    def set_window(self, x0, y0, x1, y1):
+        """Selects the frame memory rectangle (inclusive, screen coordinates) the next RAMWR fills."""
+        x0 += self.x_offset
+        x1 += self.x_offset
+        y0 += self.y_offset
+        y1 += self.y_offset
+        self._command(CASET, bytes([x0 >> 8, x0 & 0xFF, x1 >> 8, x1 & 0xFF]))
+        self._command(RASET, bytes([y0 >> 8, y0 & 0xFF, y1 >> 8, y1 & 0xFF]))
+
+    def write_pixels(self, x, y, pixels):
+        """Sends an (h, w, 3) uint8 array to the window at (x, y)."""
+        height, width = pixels.shape[:2]
+        if x < 0 or y < 0 or x + width > self.width or y + height > self.height:
+            raise ValueError(f"Window {width}x{height} at ({x}, {y}) is outside the display.")
+        self.set_window(x, y, x + width - 1, y + height - 1)
+        self._command(RAMWR)
+        self.bus.write(to_rgb565(pixels))
+        self.frames += 1
+
+    def image(self, image, rotation=None, x=0, y=0):
+        """Sends a PIL image (the whole screen or a window of it) to the display."""
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        self.write_pixels(x, y, np.asarray(image))
+
+    def close(self):
+        self.bus.close()
@@ -0,0 +1,333 @@
+# _engine.py
+
+import hashlib  # Cache file names keyed by the rules
+import os  # For the table cache directory
+import numpy as np # For the lookup tables
+from _pass import BoardEncoder  # Tile codes shared with passwords
+from _rules import Rules  # Game variant the tables are compiled from
+
+TABLE_CACHE_DIR = "tables"
+FULL_TABLE_MAX_ROWS = 17 ** 5  # Larger boards fill their row table lazily instead
+BUILD_CHUNK_ROWS = 1 << 17  # Rows simulated per vectorised step while building tables
+
+DIRECTIONS = ('LEFT', 'RIGHT', 'UP', 'DOWN')
+MOVE_BITS = {direction: 1 << index for index, direction in enumerate(DIRECTIONS)}  # Bits of a legal-move mask
+
+
+class BoardEngine:
+    """
+    Table-driven move engine for an NxN Modulo 2048 board.
+
+    A board is an (N, N) uint8 NumPy array of tile codes, the indices into
+    BoardEncoder.TILE_VALUES (0 = empty). Each row is identified by its base-17
+    number, and a move is one table lookup per row:
+
+        left_rows[row]   -> the row after sliding left
+        left_score[row]  -> points scored by the merges in that slide
+        left_events[row] -> modulo merges in that slide, plus 16 * the ones that cleared both tiles
+
+    The right-slide tables are derived by reversing rows. UP and DOWN use the
+    same tables on the transposed board. row_moves[row] has bit 0 set if the row
+    changes when slid left and bit 1 if it changes when slid right; OR-ing it
+    over the rows and columns gives the legal-move mask (see legal_moves).
+    Tables are built with vectorised NumPy
+    passes that follow the rules of merge_tiles, then cached on disk, so only the
+    first start on a new size pays for them. Sizes with more than
+    FULL_TABLE_MAX_ROWS possible rows (6x6) fill a dict as rows are seen.
+
+    Everything variable about the game comes from a Rules object and is
+    compiled here: the merge table (and through it the row tables), the win
+    tile code and the spawn tables used by spawn_code(). The table cache is
+    keyed by rules_hash(), so a rules file that was seen before costs nothing.
+    """
+    def __init__(self, size=4, encoder=None, cache_dir=TABLE_CACHE_DIR, rules=None):
+        self.size = size
+        self.encoder = encoder or BoardEncoder()
+        self.base = self.encoder.MAX_TILE_INDEX + 1
+        self.cache_dir = cache_dir
+        self.rules = rules or Rules()
+
+        tiles = self.encoder.TILE_VALUES
+        self.code_values = np.array([value for value, _ in tiles], dtype=np.int32)
+        self.code_is_normal = np.array([tile_type == 'normal' for _, tile_type in tiles])
+        self.code_scores = self.code_values * self.code_is_normal  # Points for a merge result
+        self.win_code = self._code(self.rules.win_tile, 'normal', "win_tile")
+        self.modulo_interval = self.rules.modulo_interval
+        self.normal_spawn_codes, self.normal_spawn_cum = self._spawn_table(self.rules.normal_spawn, 'normal')
+        self.modulo_spawn_codes, self.modulo_spawn_cum = self._spawn_table(self.rules.modulo_spawn, 'modulo')
+        self.merge_table = self._build_merge_table()
+
+        # Row number = sum(code[c] * base ** (size - 1 - c)), same digit order as BoardEncoder
+        self.powers = self.base ** np.arange(size - 1, -1, -1, dtype=np.int64)
+        self.row_count = self.base ** size
+        self.full_tables = self.row_count <= FULL_TABLE_MAX_ROWS
+        if self.full_tables:
+            self._load_or_build_tables()
+        else:
+            # row number -> (left row number, left score, right row number, right score, left events, right events)
+            self._row_cache = {}
+
+    def _code(self, value, tile_type, setting):
+        code = self.encoder.TILE_INDEX.get((value, tile_type))
+        if code is None:
+            raise ValueError(f"Rules '{self.rules.name}': {setting} {value} is not a {tile_type} tile.")
+        return code
+
+    def _spawn_table(self, weights, tile_type):
+        """(tile codes, cumulative probabilities) for drawing a spawn with one uniform number."""
+        codes = np.array([self._code(value, tile_type, f"{tile_type} spawn") for value in sorted(weights)],
+                         dtype=np.uint8)
+        cumulative = np.cumsum([weights[value] for value in sorted(weights)], dtype=np.float64)
+        return codes, cumulative / cumulative[-1]
+
+    def spawn_code(self, uniform, modulo):
+        """
+        Returns the tile code to spawn for a uniform random number in [0, 1):
+        a modulo block if modulo is True, a normal tile otherwise.
+        """
+        if modulo:
+            codes, cumulative = self.modulo_spawn_codes, self.modulo_spawn_cum
+        else:
+            codes, cumulative = self.normal_spawn_codes, self.normal_spawn_cum
+        return int(codes[min(int(np.searchsorted(cumulative, uniform, side='right')), len(codes) - 1)])
+
+    def _build_merge_table(self):
+        """merge_table[a, b] = code of merging tile a into tile b, or -1 if they do not merge."""
+        tiles = self.encoder.TILE_VALUES
+        table = np.full((self.base, self.base), -1, dtype=np.int16)
+        for a, (value_a, type_a) in enumerate(tiles):
+            for b, (value_b, type_b) in enumerate(tiles):
+                if type_a == 'normal' and type_b == 'normal':
+                    if value_a == value_b:
+                        # 2048 + 2048 has no code; unreachable because 2048 ends the game
+                        table[a, b] = self.encoder.TILE_INDEX.get((value_a * 2, 'normal'), -1)
+                elif {type_a, type_b} == {'normal', 'modulo'}:
+                    normal_value, modulo_value = (value_a, value_b) if type_a == 'normal' else (value_b, value_a)
+                    result_value = normal_value % modulo_value
+                    table[a, b] = 0 if result_value == 0 else self.encoder.TILE_INDEX[(result_value, 'normal')]
+                elif type_a == 'modulo' and type_b == 'modulo' and value_a == value_b and self.rules.modulo_merges:
+                    table[a, b] = self.encoder.TILE_INDEX.get((value_a * 2, 'modulo'), -1)
+                # Otherwise modulo tiles cannot merge with each other, and empty tiles never merge
+        return table
+
+    def rules_hash(self):
+        """Short hash of everything the tables depend on."""
+        digest = hashlib.sha1()
+        digest.update(repr(self.encoder.TILE_VALUES).encode())
+        digest.update(self.merge_table.tobytes())
+        digest.update(self.rules.hash().encode())
+        return digest.hexdigest()[:12]
+
+    def _compress(self, rows):
+        """Moves the non-empty tiles of each row to the left, keeping their order."""
+        order = np.argsort(rows == 0, axis=1, kind='stable')
+        return np.take_along_axis(rows, order, axis=1)
+
+    def slide_rows_left(self, rows):
+        """
+        Slides a batch of rows left: compress, merge pairs left to right (a merged
+        pair is skipped), compress again.
+
+        Args:
+            rows (np.ndarray): (R, size) tile codes.
+
+        Returns:
+            tuple: ((R, size) slid rows, (R,) scores, (R,) modulo events as in left_events)
+        """
+        rows = self._compress(rows)
+        score = np.zeros(len(rows), dtype=np.int32)
+        events = np.zeros(len(rows), dtype=np.uint8)
+        merged_previous = np.zeros(len(rows), dtype=bool)
+        for i in range(self.size - 1):
+            merged = self.merge_table[rows[:, i], rows[:, i + 1]]
+            merging = ~merged_previous & (merged >= 0)
+            modulo = merging & ~(self.code_is_normal[rows[:, i]] & self.code_is_normal[rows[:, i + 1]])
+            events[modulo] += 1
+            events[modulo & (merged == 0)] += 16
+            results = merged[merging]
+            rows[merging, i] = results
+            rows[merging, i + 1] = 0
+            score[merging] += self.code_scores[results]
+            merged_previous = merging
+        return self._compress(rows), score, events
+
+    def rows_to_numbers(self, rows):
+        return rows.astype(np.int64) @ self.powers
+
+    def numbers_to_rows(self, numbers):
+        return ((np.asarray(numbers, dtype=np.int64)[..., None] // self.powers) % self.base).astype(np.uint8)
+
+    def _table_path(self):
+        return os.path.join(self.cache_dir, f"modulo_{self.size}x{self.size}_{self.rules_hash()}.npz")
+
+    def _load_or_build_tables(self):
+        path = self._table_path()
+        try:
+            with np.load(path) as tables:
+                self.left_rows = tables['left_rows']
+                self.left_score = tables['left_score']
+                self.right_rows = tables['right_rows']
+                self.right_score = tables['right_score']
+                self.left_events = tables['left_events']
+                self.right_events = tables['right_events']
+            print(f"Move tables loaded from {path}.")
+        except (OSError, KeyError, ValueError):
+            print(f"Building move tables for {self.size}x{self.size} ({self.row_count} rows)...")
+            self._build_tables()
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                temp_path = path + ".tmp.npz"
+                np.savez(temp_path, left_rows=self.left_rows, left_score=self.left_score,
+                         right_rows=self.right_rows, right_score=self.right_score,
+                         left_events=self.left_events, right_events=self.right_events)
+                os.replace(temp_path, path)
+                print(f"Move tables cached to {path}.")
+            except OSError as e:
+                print("Could not cache move tables:", e)
+        self.row_codes = self.numbers_to_rows(np.arange(self.row_count))
+        numbers = np.arange(self.row_count)
+        self.row_moves = ((self.left_rows != numbers) | ((self.right_rows != numbers) << 1)).astype(np.uint8)
+
+    def _build_tables(self):
+        self.left_rows = np.empty(self.row_count, dtype=np.int32)
+        self.left_score = np.empty(self.row_count, dtype=np.int32)
+        self.left_events = np.empty(self.row_count, dtype=np.uint8)
+        for start in range(0, self.row_count, BUILD_CHUNK_ROWS):
+            numbers = np.arange(start, min(start + BUILD_CHUNK_ROWS, self.row_count))
+            rows, score, events = self.slide_rows_left(self.numbers_to_rows(numbers))
+            self.left_rows[numbers] = self.rows_to_numbers(rows)
+            self.left_score[numbers] = score
+            self.left_events[numbers] = events
+        # Sliding right is sliding the reversed row left
+        reverse = self.rows_to_numbers(self.numbers_to_rows(np.arange(self.row_count))[:, ::-1])
+        self.right_rows = reverse[self.left_rows[reverse]].astype(np.int32)
+        self.right_score = self.left_score[reverse]
+        self.right_events = self.left_events[reverse]
+
+    def _lookup(self, numbers, right):
+        """Table lookup for a vector of row numbers; returns (new row numbers, scores)."""
+        if self.full_tables:
+            if right:
+                return self.right_rows[numbers], self.right_score[numbers]
+            return self.left_rows[numbers], self.left_score[numbers]
+
+        missing = [number for number in set(numbers.tolist()) if number not in self._row_cache]
+        if missing:
+            rows = self.numbers_to_rows(missing)
+            left_slid, left_score, left_events = self.slide_rows_left(rows.copy())
+            right_slid, right_score, right_events = self.slide_rows_left(rows[:, ::-1].copy())
+            left_numbers = self.rows_to_numbers(left_slid).tolist()
+            right_numbers = self.rows_to_numbers(right_slid[:, ::-1]).tolist()
+            for k, number in enumerate(missing):
+                self._row_cache[number] = (left_numbers[k], int(left_score[k]), right_numbers[k], int(right_score[k]),
+                                           int(left_events[k]), int(right_events[k]))
+        column = 2 if right else 0
+        entries = [self._row_cache[number] for number in numbers.tolist()]
+        return (np.array([entry[column] for entry in entries], dtype=np.int64),
+                np.array([entry[column + 1] for entry in entries], dtype=np.int32))
+
+    def move(self, board, direction):
+        """
+        Applies a move without spawning a tile.
+
+        Args:
+            board (np.ndarray): (size, size) tile codes.
+            direction (str): 'LEFT', 'RIGHT', 'UP' or 'DOWN'.
+
+        Returns:
+            tuple: (new board, changed, points scored)
+        """
+        vertical = direction in ('UP', 'DOWN')
+        lines = board.T if vertical else board
+        numbers = self.rows_to_numbers(lines)
+        new_numbers, scores = self._lookup(numbers, direction in ('RIGHT', 'DOWN'))
+        if self.full_tables:
+            new_lines = self.row_codes[new_numbers]
+        else:
+            new_lines = self.numbers_to_rows(new_numbers)
+        new_board = new_lines.T.copy() if vertical else new_lines
+        return new_board, bool((new_numbers != numbers).any()), int(scores.sum())
+
+    def move_events(self, board, direction):
+        """
+        Modulo merges a move makes (before the spawn), from the same row tables as move().
+
+        Returns:
+            tuple: (merges with a modulo block, of which cleared both tiles)
+        """
+        lines = board.T if direction in ('UP', 'DOWN') else board
+        numbers = self.rows_to_numbers(lines)
+        right = direction in ('RIGHT', 'DOWN')
+        if self.full_tables:
+            events = (self.right_events if right else self.left_events)[numbers]
+        else:
+            self._lookup(numbers, right)  # Fills the row cache
+            events = np.array([self._row_cache[number][5 if right else 4] for number in numbers.tolist()])
+        return int((events & 15).sum()), int((events >> 4).sum())
+
+    def legal_moves(self, board):
+        """
+        Returns a 4-bit mask of the directions that change the board (see MOVE_BITS).
+        0 means no move is left.
+        """
+        rows = self.rows_to_numbers(board)
+        columns = self.rows_to_numbers(board.T)
+        if self.full_tables:
+            horizontal = np.bitwise_or.reduce(self.row_moves[rows])
+            vertical = np.bitwise_or.reduce(self.row_moves[columns])
+            return int(horizontal) | (int(vertical) << 2)
+        mask = 0
+        for numbers, shift in ((rows, 0), (columns, 2)):
+            if (self._lookup(numbers, False)[0] != numbers).any():
+                mask |= 1 << shift
+            if (self._lookup(numbers, True)[0] != numbers).any():
+                mask |= 2 << shift
+        return mask
+
+    def can_merge(self, code_a, code_b):
+        return self.merge_table[code_a, code_b] >= 0
+
+    def empty_board(self):
+        return np.zeros((self.size, self.size), dtype=np.uint8)
+
+    def tile(self, code):
+        """Returns (value, type) for a tile code."""
+        return self.encoder.TILE_VALUES[code]
+
+
+_engines = {}
+_rules = Rules()
+
+def set_rules(rules):
+    """Selects the rules every engine from get_engine() uses (call at startup, before playing)."""
+    global _rules
+    _rules = rules
+
+def get_rules():
+    return _rules
+
+def get_engine(size=4):
+    """Returns the shared engine for a board size and the current rules, building its tables on first use."""
+    key = (size, _rules.hash())
+    if key not in _engines:
+        _engines[key] = BoardEngine(size, rules=_rules)
+    return _engines[key]
+
+def spawn_tile(board, modulo_counter, rng):
+    """
+    Adds a random tile from the spawn tables the way GameSession.add_random_tile does
+    (self-play and the attract loop).
+
+    Returns:
+        int: The modulo counter after the spawn.
+    """
+    engine = get_engine(board.shape[0])
+    empty_cells = np.flatnonzero(board == 0)
+    if not len(empty_cells):
+        return modulo_counter
+    cell = empty_cells[rng.integers(len(empty_cells))]
+    if modulo_counter >= engine.modulo_interval:
+        board.flat[cell] = engine.spawn_code(rng.random(), modulo=True)
+        return 0
+    board.flat[cell] = engine.spawn_code(rng.random(), modulo=False)
+    return modulo_counter
@@ -0,0 +1,43 @@
+# _gamelog.py
+
+import csv
+import gzip  # Logs are compressed; appends add a gzip member, which readers see as one stream
+import os
+import time
+
+GAME_LOG_DIR = "gamelogs"
+GAME_LOG_PATTERN = "games-%Y%m%d.csv.gz"  # One file per day (local time)
+
+
+class GameLog:
+    """
+    Append-only log of every finished game, as gzip-compressed CSV with one
+    file per day, for offline analysis (see analytics.py). The board column
+    is the final board as a password (BoardEncoder), so it stays compact and
+    any grid size fits.
+
+    Leaderboard calls write() from its writer thread with each batch of
+    finished games, so the game loop never waits on the log.
+    """
+    COLUMNS = ('finished_at', 'session', 'grid_size', 'score', 'max_tile', 'moves', 'duration', 'won',
+               'modulo_merges', 'modulo_clears', 'password')
+
+    def __init__(self, directory=GAME_LOG_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, finished_at):
+        return os.path.join(self.directory, time.strftime(GAME_LOG_PATTERN, time.localtime(finished_at)))
+
+    def write(self, games):
+        """Appends games (dicts with the COLUMNS keys) to the file of the day each finished on."""
+        by_path = {}
+        for game in games:
+            by_path.setdefault(self.path_for(game['finished_at']), []).append(game)
+        for path, day_games in by_path.items():
+            new_file = not os.path.exists(path)
+            with gzip.open(path, 'at', newline='') as f:
+                writer = csv.writer(f)
+                if new_file:
+                    writer.writerow(self.COLUMNS)
+                writer.writerows([game.get(column, '') for column in self.COLUMNS] for game in day_games)
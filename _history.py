@@ -0,0 +1,115 @@
+# _history.py
+
+import struct
+import numpy as np # Boards are arrays of tile codes
+
+
+class GameHistory:
+    """
+    Bounded undo/redo history of compact game snapshots (GameSession.undo_move,
+    redo_move and the Game Over rewind).
+
+    Each snapshot is one fixed-size record: the board of tile codes packed into an
+    integer by BoardEncoder.codes_to_number, the score, moves_since_last_modulo_block,
+    and the modulo merges and clears of the move between it and the next state, so
+    undoing or redoing that move can take them off or put them back on the game's
+    counts. A 4x4 record is 16 bytes, so the default 16 KiB cap keeps 1024 moves.
+    Undo records live in a preallocated ring buffer; once it is full, the oldest
+    entries are overwritten. Redo records are only made by undo, so there are
+    never more of them than the ring holds; a new move drops them.
+    """
+    STATE_FORMAT = '<IBBB'  # score, moves_since_last_modulo_block, modulo merges and clears of the move
+
+    def __init__(self, encoder, grid_size=4, max_bytes=16384):
+        self.encoder = encoder
+        self.grid_size = grid_size
+        cells = grid_size * grid_size
+        largest_board = (self.encoder.MAX_TILE_INDEX + 1) ** cells - 1
+        self.board_bytes = (largest_board.bit_length() + 7) // 8
+        self.record_size = self.board_bytes + struct.calcsize(self.STATE_FORMAT)
+        self.capacity = max(1, max_bytes // self.record_size)
+        self._undo = bytearray(self.capacity * self.record_size)
+        self._undo_start = 0  # Ring index of the oldest undo record
+        self._undo_count = 0
+        self._redo = []  # Packed records of the states after undone moves, most recent last
+
+    def _pack(self, board, score, moves_since_last_modulo_block, merges, clears):
+        number = self.encoder.codes_to_number(board.ravel())
+        return number.to_bytes(self.board_bytes, 'little') + struct.pack(
+            self.STATE_FORMAT, score, moves_since_last_modulo_block, merges, clears)
+
+    def _unpack(self, record):
+        number = int.from_bytes(record[:self.board_bytes], 'little')
+        score, moves_since_last_modulo_block, merges, clears = struct.unpack_from(
+            self.STATE_FORMAT, record, self.board_bytes)
+        codes = self.encoder.number_to_codes(number, self.grid_size)
+        board = np.array(codes, dtype=np.uint8).reshape(self.grid_size, self.grid_size)
+        return board, score, moves_since_last_modulo_block, merges, clears
+
+    def push(self, board, score, moves_since_last_modulo_block, merges=0, clears=0):
+        """
+        Records the state before a move, and the modulo merges and clears the move made.
+        A new move invalidates the redo history.
+        """
+        self._push(self._pack(board, score, moves_since_last_modulo_block, merges, clears))
+        self._redo.clear()
+
+    def _push(self, record):
+        if self._undo_count < self.capacity:
+            slot = (self._undo_start + self._undo_count) % self.capacity
+            self._undo_count += 1
+        else:
+            # Full: overwrite the oldest entry
+            slot = self._undo_start
+            self._undo_start = (self._undo_start + 1) % self.capacity
+        offset = slot * self.record_size
+        self._undo[offset:offset + self.record_size] = record
+
+    def undo(self, board, score, moves_since_last_modulo_block):
+        """
+        Steps back one move.
+
+        Args:
+            board, score, moves_since_last_modulo_block: The current state, kept for redo.
+
+        Returns:
+            tuple: (board, score, moves_since_last_modulo_block, merges, clears) or None if
+            there is nothing to undo; merges and clears are those of the move undone.
+        """
+        if not self._undo_count:
+            return None
+        self._undo_count -= 1
+        offset = ((self._undo_start + self._undo_count) % self.capacity) * self.record_size
+        record = bytes(self._undo[offset:offset + self.record_size])
+        state = self._unpack(record)
+        self._redo.append(self._pack(board, score, moves_since_last_modulo_block, state[3], state[4]))
+        return state
+
+    def redo(self, board, score, moves_since_last_modulo_block):
+        """
+        Re-applies the last undone move.
+
+        Args:
+            board, score, moves_since_last_modulo_block: The current state, kept for undo.
+
+        Returns:
+            tuple: (board, score, moves_since_last_modulo_block, merges, clears) or None if
+            there is nothing to redo; merges and clears are those of the move redone.
+        """
+        if not self._redo:
+            return None
+        record = self._redo.pop()
+        state = self._unpack(record)
+        self._push(self._pack(board, score, moves_since_last_modulo_block, state[3], state[4]))
+        return state
+
+    def can_undo(self):
+        return self._undo_count > 0
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def clear(self):
+        self._undo_start = 0
+        self._undo_count = 0
+        self._redo.clear()
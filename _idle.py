@@ -0,0 +1,182 @@
+# _idle.py
+
+import time
+import numpy as np # Attract frames are board frame arrays
+from PIL import Image, ImageDraw # The attract banner is drawn once per frame set
+from _engine import get_engine, spawn_tile, DIRECTIONS, MOVE_BITS  # Same spawn rules as the game
+from _session import text_cache, small_font, STATE_MAIN_MENU, STATE_GAME_OVER, STATE_LEADERBOARD, STATE_HOW_TO_PLAY
+
+IDLE_AFTER = 60  # seconds without input before the backlight dims and the attract loop starts
+BACKLIGHT_OFF_AFTER = 600  # seconds without input before the backlight goes off and nothing is drawn
+IDLE_POLL_INTERVAL = 0.05  # seconds between button samples while idle (instead of POLL_INTERVAL)
+OFF_POLL_INTERVAL = 0.2  # seconds between button samples with the backlight off (polling backends; a shorter tap may need a second press)
+DIM_LEVEL = 0.1  # Backlight level while idle (PWM backlights; on/off pins stay on)
+ATTRACT_FPS = 2
+ATTRACT_FRAMES = 48  # Frames in the attract loop (one board each)
+ATTRACT_SEED = 2048
+ATTRACT_TEXT = "Press any button"
+
+ATTRACT_STATES = (STATE_MAIN_MENU, STATE_GAME_OVER, STATE_LEADERBOARD, STATE_HOW_TO_PLAY)  # Screens it may cover
+
+
+def _attract_boards(grid_size, count, seed=ATTRACT_SEED):
+    """A demo game: the move with the best immediate score each turn, restarted when it ends."""
+    engine = get_engine(grid_size)
+    rng = np.random.default_rng(seed)
+    boards = []
+    grid = None
+    while len(boards) < count:
+        if grid is None:
+            grid = engine.empty_board()
+            counter = 0
+            spawn_tile(grid, counter, rng)
+            spawn_tile(grid, counter, rng)
+        boards.append(grid.copy())
+        legal = engine.legal_moves(grid)
+        if not legal:
+            grid = None
+            continue
+        results = [engine.move(grid, direction) for direction in DIRECTIONS if legal & MOVE_BITS[direction]]
+        best = max(score for _, _, score in results)
+        grid = [new_grid for new_grid, _, score in results if score == best][rng.integers(
+            sum(score == best for _, _, score in results))]
+        counter = spawn_tile(grid, counter + 1, rng)
+    return boards
+
+
+_attract_frames = {}
+
+def get_attract_frames(session, count=ATTRACT_FRAMES):
+    """
+    Returns the process-wide attract loop for a session's board geometry: one
+    composed frame per demo board, with the banner drawn in.
+    """
+    key = (session.width, session.height, session.grid_size)
+    if key not in _attract_frames:
+        banner_width, banner_height = text_cache.size(ATTRACT_TEXT, small_font)
+        banner = Image.new("RGB", (session.width, banner_height + 12), (0, 0, 0))
+        text_cache.draw(banner, ((session.width - banner_width) / 2, 6), ATTRACT_TEXT, small_font, (255, 255, 255))
+        banner = np.asarray(banner)
+        banner_y = (session.height - banner.shape[0]) // 2
+        frames = []
+        for board in _attract_boards(session.grid_size, count):
+            frame = session.raster.new_frame()
+            session.raster.compose(frame, board)
+            frame[banner_y:banner_y + banner.shape[0]] = banner
+            frames.append(frame)
+        _attract_frames[key] = frames
+    return _attract_frames[key]
+
+
+class IdleManager:
+    """
+    Power saving for one session when nobody is playing.
+
+    After idle_after seconds without input the backlight is dimmed, the session
+    stops sending frames (GameSession.suspended) and, on menu screens, a low
+    frame rate attract loop of precomputed frames is shown. After
+    backlight_off_after seconds the backlight goes off and the attract loop
+    stops, so the loop blocks on input alone (wait_time() is None).
+
+    While idle the button poller blocks on edge events where the reader has
+    them (InputQueue.edge_wait; libgpiod 2.x). The gpiomem, libgpiod 1.x and
+    digitalio backends still poll, every IDLE_POLL_INTERVAL seconds and every
+    OFF_POLL_INTERVAL seconds once the backlight is off.
+
+    The press that wakes the cabinet only wakes it: the screen that was
+    showing is sent again and the press is not passed to the game.
+    """
+    def __init__(self, session, backlight=None, input_queue=None, idle_after=IDLE_AFTER,
+                 backlight_off_after=BACKLIGHT_OFF_AFTER, attract=True, attract_fps=ATTRACT_FPS,
+                 active_wait=0.05):
+        self.session = session
+        self.backlight = backlight
+        self.input_queue = input_queue
+        self.idle_after = idle_after
+        self.backlight_off_after = backlight_off_after
+        self.attract = attract
+        self.attract_interval = 1.0 / attract_fps
+        self.active_wait = active_wait
+        self.last_input = time.time()
+        self.mode = 'active'  # 'active', 'idle' (dimmed, attract loop) or 'off'
+        self._frames = None
+        self._frame_index = 0
+        self._next_frame = 0
+        self._poll_interval = input_queue.poll_interval if input_queue is not None else None
+
+    def set_backlight(self, level):
+        """Sets a PWM backlight (duty_cycle) to level, or an on/off pin to level > 0."""
+        if self.backlight is None:
+            return
+        try:
+            if hasattr(self.backlight, 'duty_cycle'):
+                self.backlight.duty_cycle = int(level * 0xFFFF)
+            else:
+                self.backlight.value = level > 0
+        except Exception as e:
+            print(f"[{self.session.name}] Error setting backlight:", e)
+
+    def wait_time(self, now=None):
+        """Seconds the loop may block waiting for input, or None to block until a press."""
+        if self.mode == 'active':
+            return self.active_wait
+        if self.mode == 'idle' and self._frames:
+            if now is None:
+                now = time.time()
+            return max(0.0, self._next_frame - now)
+        return None if self.mode == 'off' else max(0.0, self.last_input + self.backlight_off_after - time.time())
+
+    def input(self, events, now=None):
+        """
+        Notes input. Returns the events the session should handle: none if they
+        only woke it up.
+        """
+        if now is None:
+            now = time.time()
+        self.last_input = now
+        if self.mode == 'active':
+            return events
+        self.wake()
+        return []
+
+    def wake(self):
+        print(f"[{self.session.name}] Waking from {self.mode} mode.")
+        self.mode = 'active'
+        self._frames = None
+        if self.input_queue is not None:
+            self.input_queue.poll_interval = self._poll_interval
+            self.input_queue.edge_wait = False
+        self.session.suspended = False
+        self.set_backlight(1.0)
+        self.session.present(self.session.screen_frame)  # The screen that was showing before the attract loop
+        self.session.publish_status()
+
+    def tick(self, now=None):
+        """Enters the idle modes when their time comes and advances the attract loop."""
+        if now is None:
+            now = time.time()
+        quiet = now - self.last_input
+        if self.mode == 'active' and quiet >= self.idle_after:
+            print(f"[{self.session.name}] No input for {quiet:.0f} s. Entering idle mode.")
+            self.mode = 'idle'
+            self.session.suspended = True
+            if self.input_queue is not None:
+                self.input_queue.poll_interval = IDLE_POLL_INTERVAL
+                self.input_queue.edge_wait = True
+            self.set_backlight(DIM_LEVEL)
+            if self.attract and self.session.current_state in ATTRACT_STATES:
+                self._frames = get_attract_frames(self.session)
+                self._frame_index = 0
+                self._next_frame = now
+            self.session.publish_status()
+        if self.mode == 'idle' and quiet >= self.backlight_off_after:
+            print(f"[{self.session.name}] No input for {quiet:.0f} s. Turning the backlight off.")
+            self.mode = 'off'
+            self._frames = None
+            if self.input_queue is not None:
+                self.input_queue.poll_interval = OFF_POLL_INTERVAL
+            self.set_backlight(0)
+        if self.mode == 'idle' and self._frames and now >= self._next_frame:
+            self.session.show_frame(self._frames[self._frame_index])
+            self._frame_index = (self._frame_index + 1) % len(self._frames)
+            self._next_frame = now + self.attract_interval
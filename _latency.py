@@ -0,0 +1,145 @@
+# _latency.py
+
+import time
+import numpy as np # Histogram counts
+
+SUB_BUCKETS = 16  # Buckets per power of two (about 6% resolution)
+MAX_MICROSECONDS = 1 << 24  # Longer samples (about 17 s) land in the last bucket
+WINDOW_SECONDS = 10  # Length of one histogram window
+WINDOWS = 6  # Windows kept for the rolling percentiles (one minute)
+LOG_INTERVAL = 60  # seconds between latency log lines
+
+STAGES = ('queue', 'logic', 'compose', 'spi', 'total')
+PERCENTILES = (50, 95, 99)
+
+
+def _bucket_count():
+    shift = MAX_MICROSECONDS.bit_length() - 5
+    return 2 * SUB_BUCKETS + shift * SUB_BUCKETS
+
+
+class LatencyHistogram:
+    """
+    Fixed-size log-linear (HDR-style) histogram of durations in microseconds,
+    kept as a ring of WINDOWS windows so percentiles cover the last
+    WINDOWS * WINDOW_SECONDS seconds.
+
+    Values below 2 * SUB_BUCKETS us get a bucket each. Above that, every power
+    of two is split into SUB_BUCKETS equal buckets.
+    """
+    BUCKETS = _bucket_count()
+
+    def __init__(self):
+        self.counts = np.zeros((WINDOWS, self.BUCKETS), dtype=np.int64)
+        self.window = 0
+        # Lower bound of every bucket, for reading percentiles back
+        self.bounds = np.array([self._lower_bound(index) for index in range(self.BUCKETS)], dtype=np.int64)
+
+    @staticmethod
+    def bucket(microseconds):
+        value = min(max(int(microseconds), 0), MAX_MICROSECONDS - 1)
+        if value < 2 * SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - 5
+        return 2 * SUB_BUCKETS + (shift - 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+    @staticmethod
+    def _lower_bound(index):
+        if index < 2 * SUB_BUCKETS:
+            return index
+        shift, sub = divmod(index - 2 * SUB_BUCKETS, SUB_BUCKETS)
+        return (SUB_BUCKETS + sub) << (shift + 1)
+
+    def record(self, seconds):
+        self.counts[self.window, self.bucket(seconds * 1e6)] += 1
+
+    def rotate(self):
+        """Starts a new window, dropping the oldest one."""
+        self.window = (self.window + 1) % WINDOWS
+        self.counts[self.window] = 0
+
+    def percentiles(self, percentiles=PERCENTILES):
+        """
+        Returns:
+            tuple: (sample count, [value in milliseconds per percentile]); values are
+            None when there are no samples.
+        """
+        counts = self.counts.sum(axis=0)
+        total = int(counts.sum())
+        if not total:
+            return 0, [None] * len(percentiles)
+        cumulative = np.cumsum(counts)
+        values = []
+        for percentile in percentiles:
+            index = int(np.searchsorted(cumulative, total * percentile / 100.0))
+            values.append(float(self.bounds[min(index, self.BUCKETS - 1)]) / 1000.0)
+        return total, values
+
+
+class LatencyTracker:
+    """
+    Input-to-photon latency of moves, split into stages:
+
+      queue   - button edge (InputQueue) to game logic start
+      logic   - handle_move work for the batch
+      compose - frame composition (BoardRaster.compose in draw_debug_grid, or
+                BoardRaster.paste_tile on a pre-rendered frame)
+      spi     - disp.image, the transfer to the display
+      total   - button edge to the end of the transfer
+
+    begin() opens a measurement, mark() closes a stage and cancel() drops a
+    measurement whose moves did not redraw the board.
+    """
+    def __init__(self, name="main", log_interval=LOG_INTERVAL):
+        self.name = name
+        self.log_interval = log_interval
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+        self._edge = None
+        self._last = None
+        now = time.time()
+        self._next_rotate = now + WINDOW_SECONDS
+        self._next_log = now + log_interval
+
+    def begin(self, edge_time=None):
+        """Starts measuring a move batch whose first press was made at edge_time."""
+        now = time.time()
+        self._edge = edge_time if edge_time is not None else now
+        self._last = now
+        self.histograms['queue'].record(now - self._edge)
+
+    def mark(self, stage):
+        """Ends a stage of the open measurement; 'spi' also ends the measurement."""
+        if self._edge is None:
+            return
+        now = time.time()
+        self.histograms[stage].record(now - self._last)
+        self._last = now
+        if stage == 'spi':
+            self.histograms['total'].record(now - self._edge)
+            self._edge = None
+
+    def cancel(self):
+        self._edge = None
+
+    def report(self):
+        """Returns {stage: (samples, [p50, p95, p99] in milliseconds)}."""
+        return {stage: self.histograms[stage].percentiles() for stage in STAGES}
+
+    def summary(self):
+        parts = []
+        for stage, (samples, values) in self.report().items():
+            if samples:
+                parts.append(f"{stage} " + "/".join(f"{value:.1f}" for value in values))
+        return ", ".join(parts) if parts else "no samples"
+
+    def tick(self, now=None):
+        """Rotates histogram windows and prints the periodic log line."""
+        if now is None:
+            now = time.time()
+        if now >= self._next_rotate:
+            for histogram in self.histograms.values():
+                histogram.rotate()
+            self._next_rotate = now + WINDOW_SECONDS
+        if now >= self._next_log:
+            print(f"[{self.name}] Latency p50/p95/p99 ms: {self.summary()}")
+            self._next_log = now + self.log_interval
@@ -0,0 +1,197 @@
+# _leaderboard.py
+
+import queue  # Hand-off between the game loop and the writer thread
+import sqlite3
+import threading
+import time
+import traceback # For exception tracing
+import sys  # For exception tracing
+
+LEADERBOARD_FILE = "leaderboard.db"
+TOP_N = 10  # Entries kept in memory per session for the menu
+BATCH_SIZE = 32  # Games written per transaction at most
+FLUSH_INTERVAL = 2.0  # seconds a finished game may wait before it is written
+
+
+class Leaderboard:
+    """
+    Local store of every finished game (SQLite, WAL mode).
+
+    record_game() only queues the row and updates an in-memory top-N list, so the
+    game loop never waits on disk I/O. A background writer thread inserts the
+    queued rows in batches. Top-N queries at startup go through the
+    (session, score DESC) index. With a GameLog, each batch is also appended
+    to the compressed game logs.
+
+    A game recorded with final=False can still be taken back: it is written
+    to the database at once, but held out of the game log until finish_game(),
+    and cancel_game() deletes it again (see the Game Over rewind).
+    """
+    COLUMNS = ('finished_at', 'session', 'score', 'max_tile', 'moves', 'duration', 'password', 'won')
+
+    def __init__(self, path=LEADERBOARD_FILE, top_n=TOP_N, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 game_log=None):
+        self.path = path
+        self.game_log = game_log
+        self.top_n = top_n
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = queue.Queue()
+        self._top = {}  # session -> list of game dicts, best first
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="LeaderboardWriter", daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS games ("
+            " id INTEGER PRIMARY KEY,"
+            " finished_at REAL NOT NULL,"
+            " session TEXT NOT NULL,"
+            " score INTEGER NOT NULL,"
+            " max_tile INTEGER NOT NULL,"
+            " moves INTEGER NOT NULL,"
+            " duration REAL NOT NULL,"
+            " password TEXT,"
+            " won INTEGER NOT NULL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS games_session_score ON games (session, score DESC)")
+        connection.commit()
+        return connection
+
+    def _load_top(self, connection):
+        sessions = [row[0] for row in connection.execute("SELECT DISTINCT session FROM games")]
+        for session in sessions:
+            rows = connection.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM games WHERE session = ? ORDER BY score DESC LIMIT ?",
+                (session, self.top_n)
+            ).fetchall()
+            with self._lock:
+                # Merge with games recorded before the load finished
+                entries = self._top.get(session, []) + [dict(zip(self.COLUMNS, row)) for row in rows]
+                entries.sort(key=lambda entry: entry['score'], reverse=True)
+                self._top[session] = entries[:self.top_n]
+
+    def _run(self):
+        try:
+            connection = self._connect()
+            self._load_top(connection)
+            print(f"Leaderboard loaded from {self.path}.")
+        except Exception as e:
+            print("Error opening leaderboard:", e)
+            traceback.print_exc(file=sys.stdout)
+            return
+
+        held = {}  # id() -> game written to the database but not yet final, so not logged
+        running = True
+        while running:
+            batch = []
+            try:
+                item = self._pending.get()
+                deadline = time.time() + self.flush_interval
+                while True:
+                    if item is None:
+                        running = False  # close() was called: write what we have and stop
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    item = self._pending.get(timeout=max(0, deadline - time.time()))
+            except queue.Empty:
+                pass
+            # Items are (action, game) in the order the game loop made them
+            inserts, deletes, log = {}, [], []
+            for action, game in batch:
+                if action == 'record':
+                    inserts[id(game)] = game
+                    if game['final']:
+                        log.append(game)
+                    else:
+                        held[id(game)] = game
+                elif action == 'finish' and id(game) in held:
+                    log.append(held.pop(id(game)))
+                elif action == 'cancel':
+                    held.pop(id(game), None)
+                    if inserts.pop(id(game), None) is None and 'id' in game:
+                        deletes.append(game['id'])  # Already written
+            if not running:
+                log.extend(held.values())  # Closing on a Game Over screen: the result stands
+            if inserts or deletes:
+                try:
+                    with connection:
+                        for game in inserts.values():
+                            game['id'] = connection.execute(
+                                f"INSERT INTO games ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                                tuple(game[column] for column in self.COLUMNS)
+                            ).lastrowid
+                        connection.executemany("DELETE FROM games WHERE id = ?", [(row_id,) for row_id in deletes])
+                    print(f"Leaderboard: wrote {len(inserts)} game(s)" + (f", removed {len(deletes)}." if deletes else "."))
+                except Exception as e:
+                    print("Error writing leaderboard:", e)
+                    traceback.print_exc(file=sys.stdout)
+            if log and self.game_log is not None:
+                try:
+                    self.game_log.write(log)
+                except Exception as e:
+                    print("Error writing game log:", e)
+                    traceback.print_exc(file=sys.stdout)
+        connection.close()
+
+    def record_game(self, session, score, max_tile, moves, duration, password, won, grid_size=4, modulo_merges=0,
+                    modulo_clears=0, final=True):
+        """
+        Queues a finished game for writing and updates the in-memory top list.
+        grid_size and the modulo counts go to the game log only.
+
+        Returns:
+            dict: The game, for finish_game() or cancel_game() when final is False.
+        """
+        game = {
+            'finished_at': time.time(),
+            'session': session,
+            'score': score,
+            'max_tile': max_tile,
+            'moves': moves,
+            'duration': duration,
+            'password': password,
+            'won': int(won),
+            'grid_size': grid_size,
+            'modulo_merges': modulo_merges,
+            'modulo_clears': modulo_clears,
+            'final': final,
+        }
+        with self._lock:
+            entries = self._top.setdefault(session, [])
+            if len(entries) < self.top_n or score > entries[-1]['score']:
+                position = len(entries)
+                while position > 0 and entries[position - 1]['score'] < score:
+                    position -= 1
+                entries.insert(position, game)
+                del entries[self.top_n:]
+        self._pending.put(('record', game))
+        return game
+
+    def finish_game(self, game):
+        """Makes a game recorded with final=False final; it goes to the game log too."""
+        self._pending.put(('finish', game))
+
+    def cancel_game(self, game):
+        """Takes back a game recorded with final=False: it leaves the top list and the database."""
+        with self._lock:
+            entries = self._top.get(game['session'], [])
+            if any(entry is game for entry in entries):
+                entries[:] = [entry for entry in entries if entry is not game]
+        self._pending.put(('cancel', game))
+
+    def top(self, session):
+        """Returns the best games of a session, best first (no disk access)."""
+        with self._lock:
+            return list(self._top.get(session, ()))
+
+    def close(self):
+        """Writes any queued games and stops the writer thread."""
+        self._pending.put(None)
+        self._thread.join()
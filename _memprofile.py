@@ -0,0 +1,184 @@
+# _memprofile.py
+
+import collections
+import json  # One record per line
+import os
+import threading  # Snapshots are taken by a background thread
+import time
+import tracemalloc
+import traceback # For exception tracing
+import sys  # For exception tracing
+
+MEMPROFILE_ENV = "MODULO2048_MEMPROFILE"  # Set (to the interval in seconds, or "1") to profile memory
+MEMPROFILE_DIR = "memprofile"
+SNAPSHOT_INTERVAL = 300  # seconds between snapshots
+TRACE_FRAMES = 1  # Stack depth recorded per allocation; 1 (the allocating line) keeps the overhead low
+TOP_SITES = 15  # Sites written per record, largest change first
+TRACK_MIN_BYTES = 16384  # Sites are watched for growth once they hold this much
+GROWTH_WINDOW = 7200  # seconds of history a growth verdict needs (two hours)
+GROWTH_MIN_BYTES = 65536  # Growth over the window below this is ignored
+GROWTH_STEADINESS = 0.75  # Fraction of intervals in which a growing site must have grown
+
+# Allocations made by the profiler itself and by imports are not the game's. They are skipped
+# in the statistics; Snapshot.filter_traces would match every trace and take seconds.
+IGNORED_FILES = {__file__, tracemalloc.__file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>",
+                 "<unknown>"}
+
+
+def site_name(frame):
+    """file:line of a traceback frame, relative to the game directory when it is inside it."""
+    filename = frame.filename
+    if filename.startswith(os.getcwd() + os.sep):
+        filename = filename[len(os.getcwd()) + 1:]
+    return f"{filename}:{frame.lineno}"
+
+
+def read_rss():
+    """Resident set size of this process in bytes, or None where /proc is missing."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class MemoryProfiler:
+    """
+    Opt-in memory profiling for soak tests.
+
+    Every interval seconds a tracemalloc snapshot is compared with the
+    previous one and a compact record is appended to a JSON lines file: RSS,
+    traced memory, and the call sites (file:line) whose allocations changed
+    most, with their size, block count and allocation rate in bytes per second.
+    Only the previous snapshot and a short size history per large site are
+    kept in memory.
+
+    A site is flagged as growing when, over at least GROWTH_WINDOW seconds, it
+    gained GROWTH_MIN_BYTES and grew in most intervals; flagged sites are
+    printed and listed in the record. A one-off rise (a cache filling up)
+    stops growing and is not flagged for long.
+
+    tracemalloc records one frame per allocation, so the game runs a little
+    slower with profiling on but stays playable.
+    """
+    def __init__(self, name="main", directory=MEMPROFILE_DIR, interval=SNAPSHOT_INTERVAL, frames=TRACE_FRAMES,
+                 top=TOP_SITES):
+        self.name = name
+        self.directory = directory
+        self.interval = interval
+        self.frames = frames
+        self.top = top
+        self.path = None
+        self.history = {}  # site -> deque of sizes, one per snapshot
+        self.flagged = set()
+        self.samples = 0
+        self._previous = None
+        self._previous_time = None
+        self._started = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_environment(cls, name="main"):
+        """A profiler if MODULO2048_MEMPROFILE is set, None otherwise."""
+        value = os.environ.get(MEMPROFILE_ENV)
+        if not value:
+            return None
+        try:
+            interval = float(value)
+        except ValueError:
+            interval = SNAPSHOT_INTERVAL
+        return cls(name, interval=interval if interval > 1 else SNAPSHOT_INTERVAL)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}.jsonl")
+        tracemalloc.start(self.frames)
+        self._started = time.time()
+        self._previous = tracemalloc.take_snapshot()
+        self._previous_time = self._started
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="MemoryProfiler", daemon=True)
+        self._thread.start()
+        print(f"Memory profiling every {self.interval:g} s into {self.path}.")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                print("Error in memory profiler:", e)
+                traceback.print_exc(file=sys.stdout)
+
+    def sample(self, now=None):
+        """Takes a snapshot, appends its record to the profile and returns the record."""
+        if now is None:
+            now = time.time()
+        snapshot = tracemalloc.take_snapshot()
+        elapsed = max(now - self._previous_time, 1e-9)
+        differences = snapshot.compare_to(self._previous, 'lineno')
+        self._previous, self._previous_time = snapshot, now
+        self.samples += 1
+
+        sites = []
+        for stat in differences:
+            if stat.traceback[0].filename in IGNORED_FILES:
+                continue
+            site = site_name(stat.traceback[0])
+            if site in self.history or stat.size >= TRACK_MIN_BYTES:
+                self.history.setdefault(site, collections.deque(maxlen=self._history_length())).append(stat.size)
+            if len(sites) < self.top and stat.size_diff:
+                sites.append([site, stat.size, stat.size_diff, stat.count_diff, round(stat.size_diff / elapsed, 1)])
+        growing = self._growing_sites()
+        for site in sorted(growing - self.flagged):
+            sizes = self.history[site]
+            print(f"[memory] {site} keeps growing: {sizes[0]} -> {sizes[-1]} bytes "
+                  f"over {(len(sizes) - 1) * self.interval / 3600:.1f} h.")
+        self.flagged = growing
+
+        current, peak = tracemalloc.get_traced_memory()
+        record = {
+            'time': round(now, 1),
+            'uptime': round(now - self._started, 1),
+            'rss': read_rss(),
+            'traced': current,
+            'traced_peak': peak,
+            'sites': sites,  # [site, bytes, bytes since the last record, blocks since the last record, bytes/s]
+            'growing': sorted(growing),
+        }
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record, separators=(',', ':')) + "\n")
+        return record
+
+    def _history_length(self):
+        return int(GROWTH_WINDOW / self.interval) + 1
+
+    def _growing_sites(self):
+        growing = set()
+        needed = self._history_length()
+        for site, sizes in self.history.items():
+            if len(sizes) < needed or sizes[-1] - sizes[0] < GROWTH_MIN_BYTES:
+                continue
+            steps = len(sizes) - 1
+            rises = sum(1 for index in range(steps) if sizes[index + 1] > sizes[index])
+            if rises >= GROWTH_STEADINESS * steps:
+                growing.add(site)
+        # Forget sites that freed everything, so the history stays small
+        for site in [site for site, sizes in self.history.items() if not sizes[-1]]:
+            del self.history[site]
+        return growing
+
+    def stop(self):
+        """Stops the profiler after a last record."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        try:
+            self.sample()
+        except Exception as e:
+            print("Error in memory profiler:", e)
+        tracemalloc.stop()
@@ -0,0 +1,124 @@
+# _metrics.py
+
+import os  # Atomic replace of the metrics file
+import threading  # Background writer
+import time
+import traceback # For exception tracing
+import sys  # For exception tracing
+
+METRICS_DIR = "/var/lib/node_exporter/textfile_collector"  # node_exporter --collector.textfile.directory
+METRICS_FILE = "modulo2048.prom"
+WRITE_INTERVAL = 5  # seconds between metrics file writes
+METRIC_PREFIX = "modulo2048_"
+
+# Counter attribute -> (metric name, help). Rates (moves per second, ...) are rate() in Prometheus.
+COUNTERS = {
+    'events': ("button_events_total", "Button presses handled, ignored ones included."),
+    'moves': ("moves_total", "Moves that changed the board."),
+    'games_started': ("games_started_total", "Games started from the main menu."),
+    'games_won': ("games_won_total", "Games won."),
+    'games_lost': ("games_lost_total", "Games lost."),
+    'modulo_merges': ("modulo_merges_total", "Merges of a tile with a modulo block."),
+    'modulo_clears': ("modulo_clears_total", "Modulo merges that left no tile."),
+    'high_score_writes': ("high_score_writes_total", "High score file writes."),
+    'errors': ("errors_total", "Exceptions caught and logged by the game."),
+}
+# Timing attribute prefix -> (metric name, help); each has a _seconds sum and a _count
+TIMINGS = {
+    'render': ("render_seconds", "Time spent composing board frames."),
+    'spi': ("spi_seconds", "Time spent sending frames to the display."),
+}
+
+
+class SessionMetrics:
+    """
+    Counters of one session. The game updates them with plain integer and
+    float additions; MetricsExporter reads them from its own thread (a value
+    may be one update behind, never torn).
+    """
+    __slots__ = tuple(COUNTERS) + tuple(f"{name}_{part}" for name in TIMINGS for part in ('seconds', 'count'))
+
+    def __init__(self):
+        for name in COUNTERS:
+            setattr(self, name, 0)
+        for name in TIMINGS:
+            setattr(self, f"{name}_seconds", 0.0)
+            setattr(self, f"{name}_count", 0)
+
+
+class MetricsExporter:
+    """
+    Writes the metrics of every registered session to a node_exporter
+    textfile collector file every interval seconds, from a background thread.
+
+    The file is written to a temporary name and renamed over the old one, so
+    the collector never reads a half-written file. Sessions are told apart
+    by a session label.
+    """
+    def __init__(self, directory=METRICS_DIR, filename=METRICS_FILE, interval=WRITE_INTERVAL):
+        self.path = os.path.join(directory, filename)
+        self.interval = interval
+        self.sessions = {}  # session name -> SessionMetrics
+        self.started_at = time.time()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def register(self, name, metrics):
+        self.sessions[name] = metrics
+
+    def render(self):
+        """Returns the metrics file contents (Prometheus text format)."""
+        lines = []
+        for attribute, (metric, help_text) in COUNTERS.items():
+            lines.append(f"# HELP {METRIC_PREFIX}{metric} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}{metric} counter")
+            for name, metrics in self.sessions.items():
+                lines.append(f'{METRIC_PREFIX}{metric}{{session="{name}"}} {getattr(metrics, attribute)}')
+        for attribute, (metric, help_text) in TIMINGS.items():
+            lines.append(f"# HELP {METRIC_PREFIX}{metric} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}{metric} summary")
+            for name, metrics in self.sessions.items():
+                lines.append(f'{METRIC_PREFIX}{metric}_sum{{session="{name}"}} {getattr(metrics, f"{attribute}_seconds"):.6f}')
+                lines.append(f'{METRIC_PREFIX}{metric}_count{{session="{name}"}} {getattr(metrics, f"{attribute}_count")}')
+        lines.append(f"# HELP {METRIC_PREFIX}start_time_seconds Unix time the game process started.")
+        lines.append(f"# TYPE {METRIC_PREFIX}start_time_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}start_time_seconds {self.started_at:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        temp_path = f"{self.path}.{os.getpid()}.tmp"  # Same directory, so the rename is atomic
+        with open(temp_path, 'w') as f:
+            f.write(self.render())
+        os.replace(temp_path, self.path)
+
+    def start(self):
+        """Starts the background writer, unless the collector directory does not exist."""
+        if self._thread is not None:
+            return
+        if not os.path.isdir(os.path.dirname(self.path)):
+            print(f"Metrics directory {os.path.dirname(self.path)} not found. Metrics are not exported.")
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="MetricsExporter", daemon=True)
+        self._thread.start()
+        print(f"Writing metrics to {self.path} every {self.interval} s.")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except Exception as e:
+                print("Error writing metrics:", e)
+                traceback.print_exc(file=sys.stdout)
+
+    def stop(self):
+        """Stops the writer after a final write, so the last counts are not lost."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        try:
+            self.write()
+        except Exception as e:
+            print("Error writing metrics:", e)
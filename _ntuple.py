@@ -0,0 +1,249 @@
+# _ntuple.py
+
+import hashlib  # Weight fingerprints for the evaluation cache
+import json  # Checkpoint metadata
+import os  # Atomic checkpoint replace
+import numpy as np # Weight tables
+from _engine import get_engine, spawn_tile, DIRECTIONS, MOVE_BITS
+from _tcache import TranspositionCache, CACHE_FILE  # Hints shared between processes and restarts
+
+NETWORK_DIR = "networks"
+NETWORK_FILE = os.path.join(NETWORK_DIR, "modulo_{size}x{size}")  # Checkpoint path; {size} is the board size
+TUPLE_LENGTH = 4  # Cells per tuple; 17 ** 4 weights per tuple
+LEARNING_RATE = 0.0025
+TD_LAMBDA = 0.5
+TRACE_LENGTH = 5  # Afterstates a TD(lambda) update reaches back to
+MAX_EPISODE_MOVES = 20000  # Modulo blocks clear tiles, so a strong player may never lose
+
+
+def default_patterns(size, length=TUPLE_LENGTH):
+    """
+    Base tuples for an NxN board as lists of (row, column): the first two rows
+    (or as much of them as fits) and three 2x2 squares. Every pattern is also
+    used under the 8 symmetries of the board (see NTupleNetwork).
+    """
+    length = min(length, size)
+    patterns = [
+        [(0, c) for c in range(length)],
+        [(1, c) for c in range(length)],
+    ]
+    if length == 4:
+        patterns += [
+            [(0, 0), (0, 1), (1, 0), (1, 1)],
+            [(0, 1), (0, 2), (1, 1), (1, 2)],
+            [(1, 1), (1, 2), (2, 1), (2, 2)],
+        ]
+    return patterns
+
+
+class NTupleNetwork:
+    """
+    n-tuple value network for Modulo 2048 afterstates (the board after a move,
+    before the random spawn).
+
+    The value of a board is the sum, over every tuple and every symmetry of the
+    board, of one weight looked up by the tile codes under the tuple's cells.
+    Symmetric placements of a tuple share its weight table, so
+    weights has shape (tuples, 17 ** length) and evaluate() is a single gather.
+    """
+    def __init__(self, size=4, patterns=None, weights=None):
+        self.size = size
+        self.engine = get_engine(size)
+        self.patterns = patterns or default_patterns(size)
+        self.length = len(self.patterns[0])
+        self.base = self.engine.base
+
+        # Flat cell indices of every tuple under the 8 board symmetries: (tuples, 8, length)
+        index = np.arange(size * size).reshape(size, size)
+        symmetries = []
+        for flipped in (index, index.T):
+            for turns in range(4):
+                symmetries.append(np.rot90(flipped, turns))
+        self.cells = np.array([
+            [[symmetry[r, c] for r, c in pattern] for symmetry in symmetries]
+            for pattern in self.patterns
+        ], dtype=np.intp)
+        self.powers = self.base ** np.arange(self.length - 1, -1, -1, dtype=np.intp)
+        self._rows = np.arange(len(self.patterns))[:, None]
+        self._update_rows = np.broadcast_to(self._rows, self.cells.shape[:2])
+
+        if weights is None:
+            weights = np.zeros((len(self.patterns), self.base ** self.length), dtype=np.float32)
+        self.weights = weights
+
+    def features(self, board):
+        """Weight indices of a board: (tuples, 8)."""
+        return board.ravel()[self.cells] @ self.powers
+
+    def evaluate(self, board):
+        return float(self.weights[self._rows, self.features(board)].sum())
+
+    def update(self, features, delta):
+        """Adds delta to every weight of a feature set (repeated indices add up)."""
+        np.add.at(self.weights, (self._update_rows, features), delta)
+
+    def best_move(self, board, legal=None):
+        """
+        Picks the move with the highest reward + afterstate value.
+
+        Returns:
+            tuple: (direction, afterstate, reward), or (None, None, 0) if no move is left.
+        """
+        if legal is None:
+            legal = self.engine.legal_moves(board)
+        best = (None, None, 0)
+        best_value = None
+        for direction in DIRECTIONS:
+            if legal & MOVE_BITS[direction]:
+                afterstate, _, reward = self.engine.move(board, direction)
+                value = reward + self.evaluate(afterstate)
+                if best_value is None or value > best_value:
+                    best_value = value
+                    best = (direction, afterstate, reward)
+        return best
+
+    def fingerprint(self):
+        """Short hash of the weights; tags the evaluation cache so it only answers for this network."""
+        return hashlib.sha1(np.ascontiguousarray(self.weights)).hexdigest()[:12]
+
+    def open_cache(self, path=CACHE_FILE):
+        """Opens the shared evaluation cache for this network's hints (see hint)."""
+        return TranspositionCache(path, grid_size=self.size, tag=self.fingerprint())
+
+    def hint(self, board, modulo_counter=0, cache=None):
+        """
+        Best move for the player, through a TranspositionCache when one is given
+        (see open_cache) so positions evaluated before (by any process) are
+        answered from it.
+
+        Returns:
+            str: Direction, or None if no move is left.
+        """
+        if cache is not None:
+            entry = cache.get(board, modulo_counter)
+            if entry is not None:
+                return entry[1]
+        direction, afterstate, reward = self.best_move(board)
+        if cache is not None:
+            value = 0.0 if direction is None else reward + self.evaluate(afterstate)
+            cache.put(board, modulo_counter, value, direction)
+        return direction
+
+    def save(self, path, **info):
+        """
+        Saves the weights as <path>.npy (memory-mappable) and the tuples and rules
+        as <path>.json. Both files are replaced atomically.
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temp_path = path + ".tmp.npy"
+        np.save(temp_path, self.weights)
+        os.replace(temp_path, path + ".npy")
+        meta = dict(info, size=self.size, patterns=self.patterns, rules=self.engine.rules_hash())
+        with open(path + ".json.tmp", 'w') as f:
+            json.dump(meta, f)
+        os.replace(path + ".json.tmp", path + ".json")
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Loads a saved network. With mmap the weights stay in the page cache and
+        are shared by every process that loads them (read-only).
+        """
+        with open(path + ".json", 'r') as f:
+            meta = json.load(f)
+        weights = np.load(path + ".npy", mmap_mode='r' if mmap else None)
+        network = cls(meta['size'], [[tuple(cell) for cell in pattern] for pattern in meta['patterns']], weights)
+        if meta.get('rules') != network.engine.rules_hash():
+            print(f"Warning: network {path} was trained for different rules.")
+        return network
+
+
+def load_hints(size, network_path=NETWORK_FILE, cache_path=CACHE_FILE):
+    """
+    The trained network for a board size and its shared evaluation cache, for
+    GameSession hints.
+
+    Returns:
+        tuple: (network, cache); (None, None) if no network was trained for the size,
+        and cache is None if the cache cannot be opened (boards over 5x5).
+    """
+    path = network_path.format(size=size)
+    if not os.path.exists(path + ".npy"):
+        print(f"No network at {path}.npy. Hints are off.")
+        return None, None
+    try:
+        network = NTupleNetwork.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Could not load network {path}:", e)
+        return None, None
+    if network.size != size:
+        print(f"Network {path} is for {network.size}x{network.size} boards. Hints are off.")
+        return None, None
+    try:
+        cache = network.open_cache(cache_path) if cache_path else None
+    except (OSError, ValueError) as e:
+        print("Evaluation cache unavailable:", e)
+        cache = None
+    return network, cache
+
+
+def play_episode(network, rng, learning_rate=LEARNING_RATE, td_lambda=TD_LAMBDA, learn=True, cache=None):
+    """
+    Plays one self-play game with greedy moves, learning from afterstates with
+    TD(lambda) (td_lambda=0 is TD(0)). Each TD error also updates up to
+    TRACE_LENGTH earlier afterstates, scaled by td_lambda per step back.
+
+    Games that do not learn may pass a TranspositionCache: moves are then
+    taken from hint(), so they fill the cache the game's hints read.
+
+    Returns:
+        dict: score, moves, max_tile and won. Games are cut off after
+        MAX_EPISODE_MOVES moves.
+    """
+    if learn and cache is not None:
+        raise ValueError("Cached evaluations go stale while the network learns.")
+    engine = network.engine
+    board = engine.empty_board()
+    modulo_counter = 0
+    modulo_counter = spawn_tile(board, modulo_counter, rng)
+    modulo_counter = spawn_tile(board, modulo_counter, rng)
+    score = 0
+    moves = 0
+    trace = []  # Features of the latest afterstates, newest last
+    decay = [td_lambda ** k for k in range(TRACE_LENGTH)]
+    won = False
+
+    while True:
+        if cache is not None:
+            direction = network.hint(board, modulo_counter, cache)
+            afterstate, _, reward = engine.move(board, direction) if direction is not None else (None, False, 0)
+        else:
+            direction, afterstate, reward = network.best_move(board)
+        if learn and trace:
+            # TD error of the previous afterstate: r + V(s') - V(s), or -V(s) at the end
+            target = 0.0 if direction is None else reward + network.evaluate(afterstate)
+            previous = trace[-1]
+            delta = learning_rate * (target - float(network.weights[network._rows, previous].sum()))
+            for k, features in enumerate(reversed(trace)):
+                network.update(features, delta * decay[k])
+        if direction is None or moves >= MAX_EPISODE_MOVES:
+            break
+        score += reward
+        moves += 1
+        if learn:
+            trace.append(network.features(afterstate))
+            del trace[:-TRACE_LENGTH]
+        board = afterstate
+        modulo_counter = spawn_tile(board, modulo_counter + 1, rng)
+        if (board == engine.win_code).any():
+            won = True
+            if learn:
+                # Reaching the win tile ends the game, like a loss without further reward
+                delta = learning_rate * -float(network.weights[network._rows, trace[-1]].sum())
+                for k, features in enumerate(reversed(trace)):
+                    network.update(features, delta * decay[k])
+            break
+
+    normal = engine.code_is_normal[board]
+    max_tile = int(engine.code_values[board][normal].max()) if normal.any() else 0
+    return {'score': score, 'moves': moves, 'max_tile': max_tile, 'won': won}
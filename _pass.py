@@ -28,16 +28,27 @@ class BoardEncoder:
             (32, 'modulo'),      # 16
         ]
         self.MAX_TILE_INDEX = len(self.TILE_VALUES) - 1
+        # Reverse lookup so packing a board does not scan TILE_VALUES per cell
+        self.TILE_INDEX = {tile: index for index, tile in enumerate(self.TILE_VALUES)}
 
-    def encode(self, number):
+    def encode(self, number, length=10):
         """Encodes a number to a password string."""
         if number == 0:
-            return self.CHARSET[0]
+            return self.CHARSET[0] * length
         chars = []
         while number > 0:
             number, remainder = divmod(number, self.BASE)
             chars.append(self.CHARSET[remainder])
-        return ''.join(reversed(chars)).rjust(10, self.CHARSET[0])  # Ensure length is 10
+        return ''.join(reversed(chars)).rjust(length, self.CHARSET[0])  # Ensure length is at least `length`
+
+    def password_length(self, grid_size=4):
+        """Number of password characters needed for any board of this size (at least 10)."""
+        largest_board = (self.MAX_TILE_INDEX + 1) ** (grid_size * grid_size) - 1
+        length = 0
+        while largest_board > 0:
+            largest_board //= self.BASE
+            length += 1
+        return max(10, length)
 
     def decode(self, password):
         """Decodes a password string to a number."""
@@ -53,18 +64,18 @@ class BoardEncoder:
             for cell in row:
                 tile_tuple = (cell['value'], cell['type'])
                 try:
-                    tile_index = self.TILE_VALUES.index(tile_tuple)
-                except ValueError:
+                    tile_index = self.TILE_INDEX[tile_tuple]
+                except KeyError:
                     raise ValueError(f"Tile {tile_tuple} is not in TILE_VALUES.")
                 number = number * (self.MAX_TILE_INDEX + 1) + tile_index
         return number
 
-    def number_to_board(self, number):
+    def number_to_board(self, number, grid_size=4):
         """Converts a number back to a board."""
         board = []
-        for _ in range(4):
+        for _ in range(grid_size):
             row = []
-            for _ in range(4):
+            for _ in range(grid_size):
                 tile_index = number % (self.MAX_TILE_INDEX + 1)
                 number = number // (self.MAX_TILE_INDEX + 1)
                 if tile_index > self.MAX_TILE_INDEX:
@@ -79,3 +90,25 @@ class BoardEncoder:
         board_number = self.board_to_number(board)
         password = self.encode(board_number)
         return password
+
+    def codes_to_number(self, codes):
+        """Converts a flat sequence of tile codes (indices into TILE_VALUES) to a number."""
+        number = 0
+        for code in codes:
+            number = number * (self.MAX_TILE_INDEX + 1) + int(code)
+        return number
+
+    def number_to_codes(self, number, grid_size=4):
+        """Converts a number back to a flat list of tile codes."""
+        codes = []
+        for _ in range(grid_size * grid_size):
+            number, tile_index = divmod(number, self.MAX_TILE_INDEX + 1)
+            codes.append(tile_index)
+        if number:
+            raise ValueError("Number is too large for the board size.")
+        codes.reverse()
+        return codes
+
+    def save_codes_to_password(self, codes, grid_size=4):
+        """Encodes a board of tile codes into a password string."""
+        return self.encode(self.codes_to_number(codes), self.password_length(grid_size))
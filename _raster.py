@@ -0,0 +1,82 @@
+# _raster.py
+
+import numpy as np # Frames are (height, width, 3) uint8 arrays
+from PIL import Image, ImageDraw # Only used once, to build the masks
+
+
+class BoardRaster:
+    """
+    Composes board frames into NumPy RGB arrays with slice copies.
+
+    The background and grid lines are rasterised once into `base` (the line
+    mask is drawn with the same ImageDraw calls the game used, so frames look
+    the same), and every tile sprite is converted once to an array. Composing
+    a frame is then one copy of the base plus one slice copy per tile.
+    """
+    def __init__(self, width, height, grid_size, tile_size, thickness, offset_x, offset_y, sprites,
+                 tile_values, background_color, grid_color):
+        self.width = width
+        self.height = height
+        self.grid_size = grid_size
+        self.tile_size = tile_size
+
+        # Grid line mask
+        pitch = tile_size + thickness
+        total = grid_size * tile_size + (grid_size + 1) * thickness
+        mask_image = Image.new("1", (width, height), 0)
+        mask_draw = ImageDraw.Draw(mask_image)
+        for i in range(grid_size + 1):
+            mask_draw.line((offset_x, offset_y + i * pitch, offset_x + total, offset_y + i * pitch), fill=1, width=thickness)
+            mask_draw.line((offset_x + i * pitch, offset_y, offset_x + i * pitch, offset_y + total), fill=1, width=thickness)
+        self.line_mask = np.asarray(mask_image, dtype=bool)
+        self.base = np.empty((height, width, 3), dtype=np.uint8)
+        self.base[:] = background_color
+        self.base[self.line_mask] = grid_color
+
+        # Grid line pixels of each outer edge, for marking a direction (see mark_edge)
+        ys, xs = np.mgrid[0:height, 0:width]
+        bands = {
+            'LEFT': xs < offset_x + thickness,
+            'RIGHT': xs > offset_x + total - thickness,
+            'UP': ys < offset_y + thickness,
+            'DOWN': ys > offset_y + total - thickness,
+        }
+        self.edges = {direction: np.nonzero(self.line_mask & band) for direction, band in bands.items()}
+
+        # Top-left pixel of every cell (flat index order) and one sprite array per tile code
+        self.positions = [
+            (offset_y + i * pitch + thickness, offset_x + j * pitch + thickness)
+            for i in range(grid_size) for j in range(grid_size)
+        ]
+        self.tiles = [None] + [np.asarray(sprites.get(value, tile_type)) for value, tile_type in tile_values[1:]]
+        self.block = self.tiles[1].shape[0]  # Sprites cover tile_size + 1 pixels
+
+    def new_frame(self):
+        return self.base.copy()
+
+    def compose(self, frame, grid):
+        """Draws a whole board into frame (in place)."""
+        frame[...] = self.base
+        for cell in np.flatnonzero(grid):
+            self.paste_tile(frame, cell, grid.flat[cell])
+
+    def paste_tile(self, frame, cell, code):
+        """Draws one tile into frame. cell is the flat board index."""
+        y, x = self.positions[cell]
+        frame[y:y + self.block, x:x + self.block] = self.tiles[code]
+
+    def mark_edge(self, frame, direction, color):
+        """Colours the outer grid line on one side of the board ('LEFT', 'RIGHT', 'UP' or 'DOWN')."""
+        frame[self.edges[direction]] = color
+
+
+_rasters = {}
+
+def get_raster(width, height, grid_size, tile_size, thickness, offset_x, offset_y, sprites,
+               tile_values, background_color, grid_color):
+    """Returns the process-wide raster for a board geometry."""
+    key = (width, height, grid_size, tile_size, thickness, offset_x, offset_y)
+    if key not in _rasters:
+        _rasters[key] = BoardRaster(width, height, grid_size, tile_size, thickness, offset_x, offset_y, sprites,
+                                    tile_values, background_color, grid_color)
+    return _rasters[key]
@@ -0,0 +1,85 @@
+# _rules.py
+
+import hashlib  # Rules hash for table caches
+import json  # Rules files
+
+RULES_FILE = "rules.json"  # Loaded at startup when present; the classic rules otherwise
+
+# Classic Modulo 2048
+MODULO_INTERVAL = 4  # Moves between modulo blocks
+MAX_MODULO_INTERVAL = 63  # The checkpoint journal keeps the move counter in six bits
+NORMAL_SPAWN = {2: 1, 4: 1}  # Spawned value -> relative weight
+MODULO_SPAWN = {2: 1, 4: 1, 8: 1, 16: 1, 32: 1}
+WIN_TILE = 2048
+
+
+class Rules:
+    """
+    One variant of the game, as data. A rules file is JSON, for example:
+
+        {
+            "name": "fast-1024",
+            "normal_spawn": {"2": 9, "4": 1},
+            "modulo_spawn": {"4": 1, "8": 1, "16": 1},
+            "modulo_interval": 6,
+            "win_tile": 1024,
+            "modulo_merges": true
+        }
+
+    Spawn weights are relative. modulo_interval is at most 63, as the move
+    counter is stored in six bits (checkpoint journal, evaluation cache).
+    With modulo_merges, two equal modulo tiles merge into the next modulo
+    tile (no points). Keys that are left out keep
+    the classic value. Tile values must exist in BoardEncoder.TILE_VALUES;
+    BoardEngine compiles the rules into its merge, move and spawn tables.
+    """
+    def __init__(self, name="classic", normal_spawn=None, modulo_spawn=None, modulo_interval=MODULO_INTERVAL,
+                 win_tile=WIN_TILE, modulo_merges=False):
+        self.name = name
+        self.normal_spawn = {int(value): float(weight) for value, weight in (normal_spawn or NORMAL_SPAWN).items()}
+        self.modulo_spawn = {int(value): float(weight) for value, weight in (modulo_spawn or MODULO_SPAWN).items()}
+        self.modulo_interval = int(modulo_interval)
+        self.win_tile = int(win_tile)
+        self.modulo_merges = bool(modulo_merges)
+        for label, spawn in (("normal_spawn", self.normal_spawn), ("modulo_spawn", self.modulo_spawn)):
+            if not spawn or any(weight < 0 for weight in spawn.values()) or not sum(spawn.values()):
+                raise ValueError(f"Rules '{name}': {label} needs at least one positive weight.")
+        if self.modulo_interval < 1:
+            raise ValueError(f"Rules '{name}': modulo_interval must be at least 1.")
+        if self.modulo_interval > MAX_MODULO_INTERVAL:
+            raise ValueError(f"Rules '{name}': modulo_interval must be at most {MAX_MODULO_INTERVAL}.")
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'normal_spawn': {str(value): weight for value, weight in sorted(self.normal_spawn.items())},
+            'modulo_spawn': {str(value): weight for value, weight in sorted(self.modulo_spawn.items())},
+            'modulo_interval': self.modulo_interval,
+            'win_tile': self.win_tile,
+            'modulo_merges': self.modulo_merges,
+        }
+
+    def hash(self):
+        """Short hash of the rules (the name does not count)."""
+        settings = self.to_dict()
+        del settings['name']
+        return hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:12]
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, 'r') as f:
+            settings = json.load(f)
+        unknown = set(settings) - {'name', 'normal_spawn', 'modulo_spawn', 'modulo_interval', 'win_tile', 'modulo_merges'}
+        if unknown:
+            raise ValueError(f"Unknown rules setting(s) in {path}: {', '.join(sorted(unknown))}.")
+        return cls(**settings)
+
+
+def load_rules(path=RULES_FILE):
+    """Loads a rules file, or returns the classic rules if there is none."""
+    try:
+        rules = Rules.from_file(path)
+    except FileNotFoundError:
+        return Rules()
+    print(f"Rules '{rules.name}' ({rules.hash()}) loaded from {path}.")
+    return rules
@@ -0,0 +1,165 @@
+# _saves.py
+
+import math
+import os
+import struct  # Fixed-layout header, index and records
+import time
+import zlib  # Index and record checksums
+import numpy as np # Boards are arrays of tile codes
+from _engine import get_engine
+
+SAVE_DIR = "saves"
+SAVE_SLOTS = 8
+
+RNG_WORDS = 625  # random.Random state: 624 Mersenne Twister words plus the position
+
+
+class SaveStore:
+    """
+    Save slots for one session, kept in a single fixed-layout file in SAVE_DIR:
+
+      header  - magic, version, board size, slot count and record size
+      index   - one entry per slot: sequence number, which record copy is
+                current, score and save time, with a CRC. The slot list is
+                read from the index alone.
+      records - two copies per slot. A record holds the packed board (base-17
+                tile codes, like BoardEncoder), score, modulo counter, move
+                count, play time, save time and the tile RNG state, with a CRC.
+
+    Saving and loading read or write one index entry and one record at fixed
+    offsets. A save overwrites the copy that is not current, fsyncs it and
+    only then points the index entry at it, so a crash at any point leaves
+    the previous save of that slot intact. An index entry that fails its CRC
+    is rebuilt from the two record copies (the valid one with the higher
+    sequence number wins).
+    """
+    MAGIC = b'M2SV'
+    VERSION = 1
+    HEADER = struct.Struct('<4sBBBxI')  # magic, version, board size, slots, record size
+    HEADER_SIZE = 16
+    INDEX_ENTRY = struct.Struct('<IBxxxIdI')  # sequence, current copy, score, saved at, crc
+    RECORD_FIELDS = '<IIBxxxIdd'  # sequence, score, modulo counter, moves, elapsed, saved at
+
+    def __init__(self, name, grid_size=4, directory=SAVE_DIR, slots=SAVE_SLOTS):
+        self.engine = get_engine(grid_size)
+        self.slots = slots
+        self.board_bytes = math.ceil(grid_size * grid_size * math.log2(self.engine.base) / 8)
+        self.record = struct.Struct(f'{self.RECORD_FIELDS}{self.board_bytes}s{RNG_WORDS}Id')
+        self.record_size = self.record.size + 4  # Followed by its CRC
+        self.records_offset = self.HEADER_SIZE + slots * self.INDEX_ENTRY.size
+        size = self.records_offset + 2 * slots * self.record_size
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, grid_size, slots, self.record_size)
+
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{name}.sav")
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.pread(self._fd, self.HEADER.size, 0) != header or os.fstat(self._fd).st_size != size:
+            if os.fstat(self._fd).st_size:
+                # Saves from another version or board size are kept aside, not overwritten
+                os.close(self._fd)
+                os.replace(self.path, self.path + ".old")
+                print(f"Save file {self.path} has another layout. Moved it to {self.path}.old.")
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            print(f"Creating save file {self.path} ({slots} slots).")
+            os.ftruncate(self._fd, size)
+            os.pwrite(self._fd, header, 0)
+            os.fsync(self._fd)
+
+    def _index_offset(self, slot):
+        return self.HEADER_SIZE + slot * self.INDEX_ENTRY.size
+
+    def _record_offset(self, slot, copy):
+        return self.records_offset + (2 * slot + copy) * self.record_size
+
+    def _read_record(self, slot, copy):
+        """Returns the unpacked record fields, or None if the copy is empty or torn."""
+        data = os.pread(self._fd, self.record_size, self._record_offset(slot, copy))
+        crc, = struct.unpack_from('<I', data, self.record.size)
+        if zlib.crc32(data[:self.record.size]) != crc or not any(data[:4]):
+            return None
+        return self.record.unpack_from(data)
+
+    def _current(self, slot):
+        """
+        Returns:
+            tuple: (sequence, current copy, score, saved at) of a slot, or None if it is empty.
+        """
+        entry = os.pread(self._fd, self.INDEX_ENTRY.size, self._index_offset(slot))
+        sequence, copy, score, saved_at, crc = self.INDEX_ENTRY.unpack(entry)
+        if sequence and zlib.crc32(entry[:-4]) == crc:
+            return sequence, copy, score, saved_at
+        # Empty, torn or never written (a crash between record and index): ask the records
+        best = None
+        for copy in (0, 1):
+            fields = self._read_record(slot, copy)
+            if fields is not None and (best is None or fields[0] > best[0]):
+                best = (fields[0], copy, fields[1], fields[5])
+        return best
+
+    def list_slots(self):
+        """
+        Returns:
+            list: (score, saved at) per slot, or None for an empty slot.
+        """
+        slots = []
+        for slot in range(self.slots):
+            current = self._current(slot)
+            slots.append(None if current is None else current[2:])
+        return slots
+
+    def save(self, slot, grid, score, moves_since_last_modulo_block, move_count, elapsed, rng_state):
+        """
+        Stores a game in a slot.
+
+        Args:
+            rng_state (tuple): random.Random.getstate() of the tile generator.
+        """
+        current = self._current(slot)
+        sequence, copy = (current[0] + 1, 1 - current[1]) if current is not None else (1, 0)
+        saved_at = time.time()
+        _, words, gauss_next = rng_state
+        board = self.engine.encoder.codes_to_number(grid.ravel()).to_bytes(self.board_bytes, 'little')
+        data = self.record.pack(sequence, score, moves_since_last_modulo_block, move_count, elapsed, saved_at,
+                                board, *words, math.nan if gauss_next is None else gauss_next)
+        os.pwrite(self._fd, data + struct.pack('<I', zlib.crc32(data)), self._record_offset(slot, copy))
+        os.fsync(self._fd)  # The new copy is durable before the index points at it
+        entry = self.INDEX_ENTRY.pack(sequence, copy, score, saved_at, 0)[:-4]
+        os.pwrite(self._fd, entry + struct.pack('<I', zlib.crc32(entry)), self._index_offset(slot))
+        os.fsync(self._fd)
+        print(f"Game saved to slot {slot + 1} (score {score}).")
+
+    def load(self, slot):
+        """
+        Returns:
+            dict: grid, score, moves_since_last_modulo_block, move_count, elapsed,
+            saved_at and rng_state, or None if the slot is empty.
+        """
+        current = self._current(slot)
+        if current is None:
+            return None
+        fields = self._read_record(slot, current[1])
+        if fields is None or fields[0] != current[0]:
+            # The index points at a copy that does not hold that save: use the newest valid copy
+            candidates = [f for f in (self._read_record(slot, 0), self._read_record(slot, 1)) if f is not None]
+            if not candidates:
+                print(f"Save slot {slot + 1} is corrupted.")
+                return None
+            fields = max(candidates, key=lambda f: f[0])
+        sequence, score, counter, move_count, elapsed, saved_at, board = fields[:7]
+        size = self.engine.size
+        codes = self.engine.encoder.number_to_codes(int.from_bytes(board, 'little'), size)
+        gauss_next = fields[-1]
+        return {
+            'grid': np.array(codes, dtype=np.uint8).reshape(size, size),
+            'score': score,
+            'moves_since_last_modulo_block': counter,
+            'move_count': move_count,
+            'elapsed': elapsed,
+            'saved_at': saved_at,
+            'rng_state': (3, tuple(fields[7:7 + RNG_WORDS]), None if math.isnan(gauss_next) else gauss_next),
+        }
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
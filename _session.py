@@ -0,0 +1,1839 @@
+# _session.py
+
+import time # For message timing
+import random # For random tile generation
+from PIL import Image, ImageDraw, ImageFont # For drawing on the display
+import os  # For high score persistence
+import traceback # For exception tracing
+from _pass import BoardEncoder  # Import BoardEncoder from _pass.py
+from _history import GameHistory  # Undo/redo snapshots
+from _raster import get_raster  # NumPy board compositing
+from _text import TextCache  # Cached text layout and glyph masks
+from _damage import DamageTracker  # Sends only the changed parts of the screen
+from _display import panel_origin  # Window placement for drivers that rotate in software
+from _engine import get_engine, DIRECTIONS, MOVE_BITS  # Move engine compiled from the rules
+from _metrics import SessionMetrics  # Counters for the metrics exporter
+import numpy as np # Boards are arrays of tile codes
+import sys  # For exception tracing
+
+# Define Game States
+STATE_MAIN_MENU = 'MAIN_MENU'
+STATE_HOW_TO_PLAY = 'HOW_TO_PLAY'
+STATE_GAME = 'GAME'
+STATE_RESET_CONFIRM = 'RESET_CONFIRM'
+STATE_GAME_OVER = 'GAME_OVER'
+STATE_PASSWORD_LOAD = 'PASSWORD_LOAD'
+STATE_PASSWORD_SAVE = 'PASSWORD_SAVE'
+STATE_LEADERBOARD = 'LEADERBOARD'
+STATE_LATENCY = 'LATENCY'
+STATE_SLOT_SAVE = 'SLOT_SAVE'
+STATE_SLOT_LOAD = 'SLOT_LOAD'
+RESUMABLE_STATES = (STATE_GAME, STATE_PASSWORD_SAVE, STATE_SLOT_SAVE)  # States a crash-restart returns to
+
+# Shared by every session; BoardEncoder holds no per-game state
+encoder = BoardEncoder()
+
+# Hints from a trained network (see _ntuple.load_hints)
+HINT_AFTER = 10  # seconds a game may wait for input before the network's move is shown
+HINT_COLOR = (0, 160, 255)  # Outer grid line on the side of the hinted move
+
+# Undo History Setup
+HISTORY_MAX_BYTES = 16384  # Memory cap for undo snapshots (1024 moves on a 4x4 board)
+REWIND_ON_GAME_OVER = True  # Offer "C: Rewind" on the Game Over screen
+
+# Define Grid Parameters
+GRID_SIZE = 4  # Default board size (4x4 grid for 2048); sessions may use 3 to 6
+TILE_SIZE = 55  # Size of each tile in pixels on a 4x4 board; other sizes scale to fit
+TILE_THICKNESS = 4  # Thickness of grid lines in pixels
+GRID_COLOR = (255, 255, 255)  # White grid lines
+
+# Define Colors
+BACKGROUND_COLOR = (0, 0, 0)  # Black background
+EMPTY_TILE_COLOR = (205, 193, 180)
+MODULO_TILE_COLOR = (0, 255, 0)  # Green for modulo blocks
+DEFAULT_TILE_COLOR = (60, 58, 50)  # Default color if value not found
+TILE_COLORS = {
+    0: EMPTY_TILE_COLOR,  # Empty tiles, colors based on the original game.
+    2: (238, 228, 218),
+    4: (237, 224, 200),
+    8: (242, 177, 121),
+    16: (245, 149, 99),
+    32: (246, 124, 95),
+    64: (246, 94, 59),
+    128: (237, 207, 114),
+    256: (237, 204, 97),
+    512: (237, 200, 80),
+    1024: (237, 197, 63),
+    2048: (237, 194, 46),
+}
+
+TEXT_COLOR = (119, 110, 101) # Text colors. Also based on the original game
+FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+FONT_SIZE = 24
+
+# Load font with fallback (once per process, shared by every session)
+try:
+    font = ImageFont.truetype(FONT_PATH, FONT_SIZE)
+    print(f"Font loaded successfully from {FONT_PATH}.")
+except IOError:
+    # Fallback to a default font if the specified font is not found
+    font = ImageFont.load_default()
+    print("Default font loaded as fallback.")
+
+# Smaller font for the leaderboard table
+LEADERBOARD_FONT_SIZE = 16
+try:
+    small_font = ImageFont.truetype(FONT_PATH, LEADERBOARD_FONT_SIZE)
+except IOError:
+    small_font = ImageFont.load_default()
+
+# Measured and rasterised strings, shared by every screen and session
+text_cache = TextCache()
+
+# High Score Persistence Setup
+HIGH_SCORE_FILE = "high_score.txt"
+
+# Define SEQUENCE_THRESHOLD globally
+SEQUENCE_THRESHOLD = 16  # Number of consecutive presses to trigger debug commands
+
+# Input handling
+MAX_MOVE_BATCH = 8  # Queued moves applied before a single render
+ERROR_MESSAGE_TIME = 2  # seconds an error message stays on screen
+LATENCY_SCREEN_REFRESH = 1.0  # seconds between redraws of the latency debug screen
+FRAME_TIME_SMOOTHING = 0.1  # Weight of the newest transfer in the average frame time
+
+# Password editor
+PASSWORD_ROW_CHARS = 8  # Longer passwords are split over several rows of cells
+PASSWORD_CELL_PADDING = 2  # Pixels around a glyph in its cell (the cursor box is drawn there)
+SCROLL_HOLD_GAP = 0.15  # seconds; up/down repeats closer than this belong to one held press
+SCROLL_ACCELERATION = ((2.0, 4), (1.0, 2))  # (seconds held, characters per repeat), longest first
+
+# Maps joystick buttons to move directions
+MOVE_DIRECTIONS = {'up': 'UP', 'down': 'DOWN', 'left': 'LEFT', 'right': 'RIGHT'}
+
+
+class SpriteCache:
+    """
+    Pre-rendered tile images of one tile size, keyed by (value, type).
+    One instance per tile size is shared by every session in the process (see
+    get_sprites), so each tile is drawn once and then pasted onto any board.
+    """
+    def __init__(self, tile_size=TILE_SIZE):
+        self.tile_size = tile_size
+        self.scale = tile_size / TILE_SIZE
+        self._sprites = {}
+        if self.scale == 1:
+            self.font = font
+        else:
+            try:
+                self.font = ImageFont.truetype(FONT_PATH, max(8, round(FONT_SIZE * self.scale)))
+            except IOError:
+                self.font = font
+
+    def get(self, value, tile_type):
+        key = (value, tile_type)
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            sprite = self._render(value, tile_type)
+            self._sprites[key] = sprite
+        return sprite
+
+    def _render(self, value, tile_type):
+        # Rectangle corners are inclusive, so a tile covers tile_size + 1 pixels
+        size = self.tile_size + 1
+        if tile_type == 'modulo':
+            tile_color = MODULO_TILE_COLOR
+        else:
+            tile_color = TILE_COLORS.get(value, DEFAULT_TILE_COLOR)
+        sprite = Image.new("RGB", (size, size), tile_color)
+        sprite_draw = ImageDraw.Draw(sprite)
+
+        # Draw the number centred on its measured bounding box
+        text = str(value)
+        text_width, text_height = text_cache.size(text, self.font)
+        text_left, text_top = text_cache.run(text, self.font).bbox[:2]
+        text_x = (self.tile_size - text_width) / 2 - text_left
+        text_y = (self.tile_size - text_height) / 2 - text_top
+        sprite_draw.text((text_x, text_y), text, font=self.font, fill=TEXT_COLOR)
+        return sprite
+
+
+_sprite_caches = {}
+
+def get_sprites(tile_size):
+    """Returns the process-wide sprite cache for a tile size."""
+    if tile_size not in _sprite_caches:
+        _sprite_caches[tile_size] = SpriteCache(tile_size)
+    return _sprite_caches[tile_size]
+
+
+_password_fonts = {}
+
+def get_password_font(max_advance):
+    """Returns the largest font (up to FONT_SIZE) whose widest password character fits max_advance pixels."""
+    if max_advance not in _password_fonts:
+        cell_font = font
+        size = FONT_SIZE
+        if isinstance(font, ImageFont.FreeTypeFont):
+            while size > 8 and text_cache.cell_width(encoder.CHARSET, cell_font) > max_advance:
+                size -= 1
+                cell_font = ImageFont.truetype(FONT_PATH, size)
+        _password_fonts[max_advance] = cell_font
+    return _password_fonts[max_advance]
+
+
+class GameSession:
+    """
+    One independent game: its own display, board, score, high score file and screens.
+    main.py runs a single session; server.py runs several in one process.
+    """
+    def __init__(self, disp, name="main", high_score_file=HIGH_SCORE_FILE, leaderboard=None, grid_size=GRID_SIZE,
+                 checkpoint=None, latency=None, save_store=None, status=None, network=None, eval_cache=None,
+                 hint_after=HINT_AFTER):
+        self.disp = disp
+        self.name = name
+        self.high_score_file = high_score_file
+        self.leaderboard = leaderboard
+        self.checkpoint = checkpoint  # CheckpointJournal, or None to keep the game in memory only
+        self.latency = latency  # LatencyTracker for input-to-photon timings, or None
+        self.save_store = save_store  # SaveStore for save slots, or None to save by password only
+        self.status = status  # StatusExport for local monitors, or None
+        self.network = network  # NTupleNetwork whose moves are shown as hints, or None
+        self.eval_cache = eval_cache  # TranspositionCache shared with other processes, or None
+        self.hint_after = hint_after  # seconds without input before a hint is shown (None: never)
+        self.metrics = SessionMetrics()  # Counters over every game (see MetricsExporter)
+        self.latency_refresh = 0  # Next redraw of the latency debug screen
+        self.grid_size = grid_size
+        self.engine = get_engine(grid_size)  # Move tables are shared by sessions of the same size
+
+        # Create blank image for drawing
+        self.width = disp.width  # Should be 240
+        self.height = disp.height  # Should be 240
+        self.image = Image.new("RGB", (self.width, self.height))
+        self.draw = ImageDraw.Draw(self.image)
+
+        # Scale the tiles so the grid fills the display, then center it
+        self.tile_size = (min(self.width, self.height) - (grid_size + 1) * TILE_THICKNESS) // grid_size
+        self.total_grid_size = grid_size * self.tile_size + (grid_size + 1) * TILE_THICKNESS
+        self.offset_x = (self.width - self.total_grid_size) // 2
+        self.offset_y = (self.height - self.total_grid_size) // 2
+        self.sprites = get_sprites(self.tile_size)
+        self.raster = get_raster(self.width, self.height, grid_size, self.tile_size, TILE_THICKNESS,
+                                 self.offset_x, self.offset_y, self.sprites, encoder.TILE_VALUES,
+                                 BACKGROUND_COLOR, GRID_COLOR)
+        self.frame = self.raster.new_frame()  # Board frame as a (height, width, 3) array
+        self.screen_frame = None  # The frame on the screen, or None when it is self.image
+        self.damage = DamageTracker(self.width, self.height)  # What the display shows, for partial updates
+        self.windowed = True  # The display accepts windows (x/y); cleared if it turns out not to
+        self.suspended = False  # Set while idle (see IdleManager): screens are drawn but not sent
+        self.last_frame_time = 0.0  # seconds the last transfer to the display took
+        self.average_frame_time = 0.0
+        print(f"[{name}] {grid_size}x{grid_size} grid, {self.tile_size} px tiles, Offsets - X: {self.offset_x}, Y: {self.offset_y}")
+
+        # Initialize the current state
+        self.current_state = STATE_MAIN_MENU
+        print(f"[{name}] Initial State: {self.current_state}")
+
+        # Load high score at the start
+        self.high_score = self.load_high_score()
+        self.history = GameHistory(encoder, grid_size=grid_size, max_bytes=HISTORY_MAX_BYTES)
+
+        # Initialize the game grid (tile codes, see BoardEncoder.TILE_VALUES) and score
+        self.grid = self.engine.empty_board()
+        self.score = 0
+        self.moves_since_last_modulo_block = 0  # Tracks the number of moves since the last modulo block
+        self.move_count = 0  # Moves made in the current game
+        self.game_modulo_merges = 0  # Modulo merges and clears since the game was started or loaded
+        self.game_modulo_clears = 0
+        self.game_start_time = time.time()
+        self.game_result = None  # True/False once the game is won/lost, until the player leaves Game Over
+        self.recorded_game = None  # Its leaderboard entry, taken back if the game is rewound
+        self.rng = random.Random()  # Tile spawns; its state is kept in save slots
+
+        # Initialize press counts
+        self.left_press_count = 0
+        self.right_press_count = 0
+
+        # Initialize Password Variables
+        self.password_length = encoder.password_length(grid_size)  # 11 characters for a 4x4 board
+        self.password_input = encoder.CHARSET[0] * self.password_length  # Initialize to "AAA..."
+        self.current_selection = 0  # Index for password input
+        self.password_cells = None  # (font, cell box per character, glyph y offset), see layout_password
+        self.password_dirty = set()  # Cells to redraw at the end of the event batch
+        self.scroll_button = None  # Held up/down button and when its repeats started (see scroll_steps)
+        self.scroll_start = 0
+        self.scroll_last = 0
+
+        # Save slot screens
+        self.slot_selection = 0
+        self.slot_list = []  # (score, saved at) or None per slot, as last drawn
+        self.slot_rows = []  # Screen box of every slot row
+
+        # Time until which an error message stays on screen (0 when none is shown)
+        self.message_until = 0
+        self.ignored_events = 0  # Presses discarded while an error message was shown
+
+        # State recorded by the last checkpoint snapshot
+        self.checkpoint_state = None
+
+        # Moves and frames prepared while idle (see speculate)
+        self.speculation_key = None  # Board the speculation was made for
+        self.speculation = {}  # direction -> [new grid, points, pre-rendered frame or None]
+        self.frame_ready = False  # self.frame already shows the board after the last move
+
+        # Hints (see show_hint)
+        self.last_input = time.time()
+        self.hint_key = None  # Board the hint was last worked out for
+
+    def start(self):
+        """Draws the first screen, or the restored game after a crash."""
+        if self.checkpoint is not None and self.restore_checkpoint():
+            self.draw_debug_grid()
+        else:
+            self.draw_main_menu()
+        self.publish_status()
+
+    def publish_status(self):
+        """Updates the live status record, if the session has one."""
+        if self.status is None:
+            return
+        try:
+            self.status.publish(self)
+        except Exception as e:
+            self.metrics.errors += 1
+            print("Error publishing status:", e)
+
+    def restore_checkpoint(self):
+        """
+        Resumes the game in progress from the checkpoint journal.
+
+        Returns:
+            bool: True if a game was resumed.
+        """
+        try:
+            saved = self.checkpoint.restore()
+        except Exception as e:
+            self.metrics.errors += 1
+            print("Error restoring checkpoint:", e)
+            traceback.print_exc(file=sys.stdout)
+            return False
+        if saved is None or saved['state'] not in RESUMABLE_STATES:
+            return False
+        self.grid = saved['grid']
+        self.score = saved['score']
+        self.moves_since_last_modulo_block = saved['moves_since_last_modulo_block']
+        self.move_count = saved['move_count']
+        self.game_start_time = time.time() - saved['elapsed']
+        self.game_modulo_merges = self.game_modulo_clears = 0
+        self.current_state = STATE_GAME
+        print(f"[{self.name}] Resumed game: score {self.score}, {self.move_count} moves.")
+        # Start a fresh journal on top of the restored state
+        self.save_checkpoint()
+        return True
+
+    def save_checkpoint(self):
+        """Writes a full checkpoint snapshot of the current game."""
+        if self.checkpoint is None:
+            return
+        try:
+            self.checkpoint.snapshot(self.grid, self.score, self.moves_since_last_modulo_block, self.move_count,
+                                     time.time() - self.game_start_time, self.current_state)
+            self.checkpoint_state = self.current_state
+        except Exception as e:
+            self.metrics.errors += 1
+            print("Error writing checkpoint:", e)
+            traceback.print_exc(file=sys.stdout)
+
+    def load_high_score(self):
+        if not os.path.exists(self.high_score_file):
+            print("High score file not found. Initializing to 0.")
+            return 0
+        with open(self.high_score_file, 'r') as f:
+            try:
+                hs = int(f.read())
+                print(f"High score loaded: {hs}")
+                return hs
+            except ValueError:
+                print("High score file corrupted. Resetting to 0.")
+                return 0
+
+    def save_high_score(self, new_high_score):
+        try:
+            with open(self.high_score_file, 'w') as f:
+                f.write(str(new_high_score))
+            self.metrics.high_score_writes += 1
+            print(f"High score saved: {new_high_score}")
+        except Exception as e:
+            self.metrics.errors += 1
+            print("Error saving high score:", e)
+            traceback.print_exc(file=sys.stdout)
+
+    def add_random_tile(self):
+        """
+        Adds a random tile to an empty spot on the board.
+        Every modulo_interval moves (4 in the classic rules), adds a modulo block instead.
+
+        Returns:
+            tuple: (flat cell index, tile code) of the new tile, or None if the board is full.
+        """
+        empty_cells = np.flatnonzero(self.grid == 0).tolist()
+        if not empty_cells:
+            return None
+        cell = self.rng.choice(empty_cells)
+        i, j = divmod(cell, self.grid_size)
+        if self.moves_since_last_modulo_block >= self.engine.modulo_interval:
+            # Add a modulo block
+            self.grid[i, j] = self.engine.spawn_code(self.rng.random(), modulo=True)
+            self.moves_since_last_modulo_block = 0  # Reset the counter
+            print(f"Added modulo block {self.engine.tile(self.grid[i, j])[0]} at position ({i}, {j}).")
+        else:
+            # Add a normal block
+            self.grid[i, j] = self.engine.spawn_code(self.rng.random(), modulo=False)
+            print(f"Added tile {self.engine.tile(self.grid[i, j])[0]} at position ({i}, {j}).")
+        return cell, int(self.grid[i, j])
+
+
+    def print_debug_grid(self):
+        border = "+------" * self.grid_size + "+"
+        print("\nCurrent Grid State:")
+        for row in self.grid:
+            print(border)
+            print("|", end="")
+            for code in row:
+                value, tile_type = encoder.TILE_VALUES[code]
+                if value == 0:
+                    print(f" {'.':<5}|", end="")
+                else:
+                    tile_char = f"{value}{'M' if tile_type=='modulo' else ''}"
+                    print(f" {tile_char:<5}|", end="")
+            print()
+        print(border)
+        print(f"Score: {self.score}  High Score: {self.high_score}\n")
+
+
+    def draw_debug_grid(self):
+        """
+        Draws the grid and tiles on the display.
+        """
+        try:
+            print("Drawing Debug Grid...")
+            start = time.perf_counter()
+            self.raster.compose(self.frame, self.grid)  # The array is the screen; no PIL image is filled
+            self.metrics.render_seconds += time.perf_counter() - start
+            self.metrics.render_count += 1
+            if self.latency is not None:
+                self.latency.mark('compose')
+
+            # Update the display with the drawn image
+            self.present(self.frame)
+            if self.latency is not None:
+                self.latency.mark('spi')
+            print("Debug Grid displayed successfully.")
+
+            # Print the debug grid to the terminal
+            self.print_debug_grid()
+        except Exception as e:
+            self.metrics.errors += 1
+            print("Error in draw_debug_grid:", e)
+            traceback.print_exc(file=sys.stdout)
+
+    def present_board(self):
+        """
+        Shows the board after a move. If the move used a pre-rendered frame, that
+        frame already holds the board and is sent as it is; otherwise the board
+        is composed from scratch.
+        """
+        if not self.frame_ready:
+            self.draw_debug_grid()
+            return
+        try:
+            if self.latency is not None:
+                self.latency.mark('compose')  # Only the spawned tile was drawn
+            self.present(self.frame)
+            if self.latency is not None:
+                self.latency.mark('spi')
+            print("Pre-rendered grid displayed.")
+            self.print_debug_grid()
+        except Exception as e:
+            self.metrics.errors += 1
+            print("Error in present_board:", e)
+            traceback.print_exc(file=sys.stdout)
+
+    def present(self, frame=None):
+        """
+        Sends the screen to the display, but only the rectangles that changed
+        since the last frame sent (see DamageTracker). frame is the screen as an
+        array (the board); without it, the screen is self.image. A PIL image of
+        the board is only made if the display driver needs one.
+        """
+        self.screen_frame = frame  # What present(self.screen_frame) shows again
+        if self.suspended:
+            return  # Sent when the session wakes up
+        if frame is None:
+            self.show_frame(np.asarray(self.image), self.image)
+        else:
+            self.show_frame(frame)
+
+    def show_frame(self, frame, image=None):
+        """
+        Sends the changed rectangles of any frame array (the screen, or an
+        attract loop frame). image is the same frame as a PIL image, if there is one.
+        """
+        boxes = self.damage.damage(frame)
+        start = time.perf_counter()
+        try:
+            if self.windowed and boxes:
+                try:
+                    self.send_windows(frame, image, boxes)
+                    return
+                except (TypeError, ValueError):
+                    # Once per frame, whatever the window count: this frame and the later ones go whole
+                    print(f"[{self.name}] Display does not take windows. Sending whole frames.")
+                    self.windowed = False
+            if boxes:
+                self.disp.image(image if image is not None else Image.fromarray(frame))
+        except Exception:
+            self.damage.reset()  # The display content is unknown after a failed transfer
+            raise
+        finally:
+            if boxes:
+                self.last_frame_time = time.perf_counter() - start
+                self.metrics.spi_seconds += self.last_frame_time
+                self.metrics.spi_count += 1
+                self.average_frame_time += (self.last_frame_time - self.average_frame_time) * FRAME_TIME_SMOOTHING
+
+    def send_windows(self, frame, image, boxes):
+        """
+        Sends the (x0, y0, x1, y1) rectangles of frame. Drivers that rotate
+        images in software (adafruit_rgb_display) get each window at its
+        place on the unrotated panel.
+        """
+        if hasattr(self.disp, 'write_pixels'):
+            for x0, y0, x1, y1 in boxes:
+                self.disp.write_pixels(x0, y0, frame[y0:y1, x0:x1])  # No PIL crop needed
+            return
+        if image is None:
+            image = Image.fromarray(frame)
+        height, width = frame.shape[:2]
+        rotation = getattr(self.disp, 'rotation', 0)
+        for box in boxes:
+            x, y = panel_origin(box, width, height, rotation)
+            self.disp.image(image.crop(box), x=x, y=y)
+
+    def speculate(self):
+        """
+        Idle work while the player thinks. The first call on a new board computes
+        the result of all four moves (before the random spawn); each later call
+        pre-renders the frame of one of them. A move that was prepared only needs
+        its spawned tile drawn (see handle_move).
+
+        Returns:
+            bool: True if work was done, False when everything is prepared.
+        """
+        if self.current_state != STATE_GAME or self.message_until or self.suspended:
+            return False
+        key = self.grid.tobytes()
+        if key != self.speculation_key:
+            self.speculation_key = key
+            self.speculation = {}
+            legal = self.engine.legal_moves(self.grid)
+            for direction in DIRECTIONS:
+                if legal & MOVE_BITS[direction]:
+                    new_grid, _, move_score = self.engine.move(self.grid, direction)
+                    self.speculation[direction] = [new_grid, move_score, None]
+            return True
+        for entry in self.speculation.values():
+            if entry[2] is None:
+                frame = np.empty_like(self.frame)
+                self.raster.compose(frame, entry[0])
+                entry[2] = frame
+                return True
+        return False
+
+    def hint(self):
+        """
+        The network's move for the current board, or None without a network or
+        when no move is left. Positions any process evaluated before are answered
+        from the shared evaluation cache.
+        """
+        if self.network is None:
+            return None
+        try:
+            return self.network.hint(self.grid, self.moves_since_last_modulo_block, self.eval_cache)
+        except Exception as e:
+            self.metrics.errors += 1
+            print("Error computing hint:", e)
+            traceback.print_exc(file=sys.stdout)
+            return None
+
+    def show_hint(self):
+        """Marks the side of the board the hinted move goes to, once per board."""
+        key = self.grid.tobytes()
+        if key == self.hint_key:
+            return
+        self.hint_key = key
+        direction = self.hint()
+        if direction is None:
+            return
+        print(f"[{self.name}] Hint: {direction}")
+        frame = self.frame.copy()  # self.frame stays the plain board for the next move
+        self.raster.mark_edge(frame, direction, HINT_COLOR)
+        self.present(frame)
+
+
+    def draw_main_menu(self):
+        """
+        Draws the main menu screen with game rules, high score, and options.
+        """
+        try:
+            print("Drawing Main Menu...")
+            # Clear the background
+            self.draw.rectangle((0, 0, self.width, self.height), outline=0, fill=BACKGROUND_COLOR)
+            print("Background cleared.")
+
+            # Define text content
+            title_text = "Modulo 2048"
+            rules_text = "" #"Swipe tiles to combine\nand reach 2048!"
+            high_score_text = f"High Score: {self.high_score}"
+            start_option = "A: Start Game"
+            reset_option = "B: Reset Score"
+            leaderboard_option = "Down: Top 10"
+
+            # Define positions with appropriate y-coordinates
+            margin_top = 10  # Top margin in pixels
+            spacing = 20      # Spacing between elements in pixels
+
+            # Draw Title
+            title_width, title_height = text_cache.size(title_text, font)
+            title_x = (self.width - title_width) / 2
+            title_y = margin_top
+            text_cache.draw(self.image, (title_x, title_y), title_text, font, (255, 255, 255))
+            print(f"Title '{title_text}' drawn at ({title_x}, {title_y}).")
+
+            # Draw Rules
+            rules_width, rules_height = text_cache.size(rules_text, font)
+            rules_x = (self.width - rules_width) / 2
+            rules_y = title_y + title_height + spacing
+            self.draw.multiline_text((rules_x, rules_y), rules_text, font=font, fill=(255, 255, 255), align="center")
+            print(f"Rules drawn at ({rules_x}, {rules_y}).")
+
+            # Draw High Score
+            high_score_width, high_score_height = text_cache.size(high_score_text, font)
+            high_score_x = (self.width - high_score_width) / 2
+            high_score_y = rules_y + rules_height + spacing
+            text_cache.draw(self.image, (high_score_x, high_score_y), high_score_text, font, (255, 255, 255))
+            print(f"High Score '{high_score_text}' drawn at ({high_score_x}, {high_score_y}).")
+
+            # Draw Start Option
+            start_width, start_height = text_cache.size(start_option, font)
+            start_x = (self.width - start_width) / 2
+            start_y = high_score_y + high_score_height + spacing
+            text_cache.draw(self.image, (start_x, start_y), start_option, font, (0, 255, 0))  # Green for Start
+            print(f"Start Option '{start_option}' drawn at ({start_x}, {start_y}).")
+
+            # Draw Reset Option
+            reset_width, reset_height = text_cache.size(reset_option, font)
+            reset_x = (self.width - reset_width) / 2
+            reset_y = start_y + start_height + spacing
+            text_cache.draw(self.image, (reset_x, reset_y), reset_option, font, (255, 0, 0))  # Red for Reset
+            print(f"Reset Option '{reset_option}' drawn at ({reset_x}, {reset_y}).")
+
+            # Draw Leaderboard Option
+            if self.leaderboard is not None:
+                leaderboard_width, _ = text_cache.size(leaderboard_option, font)
+                leaderboard_x = (self.width - leaderboard_width) / 2
+                leaderboard_y = reset_y + reset_height + spacing
+                text_cache.draw(self.image, (leaderboard_x, leaderboard_y), leaderboard_option, font, (255, 255, 0))  # Yellow for Top 10
+                print(f"Leaderboard Option '{leaderboard_option}' drawn at ({leaderboard_x}, {leaderboard_y}).")
+
+            # Update the display
+            self.present()
+            print("Main Menu displayed successfully.")
+        except Exception as e:
+            self.metrics.errors += 1
+            print("Error in draw_main_menu:", e)
+            traceback.print_exc(file=sys.stdout)
+
+
+    def draw_game_over_screen(self, won=False):
+        """
+        Draws the Game Over screen indicating whether the player has won or lost.
+    
+        Args:
+            won (bool): True if the player has won, False otherwise.
+        """
+        try:
+            print("Drawing Game Over Screen...")
+            # Clear the background
+            self.draw.rectangle((0, 0, self.width, self.height), outline=0, fill=BACKGROUND_COLOR)
+            print("Background cleared.")
+
+            # Define text content
+            result_text = "You Won!" if won else "Game Over!"
+            high_score_text = f"Your Score: {self.score}"
+            restart_option = "A: Restart Game"
+            main_menu_option = "B: Main Menu"
+            rewind_option = "C: Rewind"
+
+            # Define positions with appropriate y-coordinates
+            margin_top = 10  # Top margin
+            spacing = 20      # Spacing between elements
+
+            # Draw Result Text
+            result_width, result_height = text_cache.size(result_text, font)
+            result_x = (self.width - result_width) / 2
+            result_y = margin_top
+            text_cache.draw(self.image, (result_x, result_y), result_text, font, (255, 255, 255))
+            print(f"Result text '{result_text}' drawn at ({result_x}, {result_y}).")
+
+            # Draw High Score
+            high_score_width, high_score_height = text_cache.size(high_score_text, font)
+            high_score_x = (self.width - high_score_width) / 2
+            high_score_y = result_y + result_height + spacing
+            text_cache.draw(self.image, (high_score_x, high_score_y), high_score_text, font, (255, 255, 255))
+            print(f"High Score '{high_score_text}' drawn at ({high_score_x}, {high_score_y}).")
+
+            # Draw Restart Option
+            restart_width, restart_height = text_cache.size(restart_option, font)
+            restart_x = (self.width - restart_width) / 2
+            restart_y = high_score_y + high_score_height + spacing
+            text_cache.draw(self.image, (restart_x, restart_y), restart_option, font, (0, 255, 0))  # Green for Restart
+            print(f"Restart Option '{restart_option}' drawn at ({restart_x}, {restart_y}).")
+
+            # Draw Main Menu Option
+            main_menu_width, main_menu_height = text_cache.size(main_menu_option, font)
+            main_menu_x = (self.width - main_menu_width) / 2
+            main_menu_y = restart_y + restart_height + spacing
+            text_cache.draw(self.image, (main_menu_x, main_menu_y), main_menu_option, font, (255, 0, 0))  # Red for Main Menu
+            print(f"Main Menu Option '{main_menu_option}' drawn at ({main_menu_x}, {main_menu_y}).")
+
+            # Draw Rewind Option (only when there is a move to undo)
+            if REWIND_ON_GAME_OVER and self.history.can_undo():
+                rewind_width, _ = text_cache.size(rewind_option, font)
+                rewind_x = (self.width - rewind_width) / 2
+                rewind_y = main_menu_y + main_menu_height + spacing
+                text_cache.draw(self.image, (rewind_x, rewind_y), rewind_option, font, (255, 255, 0))  # Yellow for Rewind
+                print(f"Rewind Option '{rewind_option}' drawn at ({rewind_x}, {rewind_y}).")
+
+            # Update the display
+            self.present()
+            print("Game Over Screen displayed successfully.")
+        except Exception as e:
+            self.metrics.errors += 1
+            print("Error in draw_game_over_screen:", e)
+            traceback.print_exc(file=sys.stdout)
+
+
+    def draw_leaderboard_screen(self):
+        """
+        Draws the top 10 finished games of this session from the in-memory leaderboard.
+        """
+        try:
+            print("Drawing Leaderboard Screen...")
+            # Clear the background
+            self.draw.rectangle((0, 0, self.width, self.height), outline=0, fill=BACKGROUND_COLOR)
+
+            title_text = "Top 10"
+            margin_top = 4
+            line_height = LEADERBOARD_FONT_SIZE + 3
+
+            # Draw Title
+            title_width, title_height = text_cache.size(title_text, font)
+            text_cache.draw(self.image, ((self.width - title_width) / 2, margin_top), title_text, font, (255, 255, 255))
+
+            # Draw one line per game: rank, score and max tile
+            entries = self.leaderboard.top(self.name)
+            current_y = margin_top + title_height + 12
+            if not entries:
+                text_cache.draw(self.image, (10, current_y), "No games yet.", small_font, (255, 255, 255))
+            for rank, entry in enumerate(entries, start=1):
+                fill = (0, 255, 0) if entry['won'] else (255, 255, 255)
+                text_cache.draw(self.image, (10, current_y), f"{rank:>2}.", small_font, fill)
+                text_cache.draw(self.image, (50, current_y), str(entry['score']), small_font, fill)
+                text_cache.draw(self.image, (150, current_y), str(entry['max_tile']), small_font, TILE_COLORS.get(entry['max_tile'], fill))
+                current_y += line_height
+
+            # Update the display
+            self.present()
+            print("Leaderboard Screen displayed successfully.")
+        except Exception as e:
+            self.metrics.errors += 1
+            print("Error in draw_leaderboard_screen:", e)
+            traceback.print_exc(file=sys.stdout)
+
+    def draw_latency_screen(self):
+        """
+        Draws the rolling input-to-photon latency percentiles per stage (debug screen).
+        """
+        try:
+            # Clear the background
+            self.draw.rectangle((0, 0, self.width, self.height), outline=0, fill=BACKGROUND_COLOR)
+
+            title_text = "Latency (ms)"
+            margin_top = 4
+            line_height = LEADERBOARD_FONT_SIZE + 6
+
+            # Draw Title
+            title_width, title_height = text_cache.size(title_text, font)
+            text_cache.draw(self.image, ((self.width - title_width) / 2, margin_top), title_text, font, (255, 255, 255))
+
+            # Draw one line per stage: p50, p95 and p99
+            current_y = margin_top + title_height + 12
+            columns = (10, 100, 145, 190)
+            for x, label in zip(columns, ("stage", "p50", "p95", "p99")):
+                text_cache.draw(self.image, (x, current_y), label, small_font, (255, 255, 0))
+            current_y += line_height
+            samples = 0
+            for stage, (count, values) in self.latency.report().items():
+                text_cache.draw(self.image, (columns[0], current_y), stage, small_font, (255, 255, 255))
+                for x, value in zip(columns[1:], values):
+                    text = "-" if value is None else f"{value:.1f}"
+                    text_cache.draw(self.image, (x, current_y), text, small_font, (255, 255, 255))
+                samples = max(samples, count)
+                current_y += line_height
+            text_cache.draw(self.image, (columns[0], current_y + 4), f"{samples} samples, last minute", small_font, (128, 128, 128))
+
+            # Update the display
+            self.present()
+            self.latency_refresh = time.time() + LATENCY_SCREEN_REFRESH
+        except Exception as e:
+            self.metrics.errors += 1
+            print("Error in draw_latency_screen:", e)
+            traceback.print_exc(file=sys.stdout)
+
+    def draw_how_to_play(self):
+        try:
+            print("Drawing How to Play Screen...")
+            # Clear the background
+            self.draw.rectangle((0, 0, self.width, self.height), outline=0, fill=BACKGROUND_COLOR)
+            print("Background cleared.")
+
+            # Define text content
+            title_text = "How to Play"
+            instructions = [
+                "Use the 4-way joystick to move the tiles.",
+                "Button A: Reset the board.",
+                "Button B: Return to Main Menu.",
+                "Button C: Save/Load game."
+            ]
+
+            # Define positions using percentages for better alignment
+            margin_top = self.height * 0.05  # 5% from top
+            spacing = self.height * 0.05  # 5% spacing
+            margin_x = self.width * 0.05  # 5% on each side
+            current_y = margin_top
+
+            # Draw Title (centred on its measured width)
+            title_width, title_height = text_cache.size(title_text, font)
+            title_x = (self.width - title_width) / 2
+            text_cache.draw(self.image, (title_x, current_y), title_text, font, (255, 255, 255))
+            print(f"Title '{title_text}' drawn at ({title_x}, {current_y}).")
+            current_y += title_height + spacing
+
+            # Draw Instructions, wrapped to the screen width
+            line_height = LEADERBOARD_FONT_SIZE + 4
+            for instruction in instructions:
+                for line in text_cache.wrap(instruction, small_font, self.width - 2 * margin_x):
+                    line_width, _ = text_cache.size(line, small_font)
+                    line_x = (self.width - line_width) / 2
+                    text_cache.draw(self.image, (line_x, current_y), line, small_font, (255, 255, 255))
+                    print(f"Instruction '{line}' drawn at ({line_x}, {current_y}).")
+                    current_y += line_height
+                current_y += 5  # Small spacing between instructions
+
+            # Update the display
+            self.present()
+            print("How to Play Screen displayed successfully.")
+        except Exception as e:
+            self.metrics.errors += 1
+            print("Error in draw_how_to_play:", e)
+            traceback.print_exc(file=sys.stdout)
+
+    def draw_password_load_screen(self):
+        """
+        Draws the Password Load screen accessed from the Main Menu.
+        """
+        try:
+            print("Drawing Password Load Screen...")
+            # Clear the background
+            self.draw.rectangle((0, 0, self.width, self.height), outline=0, fill=BACKGROUND_COLOR)
+            print("Background cleared.")
+
+            # Define text content
+            title_text = "Enter"
+            subtitle_text = "password"
+            prompt_text = "Password:"
+            password_display = self.password_input  
+
+            # Define positions with appropriate y-coordinates
+            margin_top = 10  # Top margin
+            spacing = 20      # Spacing between elements
+
+            # Draw Title
+            title_width, title_height = text_cache.size(title_text, font)
+            title_x = (self.width - title_width) / 2
+            title_y = margin_top
+            text_cache.draw(self.image, (title_x, title_y), title_text, font, (255, 255, 255))
+            print(f"Title '{title_text}' drawn at ({title_x}, {title_y}).")
+
+            # Draw Subtitle
+            subtitle_width, subtitle_height = text_cache.size(subtitle_text, font)
+            subtitle_x = (self.width - subtitle_width) / 2
+            subtitle_y = title_y + title_height + spacing
+            text_cache.draw(self.image, (subtitle_x, subtitle_y), subtitle_text, font, (255, 255, 255))
+            print(f"Subtitle '{subtitle_text}' drawn at ({subtitle_x}, {subtitle_y}).")
+
+            # Draw Prompt Text
+            prompt_width, prompt_height = text_cache.size(prompt_text, font)
+            prompt_x = (self.width - prompt_width) / 2
+            prompt_y = subtitle_y + subtitle_height + spacing
+            text_cache.draw(self.image, (prompt_x, prompt_y), prompt_text, font, (255, 255, 255))
+            print(f"Prompt '{prompt_text}' drawn at ({prompt_x}, {prompt_y}).")
+
+            # Draw Password, one cell per character; the current selection is boxed
+            password_y = prompt_y + prompt_height + 10  # Slight spacing before password
+            self.layout_password(password_y)
+            for index in range(self.password_length):
+                self.draw_password_cell(index)
+            print(f"Password '{password_display}' drawn at y={password_y}, selection at index {self.current_selection}.")
+
+            # Update the display
+            self.present()
+            print("Password Load Screen displayed successfully.")
+        except Exception as e:
+            self.metrics.errors += 1
+            print("Error in draw_password_load_screen:", e)
+            traceback.print_exc(file=sys.stdout)
+
+    def draw_password_save_screen(self):
+        """
+        Draws the Password Save screen accessed during gameplay.
+        """
+        try:
+            print("Drawing Password Save Screen...")
+            # Clear the background
+            self.draw.rectangle((0, 0, self.width, self.height), outline=0, fill=BACKGROUND_COLOR)
+            print("Background cleared.")
+
+            # Define text content
+            title_text = "Save Game"
+            prompt_text = "Password:"
+            password_display = self.password_input  # Should be the generated password
+
+            # Define positions with appropriate y-coordinates
+            margin_top = 10  # Top margin
+            spacing = 20      # Spacing between elements
+
+            # Draw Title
+            title_width, title_height = text_cache.size(title_text, font)
+            title_x = (self.width - title_width) / 2
+            title_y = margin_top
+            text_cache.draw(self.image, (title_x, title_y), title_text, font, (255, 255, 255))
+            print(f"Title '{title_text}' drawn at ({title_x}, {title_y}).")
+
+            # Draw Prompt Text
+            prompt_width, prompt_height = text_cache.size(prompt_text, font)
+            prompt_x = (self.width - prompt_width) / 2
+            prompt_y = title_y + title_height + spacing
+            text_cache.draw(self.image, (prompt_x, prompt_y), prompt_text, font, (255, 255, 255))
+            print(f"Prompt '{prompt_text}' drawn at ({prompt_x}, {prompt_y}).")
+
+            # Draw Password
+            password_y = prompt_y + prompt_height + 10  # Slight spacing before password
+            self.layout_password(password_y)
+            for index in range(self.password_length):
+                self.draw_password_cell(index, selected=False)
+            print(f"Password '{password_display}' drawn at y={password_y}.")
+
+            # Update the display
+            self.present()
+            print("Password Save Screen displayed successfully.")
+        except Exception as e:
+            self.metrics.errors += 1
+            print("Error in draw_password_save_screen:", e)
+            traceback.print_exc(file=sys.stdout)
+
+
+    def draw_slot_screen(self):
+        """
+        Draws the save slot list: Save Game during play, Load Game from the Main Menu.
+        """
+        saving = self.current_state == STATE_SLOT_SAVE
+        try:
+            self.slot_list = self.save_store.list_slots()
+        except Exception as e:
+            self.metrics.errors += 1
+            print("Error reading save slots:", e)
+            traceback.print_exc(file=sys.stdout)
+            # Go back to the screen the slots were opened from
+            self.current_state = STATE_GAME if saving else STATE_MAIN_MENU
+            self.draw_error_message("Save File Error!")
+            return
+        try:
+            print(f"Drawing {'Save' if saving else 'Load'} Slot Screen...")
+            # Clear the background
+            self.draw.rectangle((0, 0, self.width, self.height), outline=0, fill=BACKGROUND_COLOR)
+
+            title_text = "Save Game" if saving else "Load Game"
+            hint_text = "C: Save  A: Password" if saving else "C: Load  A: Password"
+            margin_top = 4
+            line_height = LEADERBOARD_FONT_SIZE + 4
+
+            # Draw Title
+            title_width, title_height = text_cache.size(title_text, font)
+            text_cache.draw(self.image, ((self.width - title_width) / 2, margin_top), title_text, font, (255, 255, 255))
+
+            # Draw one row per slot
+            top = margin_top + title_height + 10
+            self.slot_rows = [(0, top + slot * line_height, self.width, top + (slot + 1) * line_height)
+                              for slot in range(len(self.slot_list))]
+            for slot in range(len(self.slot_list)):
+                self.draw_slot_row(slot)
+
+            # Draw Hint
+            hint_width, hint_height = text_cache.size(hint_text, small_font)
+            text_cache.draw(self.image, ((self.width - hint_width) / 2, self.height - hint_height - 6), hint_text,
+                            small_font, (255, 255, 0))
+
+            # Update the display
+            self.present()
+            print("Slot Screen displayed successfully.")
+        except Exception as e:
+            self.metrics.errors += 1
+            print("Error in draw_slot_screen:", e)
+            traceback.print_exc(file=sys.stdout)
+
+    def draw_slot_row(self, slot):
+        """Draws one slot row (boxed if it is selected) and returns its screen box."""
+        box = self.slot_rows[slot]
+        self.draw.rectangle((box[0], box[1], box[2] - 1, box[3] - 1), fill=BACKGROUND_COLOR)
+        y = box[1] + 2
+        text_cache.draw(self.image, (10, y), f"{slot + 1}.", small_font, (255, 255, 255))
+        summary = self.slot_list[slot]
+        if summary is None:
+            text_cache.draw(self.image, (40, y), "empty", small_font, (128, 128, 128))
+        else:
+            score, saved_at = summary
+            text_cache.draw(self.image, (40, y), str(score), small_font, (0, 255, 0))
+            text_cache.draw(self.image, (120, y), time.strftime("%m-%d %H:%M", time.localtime(saved_at)),
+                            small_font, (255, 255, 255))
+        if slot == self.slot_selection:
+            self.draw.rectangle((box[0] + 4, box[1], box[2] - 5, box[3] - 1), outline=(255, 0, 0), width=2)
+        return box
+
+    def save_to_slot(self, slot):
+        """Saves the current game (with the tile RNG state) to a slot and returns to the game."""
+        try:
+            self.save_store.save(slot, self.grid, self.score, self.moves_since_last_modulo_block, self.move_count,
+                                 time.time() - self.game_start_time, self.rng.getstate())
+        except Exception as e:
+            self.metrics.errors += 1
+            print("Error saving game:", e)
+            traceback.print_exc(file=sys.stdout)
+            self.draw_error_message("Save Failed!")
+            return
+        self.current_state = STATE_GAME
+        self.draw_debug_grid()
+
+    def load_from_slot(self, slot):
+        """Resumes the game stored in a slot exactly where it was saved."""
+        try:
+            saved = self.save_store.load(slot)
+        except Exception as e:
+            self.metrics.errors += 1
+            print("Error loading game:", e)
+            traceback.print_exc(file=sys.stdout)
+            saved = None
+        if saved is None:
+            self.draw_error_message("Empty Slot!")
+            return
+        self.grid = saved['grid']
+        self.score = saved['score']
+        self.moves_since_last_modulo_block = saved['moves_since_last_modulo_block']
+        self.move_count = saved['move_count']
+        self.game_start_time = time.time() - saved['elapsed']
+        self.game_modulo_merges = self.game_modulo_clears = 0
+        self.rng.setstate(saved['rng_state'])
+        self.history.clear()
+        print(f"[{self.name}] Loaded slot {slot + 1}: score {self.score}, {self.move_count} moves.")
+        self.current_state = STATE_GAME
+        self.save_checkpoint()
+        self.draw_debug_grid()
+
+    def layout_password(self, top):
+        """
+        Places the password in fixed-width cells from y=top, one per character, so
+        changing a character or moving the selection redraws only the cells involved.
+        The font is the largest that fits the widest character into a cell.
+        """
+        rows = -(-self.password_length // PASSWORD_ROW_CHARS)
+        per_row = -(-self.password_length // rows)
+        max_advance = (self.width - 8) // per_row - 2 * PASSWORD_CELL_PADDING
+        while True:
+            cell_font = get_password_font(max_advance)
+            cell_width = int(text_cache.cell_width(encoder.CHARSET, cell_font) + 0.5) + 2 * PASSWORD_CELL_PADDING
+            glyph_top, glyph_bottom = text_cache.run(encoder.CHARSET, cell_font).bbox[1::2]
+            cell_height = glyph_bottom - glyph_top + 2 * PASSWORD_CELL_PADDING
+            # Shrink the font until every row fits above the bottom of the screen
+            if top + rows * (cell_height + 4) <= self.height or max_advance <= 8:
+                break
+            max_advance -= 1
+
+        boxes = []
+        for row in range(rows):
+            count = min(per_row, self.password_length - row * per_row)
+            left = (self.width - count * cell_width) // 2
+            y = top + row * (cell_height + 4)
+            boxes.extend((left + i * cell_width, y, left + (i + 1) * cell_width, y + cell_height) for i in range(count))
+        self.password_cells = (cell_font, boxes, PASSWORD_CELL_PADDING - glyph_top)
+
+    def draw_password_cell(self, index, selected=None):
+        """Draws one password character (boxed if it is the current selection) and returns its cell box."""
+        cell_font, boxes, glyph_y = self.password_cells
+        box = boxes[index]
+        self.draw.rectangle((box[0], box[1], box[2] - 1, box[3] - 1), fill=BACKGROUND_COLOR)
+        text_cache.draw_cell(self.image, box[0], box[1] + glyph_y, box[2] - box[0],
+                             self.password_input[index], cell_font, (0, 255, 0))
+        if selected is None:
+            selected = index == self.current_selection
+        if selected:
+            self.draw.rectangle((box[0], box[1], box[2] - 1, box[3] - 1), outline=(255, 0, 0), width=2)
+        return box
+
+    def update_password_cells(self, indices):
+        """Redraws only the given password cells; present() sends just the blocks they cover."""
+        for index in indices:
+            self.draw_password_cell(index)
+        self.present()
+
+    def scroll_steps(self, button):
+        """
+        Characters one up/down event scrolls by: 1, or more once the button has
+        been held (auto-repeating) for the times in SCROLL_ACCELERATION.
+        """
+        press_time = getattr(button, 'time', None)
+        if press_time is None:
+            return 1
+        if button != self.scroll_button or press_time - self.scroll_last > SCROLL_HOLD_GAP:
+            self.scroll_button = str(button)
+            self.scroll_start = press_time
+        self.scroll_last = press_time
+        held = press_time - self.scroll_start
+        for hold_time, steps in SCROLL_ACCELERATION:
+            if held >= hold_time:
+                return steps
+        return 1
+
+    def scroll_password(self, direction='UP', steps=1):
+        """
+        Scroll through the charset to change a character in the password.
+
+        Args:
+            direction (str): 'UP' to increment, 'DOWN' to decrement.
+            steps (int): Characters to move by.
+
+        Returns:
+            str: Updated password string.
+        """
+        # Ensure password has the full length
+        if len(self.password_input) < self.password_length:
+            self.password_input += encoder.CHARSET[0] * (self.password_length - len(self.password_input))
+
+        # Update the current character based on direction
+        current_char = self.password_input[self.current_selection]
+        char_index = encoder.CHARSET.index(current_char)
+
+        if direction == 'UP':
+            char_index = (char_index + steps) % encoder.BASE
+        elif direction == 'DOWN':
+            char_index = (char_index - steps) % encoder.BASE
+
+        # Replace the character in the password
+        new_password = list(self.password_input)
+        new_password[self.current_selection] = encoder.CHARSET[char_index]
+        self.password_input = ''.join(new_password)
+
+        print(f"Password updated: {self.password_input}")
+        return self.password_input
+
+    def calculate_score_from_board(self, board):
+        # Sum of the normal tiles; modulo tiles do not count towards the score
+        return int(self.engine.code_values[board][self.engine.code_is_normal[board]].sum())
+
+
+    def draw_error_message(self, message):
+        """
+        Draws an error message on the screen.
+
+        Args:
+            message (str): The error message to display.
+        """
+        try:
+            print(f"Displaying error message: {message}")
+            # Clear the background
+            self.draw.rectangle((0, 0, self.width, self.height), outline=0, fill=BACKGROUND_COLOR)
+            print("Background cleared.")
+
+            # Define positions
+            margin_top = (self.height - 40) / 2  # Center vertically for a 40-pixel high box
+            box_height = 40
+            message_width, message_height = text_cache.size(message, font)
+            box_width = message_width + 20  # The measured message plus a 10-pixel margin each side
+            box_x = (self.width - box_width) / 2
+            box_y = margin_top
+
+            # Draw a semi-transparent rectangle as a backdrop for the message
+            self.draw.rectangle(
+                [box_x - 10, box_y - 10, box_x + box_width + 10, box_y + box_height + 10],
+                fill=(50, 50, 50)
+            )
+            print(f"Error box drawn at ({box_x - 10}, {box_y - 10}) to ({box_x + box_width + 10}, {box_y + box_height + 10}).")
+
+            # Draw the error message text
+            message_x = (self.width - message_width) / 2
+            message_y = box_y + (box_height - message_height) / 2
+            text_cache.draw(self.image, (message_x, message_y), message, font, (255, 0, 0))  # Red color for errors
+            print(f"Error message '{message}' drawn at ({message_x}, {message_y}).")
+
+            # Update the display
+            self.present()
+            print(f"Error message '{message}' displayed successfully.")
+
+            # Keep the message up for a short duration; tick() then returns to the
+            # screen of the current state. Sleeping here would stall other sessions.
+            self.message_until = time.time() + ERROR_MESSAGE_TIME
+        except Exception as e:
+            self.metrics.errors += 1
+            print("Error in draw_error_message:", e)
+            traceback.print_exc(file=sys.stdout)
+
+
+    def handle_move(self, direction, render=True):
+        """
+        Handles the move logic based on the direction input.
+
+        Args:
+            direction (str): 'LEFT', 'RIGHT', 'UP' or 'DOWN'.
+            render (bool): Redraw the board after the move. Batched moves pass False
+                and draw once at the end.
+
+        Returns:
+            bool: True if the move changed the grid.
+        """
+        if direction not in DIRECTIONS:
+            print(f"Invalid move direction: {direction}")
+            return False
+
+        frame = None
+        if self.speculation_key is not None and self.speculation_key == self.grid.tobytes():
+            # Prepared while idle: moves missing from the speculation do not change the grid
+            entry = self.speculation.get(direction)
+            if entry is not None:
+                new_grid, move_score, frame = entry
+                changed = True
+            else:
+                new_grid, changed, move_score = self.grid, False, 0
+        elif not self.engine.legal_moves(self.grid) & MOVE_BITS[direction]:
+            # Illegal move: skip the slide entirely
+            new_grid, changed, move_score = self.grid, False, 0
+        else:
+            # Slide and merge through the precompiled move tables
+            new_grid, changed, move_score = self.engine.move(self.grid, direction)
+
+        if changed:
+            merges, clears = self.engine.move_events(self.grid, direction)
+            # Keep the state before the move for the undo history
+            self.history.push(self.grid, self.score, self.moves_since_last_modulo_block, merges, clears)
+            self.metrics.modulo_merges += merges
+            self.metrics.modulo_clears += clears
+            self.game_modulo_merges += merges
+            self.game_modulo_clears += clears
+            self.grid = new_grid
+            self.score += move_score
+            self.move_count += 1
+            self.metrics.moves += 1
+            self.moves_since_last_modulo_block += 1
+            spawn = self.add_random_tile()
+            if self.checkpoint is not None:
+                self.log_checkpoint_move(direction, spawn)
+            # The speculation belonged to the old board; its frames are not reused
+            self.speculation_key = None
+            self.speculation = {}
+            if frame is not None:
+                # The frame already shows the moved board; only the spawned tile is new
+                self.frame = frame
+                if spawn is not None:
+                    self.raster.paste_tile(frame, *spawn)
+            self.frame_ready = frame is not None
+            if render:
+                self.present_board()
+
+            if self.score > self.high_score:
+                self.high_score = self.score
+                self.save_high_score(self.high_score)
+                print(f"New high score achieved: {self.high_score}")
+
+            # Check for game over conditions here
+            game_state = self.check_game_state()
+            if game_state == 'WON':
+                print(f"Congratulations! You've reached {self.engine.rules.win_tile}!")
+                self.end_game(won=True)
+            elif game_state == 'LOST':
+                print("No more moves left. Game Over!")
+                self.end_game(won=False)
+        else:
+            print(f"Move '{direction}' did not change the grid.")
+        self.publish_status()
+        return changed
+
+    def log_checkpoint_move(self, direction, spawn):
+        """Journals a move, or writes a new snapshot when the journal is due for one."""
+        try:
+            cell, code = spawn if spawn is not None else (None, 0)
+            if self.checkpoint.log_move(direction, cell, code, self.moves_since_last_modulo_block):
+                self.save_checkpoint()
+        except Exception as e:
+            self.metrics.errors += 1
+            print("Error journaling move:", e)
+            traceback.print_exc(file=sys.stdout)
+
+    def check_game_state(self):
+        """
+        Checks the current game state: WON, LOST, or GAME_NOT_OVER.
+        """
+        # Check for the winning tile (2048 in the classic rules)
+        if (self.grid == self.engine.win_code).any():
+            return 'WON'
+
+        # Any direction that still changes the board (empty cells or possible merges)
+        if self.engine.legal_moves(self.grid):
+            return 'GAME_NOT_OVER'
+
+        # No moves left
+        return 'LOST'
+
+
+    def undo_move(self):
+        """
+        Restores the state before the last move; redo_move() puts the move back.
+        During a game the board is redrawn.
+
+        Returns:
+            bool: True if a move was undone.
+        """
+        snapshot = self.history.undo(self.grid, self.score, self.moves_since_last_modulo_block)
+        if snapshot is None:
+            print("Nothing to undo.")
+            return False
+        self.grid, self.score, self.moves_since_last_modulo_block, merges, clears = snapshot
+        self.move_count -= 1
+        # The game's own counts go to the leaderboard; the session metrics keep every merge
+        self.game_modulo_merges -= merges
+        self.game_modulo_clears -= clears
+        print("Move undone.")
+        self.save_checkpoint()
+        if self.current_state == STATE_GAME:
+            self.draw_debug_grid()
+        self.publish_status()
+        return True
+
+    def redo_move(self):
+        """
+        Re-applies the last undone move, with the tile it spawned. A redone move
+        that ended the game ends it again.
+
+        Returns:
+            bool: True if a move was redone.
+        """
+        snapshot = self.history.redo(self.grid, self.score, self.moves_since_last_modulo_block)
+        if snapshot is None:
+            print("Nothing to redo.")
+            return False
+        self.grid, self.score, self.moves_since_last_modulo_block, merges, clears = snapshot
+        self.move_count += 1
+        self.game_modulo_merges += merges
+        self.game_modulo_clears += clears
+        print("Move redone.")
+        self.save_checkpoint()
+        if self.current_state == STATE_GAME:
+            game_state = self.check_game_state()
+            if game_state == 'WON':
+                self.end_game(won=True)
+            elif game_state == 'LOST':
+                self.end_game(won=False)
+            else:
+                self.draw_debug_grid()
+        self.publish_status()
+        return True
+
+
+    def end_game(self, won):
+        """
+        Switches to the Game Over screen and records the result on the leaderboard.
+        """
+        self.current_state = STATE_GAME_OVER
+        self.game_result = won
+        self.record_finished_game()
+        self.draw_game_over_screen(won=won)
+
+    def record_finished_game(self):
+        """
+        Queues the finished game for the leaderboard as soon as it ends, so a crash on the
+        Game Over screen does not lose it. It is not final yet: rewinding cancels it
+        (cancel_finished_game), leaving the screen confirms it (confirm_finished_game).
+        """
+        if self.leaderboard is None:
+            return
+        try:
+            max_tile = int(self.engine.code_values[self.grid][self.engine.code_is_normal[self.grid]].max())
+        except ValueError:
+            max_tile = 0
+        self.recorded_game = self.leaderboard.record_game(
+            session=self.name,
+            score=self.score,
+            max_tile=max_tile,
+            moves=self.move_count,
+            duration=time.time() - self.game_start_time,
+            password=encoder.save_codes_to_password(self.grid.ravel(), self.grid_size),
+            won=self.game_result,
+            grid_size=self.grid_size,
+            modulo_merges=self.game_modulo_merges,
+            modulo_clears=self.game_modulo_clears,
+            final=False
+        )
+        print(f"Game recorded: score {self.score}, max tile {max_tile}, {self.move_count} moves.")
+
+    def confirm_finished_game(self):
+        """
+        Makes the result final when the player leaves the Game Over screen, so a game
+        that is rewound and continued counts only once.
+        """
+        if self.game_result is None:
+            return
+        # Counted once the result is final: a counter that went back down would read as a reset
+        if self.game_result:
+            self.metrics.games_won += 1
+        else:
+            self.metrics.games_lost += 1
+        if self.recorded_game is not None:
+            self.leaderboard.finish_game(self.recorded_game)
+        self.recorded_game = None
+        self.game_result = None
+
+    def cancel_finished_game(self):
+        """Takes the result back when the game is rewound; the game will end again later."""
+        if self.recorded_game is not None:
+            self.leaderboard.cancel_game(self.recorded_game)
+            print("Game record cancelled: the game was rewound.")
+        self.recorded_game = None
+        self.game_result = None
+
+    def handle_move_batch(self, directions):
+        """
+        Applies several queued moves and renders the board once at the end.
+        Stops early if a move ends the game.
+
+        Args:
+            directions (list): Joystick button names ('up', 'down', 'left', 'right').
+        """
+        any_changed = False
+        for button in directions:
+            any_changed |= self.handle_move(MOVE_DIRECTIONS[button], render=False)
+            if self.current_state != STATE_GAME:
+                return
+
+            if button == 'left':
+                self.left_press_count += 1  # Increment left press counter
+                print(f"Left Button Press Count: {self.left_press_count}")
+                if self.left_press_count >= SEQUENCE_THRESHOLD:
+                    print("Left button pressed 16 times: Triggering Game Over (Lose).")
+                    self.current_state = STATE_GAME_OVER
+                    self.draw_game_over_screen(won=False)
+                    return
+            elif button == 'right':
+                self.right_press_count += 1  # Increment right press counter
+                print(f"Right Button Press Count: {self.right_press_count}")
+                if self.right_press_count >= SEQUENCE_THRESHOLD:
+                    print("Right button pressed 16 times: Triggering Game Over (Win).")
+                    self.current_state = STATE_GAME_OVER
+                    self.draw_game_over_screen(won=True)
+                    return
+            else:
+                # Any non-sequence button press resets the sequence
+                self.left_press_count = 0
+                self.right_press_count = 0
+
+        if any_changed:
+            if self.latency is not None:
+                self.latency.mark('logic')
+            self.present_board()
+
+
+    def initialize_game(self):
+        self.grid = self.engine.empty_board()
+        self.score = 0
+        self.left_press_count = 0
+        self.right_press_count = 0
+        self.password_input = encoder.CHARSET[0] * self.password_length  # Reset to initial password
+        self.current_selection = 0
+        self.history.clear()
+        self.move_count = 0
+        self.game_start_time = time.time()
+        self.game_modulo_merges = self.game_modulo_clears = 0
+        self.metrics.games_started += 1
+        print("Initializing game grid.")
+        self.add_random_tile()
+        self.add_random_tile()
+        self.save_checkpoint()
+        self.draw_debug_grid()
+
+
+    def tick(self, now=None):
+        """
+        Does time-based work that does not depend on input. Called on every loop
+        iteration, whether or not events arrived.
+        """
+        if now is None:
+            now = time.time()
+        state = self.current_state
+        message_ended = self.message_until and now >= self.message_until
+        if message_ended:
+            # After displaying the message, return to the appropriate state
+            self.message_until = 0
+            if self.current_state == STATE_PASSWORD_LOAD:
+                self.draw_password_load_screen()
+            elif self.current_state == STATE_PASSWORD_SAVE:
+                self.draw_password_save_screen()
+            elif self.current_state in (STATE_SLOT_SAVE, STATE_SLOT_LOAD):
+                self.draw_slot_screen()
+            elif self.current_state == STATE_GAME:
+                self.draw_debug_grid()
+            else:
+                self.draw_main_menu()
+
+        if (self.network is not None and self.hint_after is not None and self.current_state == STATE_GAME
+                and not self.message_until and not self.suspended and now - self.last_input >= self.hint_after):
+            self.show_hint()
+
+        if self.current_state == STATE_RESET_CONFIRM:
+            # Any confirmation actions are already done
+            # Just transition back to main menu
+            self.current_state = STATE_MAIN_MENU
+            self.draw_main_menu()
+
+        if message_ended or self.current_state != state:
+            self.publish_status()
+
+        if self.latency is not None:
+            self.latency.tick(now)
+            if self.current_state == STATE_LATENCY and now >= self.latency_refresh:
+                self.draw_latency_screen()
+
+        if self.checkpoint is not None:
+            try:
+                self.checkpoint.sync(now)  # fsync journaled moves that have waited long enough
+            except Exception as e:
+                self.metrics.errors += 1
+                print("Error syncing checkpoint journal:", e)
+
+    def handle_events(self, events):
+        """
+        Handles a list of button events (button names, oldest first) for the current state.
+        """
+        if not events:
+            return
+        self.metrics.events += len(events)
+        self.last_input = time.time()
+        self.hint_key = None  # A new hint only after the player stops again
+        if self.message_until:
+            # Presses made while an error message is shown are not meant for the next screen
+            print(f"Ignoring {len(events)} button event(s) during error message.")
+            self.ignored_events += len(events)
+            self.publish_status()
+            return
+        index = 0
+        while index < len(events):
+            button = events[index]
+            index += 1
+
+            if self.current_state == STATE_MAIN_MENU:
+                # Handle Start Game (Button A)
+                if button == 'A':
+                    print("Button A pressed: Starting game.")
+                    self.current_state = STATE_GAME
+                    self.initialize_game()
+
+                # Handle Reset High Score (Button B)
+                elif button == 'B':
+                    try:
+                        print("Button B pressed: Reset high score.")
+                        self.current_state = STATE_RESET_CONFIRM
+                        # Reset high score and redraw main menu
+                        self.high_score = 0
+                        self.save_high_score(self.high_score)
+                        print("High score reset to 0.")
+                        self.draw_main_menu()
+                    except Exception as e:
+                        self.metrics.errors += 1
+                        print("Error resetting high score:", e)
+                        traceback.print_exc(file=sys.stdout)
+
+                # Handle Load Game (Button C from Main Menu)
+                elif button == 'C' and self.save_store is not None:
+                    print("Button C pressed: Showing save slots.")
+                    self.current_state = STATE_SLOT_LOAD
+                    self.draw_slot_screen()
+                    if self.message_until:
+                        break  # The slots could not be read
+
+                # Handle Password Load (Button C from Main Menu, without save slots)
+                elif button == 'C':
+                    print("Button C pressed: Entering Password Load Mode.")
+                    self.current_state = STATE_PASSWORD_LOAD
+                    self.password_input = encoder.CHARSET[0] * self.password_length
+                    self.current_selection = 0
+                    self.draw_password_load_screen()
+
+                # Handle Latency debug screen (Up from Main Menu)
+                elif button == 'up' and self.latency is not None:
+                    print("Up pressed: Showing latency statistics.")
+                    self.current_state = STATE_LATENCY
+                    self.draw_latency_screen()
+
+                # Handle Leaderboard (Down from Main Menu)
+                elif button == 'down' and self.leaderboard is not None:
+                    print("Down pressed: Showing leaderboard.")
+                    self.current_state = STATE_LEADERBOARD
+                    self.draw_leaderboard_screen()
+
+            elif self.current_state == STATE_LATENCY:
+                # Any button returns to the Main Menu
+                print(f"Button {button} pressed: Returning to Main Menu.")
+                self.current_state = STATE_MAIN_MENU
+                self.draw_main_menu()
+
+            elif self.current_state == STATE_LEADERBOARD:
+                # Any button returns to the Main Menu
+                print(f"Button {button} pressed: Returning to Main Menu.")
+                self.current_state = STATE_MAIN_MENU
+                self.draw_main_menu()
+
+            elif self.current_state == STATE_HOW_TO_PLAY:
+                # Handle Return to Main Menu (Button B)
+                if button == 'B':
+                    print("Button B pressed: Returning to Main Menu.")
+                    self.current_state = STATE_MAIN_MENU
+                    self.draw_main_menu()
+
+            elif self.current_state == STATE_GAME:
+                # Handle directional button presses
+                if button in MOVE_DIRECTIONS:
+                    # Apply this move and the queued moves right behind it, then render once
+                    batch = [button]
+                    while index < len(events) and events[index] in MOVE_DIRECTIONS and len(batch) < MAX_MOVE_BATCH:
+                        batch.append(events[index])
+                        index += 1
+                    if self.latency is not None:
+                        self.latency.begin(getattr(button, 'time', None))
+                    self.handle_move_batch(batch)
+                    if self.latency is not None:
+                        self.latency.cancel()  # Batches that did not redraw the board are not measured
+
+                # Handle Save Game (Button C during Game)
+                elif button == 'C' and self.save_store is not None:
+                    print("Button C pressed: Showing save slots.")
+                    self.current_state = STATE_SLOT_SAVE
+                    self.draw_slot_screen()
+                    if self.message_until:
+                        break  # The slots could not be read
+
+                # Handle Password Save (Button C during Game, without save slots)
+                elif button == 'C':
+                    print("Button C pressed: Entering Password Save Mode.")
+                    self.current_state = STATE_PASSWORD_SAVE
+                    # Generate the password before drawing the screen
+                    self.password_input = encoder.save_codes_to_password(self.grid.ravel(), self.grid_size)
+                    self.draw_password_save_screen()
+
+                # Handle Restart Game (Button A)
+                elif button == 'A':
+                    print("Button A pressed: Restarting game.")
+                    self.current_state = STATE_GAME
+                    self.initialize_game()
+
+                # Handle Return to Main Menu (Button B)
+                elif button == 'B':
+                    try:
+                        print("Button B pressed: Returning to main menu.")
+                        self.current_state = STATE_MAIN_MENU
+                        self.draw_main_menu()
+                        # Reset press counters when returning to main menu
+                        self.left_press_count = 0
+                        self.right_press_count = 0
+                    except Exception as e:
+                        self.metrics.errors += 1
+                        print("Error returning to main menu:", e)
+                        traceback.print_exc(file=sys.stdout)
+
+            elif self.current_state == STATE_GAME_OVER:
+                # Handle Restart Game (Button A)
+                if button == 'A':
+                    print("Button A pressed: Restarting game.")
+                    self.confirm_finished_game()
+                    self.current_state = STATE_GAME
+                    self.initialize_game()
+
+                # Handle Return to Main Menu (Button B)
+                elif button == 'B':
+                    try:
+                        print("Button B pressed: Returning to main menu.")
+                        self.confirm_finished_game()
+                        self.current_state = STATE_MAIN_MENU
+                        self.draw_main_menu()
+                    except Exception as e:
+                        self.metrics.errors += 1
+                        print("Error returning to main menu:", e)
+                        traceback.print_exc(file=sys.stdout)
+
+                # Handle Rewind (Button C): undo the last move and keep playing
+                elif button == 'C' and REWIND_ON_GAME_OVER:
+                    if self.undo_move():
+                        print("Button C pressed: Rewinding last move.")
+                        self.cancel_finished_game()
+                        self.current_state = STATE_GAME
+                        self.left_press_count = 0
+                        self.right_press_count = 0
+                        self.draw_debug_grid()
+
+            elif self.current_state == STATE_PASSWORD_LOAD:
+                # Handle Up/Down to scroll the selected character (repeats while held, faster over time)
+                if button == 'up':
+                    self.scroll_password(direction='UP', steps=self.scroll_steps(button))
+                    self.password_dirty.add(self.current_selection)
+
+                elif button == 'down':
+                    self.scroll_password(direction='DOWN', steps=self.scroll_steps(button))
+                    self.password_dirty.add(self.current_selection)
+
+                # Handle Left Button Press to move selection left
+                elif button == 'left':
+                    self.password_dirty.add(self.current_selection)
+                    self.current_selection = (self.current_selection - 1) % self.password_length
+                    self.password_dirty.add(self.current_selection)
+                    print(f"Password character selection moved to index {self.current_selection}.")
+
+                # Handle Right Button Press to move selection right
+                elif button == 'right':
+                    self.password_dirty.add(self.current_selection)
+                    self.current_selection = (self.current_selection + 1) % self.password_length
+                    self.password_dirty.add(self.current_selection)
+                    print(f"Password character selection moved to index {self.current_selection}.")
+
+                # Handle Confirm (Button C)
+                elif button == 'C':
+                    if len(self.password_input) == self.password_length:
+                        print(f"Password entered: {self.password_input}")
+                        try:
+                            loaded_number = encoder.decode(self.password_input)
+                            loaded_board = np.array(encoder.number_to_codes(loaded_number, self.grid_size),
+                                                    dtype=np.uint8).reshape(self.grid_size, self.grid_size)
+                            # Check if the loaded board contains the winning tile
+                            if (loaded_board == self.engine.win_code).any():
+                                print(f"Invalid password. Board contains tile {self.engine.rules.win_tile}.")
+                                self.draw_error_message("Invalid Password!")
+                                # Return to Password Load screen to allow user to enter a new password
+                                self.current_state = STATE_PASSWORD_LOAD
+                            else:
+                                # Update the game grid
+                                self.grid = loaded_board
+                                self.history.clear()
+                                self.move_count = 0
+                                self.game_start_time = time.time()
+                                self.game_modulo_merges = self.game_modulo_clears = 0
+                                # Update the score appropriately
+                                self.score = self.calculate_score_from_board(loaded_board)
+                                print("Board loaded from password.")
+                                # Transition back to game
+                                self.current_state = STATE_GAME
+                                self.save_checkpoint()
+                                self.draw_debug_grid()
+                        except Exception as e:
+                            print("Invalid password. Could not load board.")
+                            self.draw_error_message("Invalid Password!")
+                            self.current_state = STATE_MAIN_MENU
+                    else:
+                        print(f"Incomplete password. Please enter a {self.password_length}-character password.")
+                        self.draw_error_message("Incomplete Password!")
+                    if self.message_until:
+                        # Drop the rest of this batch; it was meant for the screen being replaced
+                        break
+
+                # Handle Cancel (Button B to return to Main Menu)
+                elif button == 'B':
+                    print("Button B pressed: Returning to Main Menu from Password Input Screen.")
+                    self.current_state = STATE_MAIN_MENU
+                    self.draw_main_menu()
+
+            elif self.current_state in (STATE_SLOT_SAVE, STATE_SLOT_LOAD):
+                saving = self.current_state == STATE_SLOT_SAVE
+                # Handle Up/Down to pick a slot
+                if button in ('up', 'down'):
+                    old_selection = self.slot_selection
+                    step = -1 if button == 'up' else 1
+                    self.slot_selection = (self.slot_selection + step) % self.save_store.slots
+                    self.draw_slot_row(old_selection)
+                    self.draw_slot_row(self.slot_selection)
+                    self.present()
+
+                # Handle Save/Load (Button C)
+                elif button == 'C':
+                    if saving:
+                        self.save_to_slot(self.slot_selection)
+                    else:
+                        self.load_from_slot(self.slot_selection)
+                    if self.message_until:
+                        # Drop the rest of this batch; it was meant for the screen being replaced
+                        break
+
+                # Handle Password export/import (Button A)
+                elif button == 'A':
+                    if saving:
+                        print("Button A pressed: Showing the game as a password.")
+                        self.current_state = STATE_PASSWORD_SAVE
+                        self.password_input = encoder.save_codes_to_password(self.grid.ravel(), self.grid_size)
+                        self.draw_password_save_screen()
+                    else:
+                        print("Button A pressed: Entering Password Load Mode.")
+                        self.current_state = STATE_PASSWORD_LOAD
+                        self.password_input = encoder.CHARSET[0] * self.password_length
+                        self.current_selection = 0
+                        self.draw_password_load_screen()
+
+                # Handle Cancel (Button B)
+                elif button == 'B':
+                    if saving:
+                        self.current_state = STATE_GAME
+                        self.draw_debug_grid()
+                    else:
+                        self.current_state = STATE_MAIN_MENU
+                        self.draw_main_menu()
+
+            elif self.current_state == STATE_PASSWORD_SAVE:
+                # In Password Save screen, pressing C returns to the game
+                if button == 'C':
+                    print("Password Save confirmed.")
+                    self.current_state = STATE_GAME
+                    self.draw_debug_grid()
+
+
+        # Password edits are drawn once per batch, as the changed cells only
+        if self.password_dirty:
+            if self.current_state == STATE_PASSWORD_LOAD and not self.message_until and self.password_cells:
+                self.update_password_cells(self.password_dirty)
+            self.password_dirty.clear()
+
+        # Snapshot when the game starts or stops being resumable (menus, Game Over)
+        if self.checkpoint is not None and \
+                (self.current_state in RESUMABLE_STATES) != (self.checkpoint_state in RESUMABLE_STATES):
+            self.save_checkpoint()
+        self.publish_status()
@@ -0,0 +1,127 @@
+# _status.py
+
+import mmap  # The status file is read and written as shared memory
+import os
+import struct  # Fixed-layout status record
+import time
+
+STATUS_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else "status"  # tmpfs: updates never touch the SD card
+STATUS_PREFIX = "modulo2048-"
+STATUS_SUFFIX = ".status"
+STATUS_MAGIC = b'M2KS'
+STATUS_VERSION = 1
+MAX_GRID = 6  # Boards up to 6x6 fit in the board field
+READ_RETRIES = 100  # Reader attempts before giving up on a record that keeps changing
+
+# magic, version, grid size, sequence (odd while the record is being written)
+HEADER_FORMAT = '<4sBBxxI'
+SEQUENCE_OFFSET = 8
+# pid, updated at, state, suspended, score, high score, moves in this game, moves since the last modulo
+# block, events, moves, ignored events, dropped events, frames, pixels sent, last and average frame
+# seconds, board codes (row by row, grid_size * grid_size bytes used)
+BODY_FORMAT = f'<Id16sBxxxIIIIQQIIQQdd{MAX_GRID * MAX_GRID}s'
+BODY_FIELDS = ('pid', 'updated_at', 'state', 'suspended', 'score', 'high_score', 'move_count',
+               'moves_since_modulo', 'events', 'moves', 'ignored_events', 'dropped_events', 'frames',
+               'pixels_sent', 'last_frame_time', 'average_frame_time', 'board')
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+STATUS_SIZE = HEADER_SIZE + struct.calcsize(BODY_FORMAT)
+
+
+def status_path(name, directory=STATUS_DIR):
+    return os.path.join(directory, f"{STATUS_PREFIX}{name}{STATUS_SUFFIX}")
+
+
+class StatusExport:
+    """
+    Live state of one session in a small fixed-layout file, mapped into memory
+    (in /dev/shm, so it never reaches the disk). Local tools map the same file
+    and read it without syscalls or parsing (see StatusReader and status.py).
+
+    publish() writes the whole record in place under a sequence lock: the
+    sequence number is odd while a write is in progress, so a reader retries
+    if it was odd or changed while it read. Publishing costs a few
+    microseconds and is done after every move and screen change.
+    """
+    def __init__(self, name="main", directory=STATUS_DIR, input_queue=None):
+        self.name = name
+        self.path = status_path(name, directory)
+        self.input_queue = input_queue  # For its dropped event count, if there is one
+        os.makedirs(directory, exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        os.ftruncate(self._fd, STATUS_SIZE)
+        self._map = mmap.mmap(self._fd, STATUS_SIZE, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        self.sequence = 0
+        self._pid = os.getpid()
+        struct.pack_into(HEADER_FORMAT, self._map, 0, STATUS_MAGIC, STATUS_VERSION, 0, self.sequence)
+        print(f"[{name}] Publishing live status to {self.path}.")
+
+    def publish(self, session):
+        """Writes the session's current state into the shared record."""
+        size = session.grid_size
+        board = session.grid.tobytes() if size <= MAX_GRID else b''
+        dropped = self.input_queue.dropped if self.input_queue is not None else 0
+        self.sequence += 1
+        struct.pack_into('<I', self._map, SEQUENCE_OFFSET, self.sequence)
+        struct.pack_into('<B', self._map, 5, size)
+        struct.pack_into(BODY_FORMAT, self._map, HEADER_SIZE, self._pid, time.time(),
+                         session.current_state.encode()[:16], session.suspended, session.score,
+                         session.high_score, session.move_count, session.moves_since_last_modulo_block,
+                         session.metrics.events, session.metrics.moves, session.ignored_events, dropped,
+                         session.damage.frames, session.damage.pixels_sent, session.last_frame_time,
+                         session.average_frame_time, board)
+        self.sequence += 1
+        struct.pack_into('<I', self._map, SEQUENCE_OFFSET, self.sequence)
+
+    def close(self):
+        """Unmaps the record and removes it; readers then see that the game stopped."""
+        if self._map is None:
+            return
+        self._map.close()
+        os.close(self._fd)
+        self._map = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+class StatusReader:
+    """Maps a status file read-only and returns consistent snapshots of it."""
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), STATUS_SIZE, mmap.MAP_SHARED, mmap.PROT_READ)
+        magic, version, _, _ = struct.unpack_from(HEADER_FORMAT, self._map, 0)
+        if magic != STATUS_MAGIC or version != STATUS_VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a version {STATUS_VERSION} status file.")
+
+    def read(self):
+        """
+        Returns:
+            dict: The fields in BODY_FIELDS plus grid_size and sequence, with the board as a
+            list of rows of tile codes; None if nothing was published yet or the writer never
+            let go of the record.
+        """
+        for _ in range(READ_RETRIES):
+            _, _, size, sequence = struct.unpack_from(HEADER_FORMAT, self._map, 0)
+            if sequence & 1:
+                time.sleep(0)  # Being written: let the writer finish (it may share this core)
+                continue
+            values = struct.unpack_from(BODY_FORMAT, self._map, HEADER_SIZE)
+            if struct.unpack_from('<I', self._map, SEQUENCE_OFFSET)[0] != sequence:
+                time.sleep(0)  # Changed while it was read
+                continue
+            if not sequence:
+                return None
+            status = dict(zip(BODY_FIELDS, values))
+            status['grid_size'] = size
+            status['sequence'] = sequence
+            status['state'] = status['state'].rstrip(b'\0').decode()
+            status['suspended'] = bool(status['suspended'])
+            status['board'] = [list(status['board'][row * size:(row + 1) * size]) for row in range(size)]
+            return status
+        return None
+
+    def close(self):
+        self._map.close()
@@ -0,0 +1,150 @@
+# _tcache.py
+
+import fcntl  # Writer lock shared between processes
+import hashlib  # Header tag of the rules and the network
+import mmap
+import os
+import struct  # Fixed-layout header and records
+from _engine import get_engine, DIRECTIONS
+
+CACHE_FILE = "tables/eval_cache_{size}x{size}.bin"  # {size} is replaced with the board size
+CACHE_SLOTS = 1 << 16  # 2 MB of 32-byte records
+PROBE_LIMIT = 8  # Slots searched per key before one is evicted
+
+NO_MOVE = 0xFF
+VALID = 1 << 63  # Set in the high key word of a used slot
+
+
+class TranspositionCache:
+    """
+    Fixed-size evaluation cache in a memory-mapped file, shared by every
+    process that opens the same file and kept across restarts.
+
+    Records are 32 bytes: sequence number, reference bit, search depth, best
+    move, and the key in two 64-bit words, then the value (float64). The key
+    is the packed board (base-17 tile codes, like BoardEncoder) shifted left 6
+    bits plus the modulo counter, so it covers boards up to 5x5.
+
+    Open addressing with linear probing over PROBE_LIMIT slots. Entries are
+    only ever replaced, never removed, so probe chains stay intact. When a
+    key's window is full, a clock sweep over the window picks the victim:
+    a slot whose reference bit is set gets a second chance.
+
+    Reads take no lock. Each record has a sequence number that is odd while a
+    writer is changing it, and a read that sees it odd or changed counts as a
+    miss. Writers serialise on a flock of the file.
+
+    Values are only valid for the evaluator that stored them, so the header
+    holds a hash of the rules and of tag (NTupleNetwork.fingerprint() for
+    hints). Opening the file with other rules or another tag starts it over.
+    """
+    MAGIC = b'M2TC'
+    VERSION = 3
+    HEADER = struct.Struct('<4sBBxxI12s')  # magic, version, size, slots, hash of the rules and the tag
+    HEADER_SIZE = 64
+    RECORD = struct.Struct('<IBBBxQQd')  # seq, ref, depth, move, key low, key high, value
+    SEQ = struct.Struct('<I')
+
+    def __init__(self, path=CACHE_FILE, slots=CACHE_SLOTS, grid_size=4, tag=""):
+        if grid_size > 5:
+            raise ValueError("The evaluation cache supports boards up to 5x5.")
+        self.engine = get_engine(grid_size)
+        self.path = path = path.format(size=grid_size)
+        self.slots = slots
+        self.hits = 0
+        self.misses = 0
+        size = self.HEADER_SIZE + slots * self.RECORD.size
+        owner = hashlib.sha1(f"{self.engine.rules_hash()}:{tag}".encode()).hexdigest()[:12]
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, grid_size, slots, owner.encode())
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            # A file from another layout, board size, rule set or tag is started over
+            if os.pread(self._fd, self.HEADER.size, 0) != header or os.fstat(self._fd).st_size != size:
+                print(f"Creating evaluation cache {path} ({slots} slots).")
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, header, 0)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._mem = mmap.mmap(self._fd, size)
+
+    def key(self, board, modulo_counter):
+        """Returns the (low, high) key words of a board and modulo counter."""
+        key = (self.engine.encoder.codes_to_number(board.ravel()) << 6) | min(modulo_counter, 63)
+        return key & 0xFFFFFFFFFFFFFFFF, (key >> 64) | VALID
+
+    def _slot(self, low, high):
+        mixed = ((low ^ (high * 0x9E3779B97F4A7C15)) * 0xFF51AFD7ED558CCD) & 0xFFFFFFFFFFFFFFFF
+        return (mixed >> 32) % self.slots
+
+    def _offset(self, slot):
+        return self.HEADER_SIZE + slot * self.RECORD.size
+
+    def get(self, board, modulo_counter, min_depth=0):
+        """
+        Looks up a board without locking.
+
+        Returns:
+            tuple: (value, best move or None, depth), or None on a miss.
+        """
+        low, high = self.key(board, modulo_counter)
+        slot = self._slot(low, high)
+        for probe in range(PROBE_LIMIT):
+            offset = self._offset((slot + probe) % self.slots)
+            seq, ref, depth, move, key_low, key_high, value = self.RECORD.unpack_from(self._mem, offset)
+            if key_high == 0 and not seq & 1:
+                break  # Empty slot: the key was never stored
+            if key_low == low and key_high == high:
+                if seq & 1 or self.SEQ.unpack_from(self._mem, offset)[0] != seq or depth < min_depth:
+                    break  # Being rewritten, or not searched deep enough
+                if not ref:
+                    self._mem[offset + 4] = 1  # Reference bit for the clock sweep
+                self.hits += 1
+                return value, (None if move == NO_MOVE else DIRECTIONS[move]), depth
+        self.misses += 1
+        return None
+
+    def put(self, board, modulo_counter, value, move=None, depth=0):
+        """Stores an evaluation, replacing the key's old entry or evicting one."""
+        low, high = self.key(board, modulo_counter)
+        slot = self._slot(low, high)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            target = None
+            for probe in range(PROBE_LIMIT):
+                offset = self._offset((slot + probe) % self.slots)
+                seq, ref, _, _, key_low, key_high, _ = self.RECORD.unpack_from(self._mem, offset)
+                if key_high == 0 or (key_low == low and key_high == high):
+                    target = (offset, seq)
+                    break
+            if target is None:
+                # Clock sweep: clear reference bits until an unreferenced slot turns up
+                for probe in range(PROBE_LIMIT + 1):
+                    offset = self._offset((slot + probe % PROBE_LIMIT) % self.slots)
+                    if not self._mem[offset + 4]:
+                        break
+                    self._mem[offset + 4] = 0
+                target = (offset, self.SEQ.unpack_from(self._mem, offset)[0])
+            offset, seq = target
+            self.SEQ.pack_into(self._mem, offset, (seq + 1) & 0xFFFFFFFF)  # Odd: readers treat it as a miss
+            self.RECORD.pack_into(self._mem, offset, (seq + 1) & 0xFFFFFFFF, 0, depth,
+                                  NO_MOVE if move is None else DIRECTIONS.index(move), low, high, value)
+            self.SEQ.pack_into(self._mem, offset, (seq + 2) & 0xFFFFFFFF)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def flush(self):
+        """Writes dirty pages back to the file."""
+        self._mem.flush()
+
+    def close(self):
+        if self._mem is not None:
+            self._mem.flush()
+            self._mem.close()
+            self._mem = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
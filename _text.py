@@ -0,0 +1,102 @@
+# _text.py
+
+import collections
+from PIL import Image, ImageDraw # Text runs are rasterised once into masks
+
+TEXT_CACHE_SIZE = 512  # Cached runs (least recently used are dropped)
+
+
+class TextRun:
+    """A measured, pre-rasterised string: bounding box (as textbbox at (0, 0)) and alpha mask."""
+    __slots__ = ('bbox', 'width', 'height', 'mask', 'advance')
+
+    def __init__(self, text, font):
+        self.bbox = font.getbbox(text)
+        self.width = self.bbox[2] - self.bbox[0]
+        self.height = self.bbox[3] - self.bbox[1]
+        self.advance = font.getlength(text)
+        self.mask = Image.new("L", (max(self.width, 1), max(self.height, 1)), 0)
+        if text:
+            ImageDraw.Draw(self.mask).text((-self.bbox[0], -self.bbox[1]), text, font=font, fill=255)
+
+
+class TextCache:
+    """
+    Layout cache and glyph atlas shared by every screen and session.
+
+    Runs are keyed by (string, font file, font size) and hold the measured
+    bounding box and the rasterised mask, so redrawing a screen whose strings
+    did not change is one masked paste per string, with no FreeType work.
+    Single characters (glyph()) form the atlas used to lay out strings cell by
+    cell, like the password.
+    """
+    def __init__(self, max_runs=TEXT_CACHE_SIZE):
+        self.max_runs = max_runs
+        self._runs = collections.OrderedDict()
+        self._wrapped = {}
+
+    @staticmethod
+    def _font_key(font):
+        return getattr(font, 'path', id(font)), getattr(font, 'size', 0)
+
+    def run(self, text, font):
+        key = (text,) + self._font_key(font)
+        run = self._runs.get(key)
+        if run is None:
+            run = TextRun(text, font)
+            self._runs[key] = run
+            if len(self._runs) > self.max_runs:
+                self._runs.popitem(last=False)
+        else:
+            self._runs.move_to_end(key)
+        return run
+
+    def glyph(self, char, font):
+        return self.run(char, font)
+
+    def size(self, text, font):
+        """(width, height) of a string, as measured by textbbox."""
+        run = self.run(text, font)
+        return run.width, run.height
+
+    def draw(self, image, xy, text, font, fill):
+        """Draws a string at xy like ImageDraw.text, from the cached mask."""
+        run = self.run(text, font)
+        if run.width and run.height:
+            x = int(xy[0]) + run.bbox[0]
+            y = int(xy[1]) + run.bbox[1]
+            image.paste(fill, (x, y, x + run.width, y + run.height), run.mask)
+
+    def draw_centered(self, image, y, text, font, fill):
+        """Draws a string centred horizontally on the image; returns its height."""
+        width, height = self.size(text, font)
+        self.draw(image, ((image.width - width) / 2, y), text, font, fill)
+        return height
+
+    def cell_width(self, chars, font):
+        """Width of a fixed cell that fits the widest of chars."""
+        return max(self.glyph(char, font).advance for char in chars)
+
+    def draw_cell(self, image, x, y, cell_width, char, font, fill):
+        """Draws one character centred in a cell of cell_width pixels starting at x."""
+        glyph = self.glyph(char, font)
+        self.draw(image, (x + (cell_width - glyph.advance) / 2, y), char, font, fill)
+
+    def wrap(self, text, font, max_width):
+        """Splits text into lines no wider than max_width (cached)."""
+        key = (text, max_width) + self._font_key(font)
+        lines = self._wrapped.get(key)
+        if lines is None:
+            lines = []
+            line = ""
+            for word in text.split():
+                candidate = f"{line} {word}" if line else word
+                if line and font.getlength(candidate) > max_width:
+                    lines.append(line)
+                    line = word
+                else:
+                    line = candidate
+            if line:
+                lines.append(line)
+            self._wrapped[key] = lines
+        return lines
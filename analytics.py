@@ -0,0 +1,325 @@
+# analytics.py
+#
+# Summaries of recorded games, per period and per cabinet: games, win rate,
+# average and best score, max tile, moves per game, modulo clear rate, and
+# where the tiles were on the boards players lost with.
+#
+# The logs are streamed: compressed game logs (_gamelog.py) or the leaderboard
+# database are read in chunks, each chunk's final boards are decoded from their
+# passwords in one vectorised pass, and the chunk is folded into running totals
+# whose size depends on the number of periods and cabinets, not on the number
+# of games.
+#
+# Writes <out>_summary and <out>_losses as CSV, or as Parquet with --format
+# parquet (needs pyarrow).
+#
+# Usage: python analytics.py [log.csv.gz ...] [--database leaderboard.db] [--period hour|day|hour_of_day]
+#                            [--out analytics] [--format csv|parquet] [--chunk 10000]
+
+import argparse
+import csv
+import glob
+import gzip  # Game logs are compressed
+import os
+import sqlite3  # Games recorded before the logs existed
+import time
+import numpy as np
+from _pass import BoardEncoder  # Password format and tile codes
+from _gamelog import GAME_LOG_DIR  # Where the game writes its logs
+
+CHUNK_ROWS = 10000  # Games decoded and aggregated per step
+PERIOD_FORMATS = {'hour': "%Y-%m-%d %H:00", 'day': "%Y-%m-%d", 'hour_of_day': "%H"}  # Local time
+GRID_SIZES = range(3, 7)
+NUMERIC_COLUMNS = {'finished_at': np.float64, 'grid_size': np.int64, 'score': np.int64, 'max_tile': np.int64,
+                   'moves': np.int64, 'duration': np.float64, 'won': np.int64, 'modulo_merges': np.int64,
+                   'modulo_clears': np.int64}
+
+encoder = BoardEncoder()
+CODE_VALUES = np.array([value for value, _ in encoder.TILE_VALUES], dtype=np.int64)
+CODE_IS_NORMAL = np.array([tile_type == 'normal' for _, tile_type in encoder.TILE_VALUES])
+CODE_IS_MODULO = np.array([tile_type == 'modulo' for _, tile_type in encoder.TILE_VALUES])
+CHAR_DIGITS = np.full(256, -1, dtype=np.int64)  # Password character -> base-64 digit
+CHAR_DIGITS[np.frombuffer(encoder.CHARSET.encode('ascii'), dtype=np.uint8)] = np.arange(encoder.BASE)
+GRID_SIZE_BY_LENGTH = {encoder.password_length(size): size for size in GRID_SIZES}
+
+
+def decode_passwords(passwords, grid_size):
+    """
+    Decodes passwords of one grid size to boards, BoardEncoder-compatible but in
+    bulk: the base-64 digits of every password are divided by 17 together, one
+    tile code per pass, so there is no Python loop per board.
+
+    Returns:
+        tuple: ((n, size, size) uint8 tile codes, (n,) bool mask of valid passwords)
+    """
+    length = encoder.password_length(grid_size)
+    count = len(passwords)
+    if not count:
+        return np.zeros((0, grid_size, grid_size), dtype=np.uint8), np.zeros(0, dtype=bool)
+    data = np.frombuffer(''.join(passwords).encode('ascii', 'replace'), dtype=np.uint8).reshape(count, length)
+    digits = CHAR_DIGITS[data]
+    valid = (digits >= 0).all(axis=1)
+    digits[~valid] = 0
+    base = encoder.MAX_TILE_INDEX + 1
+    codes = np.empty((count, grid_size * grid_size), dtype=np.uint8)
+    for cell in range(grid_size * grid_size - 1, -1, -1):  # Least significant code first
+        remainder = np.zeros(count, dtype=np.int64)
+        for position in range(length):
+            current = remainder * encoder.BASE + digits[:, position]
+            digits[:, position] = current // base
+            remainder = current % base
+        codes[:, cell] = remainder
+    valid &= ~digits.any(axis=1)  # Anything left over does not fit the board
+    return codes.reshape(count, grid_size, grid_size), valid
+
+
+def _columns(header, rows):
+    """Turns a list of CSV rows into a chunk: column name -> array."""
+    chunk = {}
+    for name, values in zip(header, zip(*rows)):
+        if name in NUMERIC_COLUMNS:
+            chunk[name] = np.array([-1 if value is None or value == '' else value for value in values],
+                                   dtype=np.float64).astype(NUMERIC_COLUMNS[name])
+        else:
+            chunk[name] = np.array(values, dtype=object)
+    return chunk
+
+
+def read_logs(paths, chunk_rows=CHUNK_ROWS):
+    """Yields chunks of at most chunk_rows games from game log files (.csv.gz or .csv)."""
+    for path in paths:
+        opener = gzip.open if path.endswith('.gz') else open
+        rows = []
+        try:
+            with opener(path, 'rt', newline='') as f:
+                reader = csv.reader(f)
+                header = next(reader, None)
+                if header is None:
+                    continue
+                for row in reader:
+                    if len(row) != len(header) or row == header:
+                        continue
+                    rows.append(row)
+                    if len(rows) >= chunk_rows:
+                        yield _columns(header, rows)
+                        rows = []
+        except (OSError, EOFError) as e:
+            print(f"{path}: {e}. Using the games read before it.")  # e.g. cut off by a power loss
+        if rows:
+            yield _columns(header, rows)
+
+
+def first_logged(paths):
+    """finished_at of the earliest game in the logs, or None. Reads only the first game of each file."""
+    first = None
+    for path in paths:
+        opener = gzip.open if path.endswith('.gz') else open
+        try:
+            with opener(path, 'rt', newline='') as f:
+                reader = csv.reader(f)
+                header = next(reader, None)
+                if header is None or 'finished_at' not in header:
+                    continue
+                column = header.index('finished_at')
+                for row in reader:
+                    if len(row) == len(header) and row != header:
+                        finished_at = float(row[column])
+                        first = finished_at if first is None else min(first, finished_at)
+                        break
+        except (OSError, EOFError, ValueError):
+            continue
+    return first
+
+
+def read_database(path, chunk_rows=CHUNK_ROWS, before=None):
+    """
+    Yields chunks of games from a leaderboard database. It has no grid size or
+    modulo counts: the grid size follows from the password length and the
+    modulo counts are -1 (unknown).
+
+    Games also go to the logs once they exist, so with before (see
+    first_logged) only games finished before that time are read.
+    """
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        cursor = connection.execute(
+            "SELECT finished_at, session, score, max_tile, moves, duration, won, password FROM games "
+            "WHERE finished_at < ? ORDER BY id", (float('inf') if before is None else before,))
+        header = ('finished_at', 'session', 'score', 'max_tile', 'moves', 'duration', 'won', 'password')
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            chunk = _columns(header, rows)
+            chunk['password'] = np.array([password or '' for password in chunk['password']], dtype=object)
+            chunk['grid_size'] = np.array([GRID_SIZE_BY_LENGTH.get(len(password), -1)
+                                           for password in chunk['password']], dtype=np.int64)
+            chunk['modulo_merges'] = np.full(len(rows), -1, dtype=np.int64)
+            chunk['modulo_clears'] = np.full(len(rows), -1, dtype=np.int64)
+            yield chunk
+    finally:
+        connection.close()
+
+
+def with_boards(chunks):
+    """Adds chunk['boards'] = {grid size: (row indices, (n, size, size) tile codes)} for the valid passwords."""
+    for chunk in chunks:
+        lengths = np.array([len(password) for password in chunk['password']], dtype=np.int64)
+        boards = {}
+        for size in GRID_SIZES:
+            rows = np.flatnonzero((chunk['grid_size'] == size) & (lengths == encoder.password_length(size)))
+            codes, valid = decode_passwords(list(chunk['password'][rows]), size)
+            boards[size] = (rows[valid], codes[valid])
+        chunk['boards'] = boards
+        yield chunk
+
+
+class PeriodSummary:
+    """Running totals per (period, cabinet)."""
+    SUMS = ('games', 'wins', 'score', 'max_tile', 'moves', 'duration', 'modulo_games', 'modulo_merges',
+            'modulo_clears')
+    MAXIMA = ('best_score', 'best_tile')
+    COLUMNS = ('period', 'session', 'games', 'wins', 'win_rate', 'average_score', 'best_score', 'average_max_tile',
+               'best_tile', 'moves_per_game', 'average_duration', 'modulo_merges_per_game', 'modulo_clears_per_game',
+               'modulo_clear_rate')
+
+    def __init__(self, period='hour'):
+        self.period_format = PERIOD_FORMATS[period]
+        self.groups = {}  # (period label, session) -> {total name: value}
+
+    def add(self, chunk):
+        hours, hour_index = np.unique((chunk['finished_at'] // 3600).astype(np.int64), return_inverse=True)
+        sessions, session_index = np.unique(chunk['session'].astype(str), return_inverse=True)
+        group = hour_index * len(sessions) + session_index
+        size = len(hours) * len(sessions)
+        known = chunk['modulo_merges'] >= 0
+        weights = {
+            'games': None, 'wins': chunk['won'] > 0, 'score': chunk['score'], 'max_tile': chunk['max_tile'],
+            'moves': chunk['moves'], 'duration': chunk['duration'], 'modulo_games': known,
+            'modulo_merges': np.where(known, chunk['modulo_merges'], 0),
+            'modulo_clears': np.where(known, chunk['modulo_clears'], 0),
+        }
+        sums = {name: np.bincount(group, weights=weight, minlength=size) for name, weight in weights.items()}
+        maxima = {}
+        for name, column in (('best_score', chunk['score']), ('best_tile', chunk['max_tile'])):
+            maxima[name] = np.full(size, -1, dtype=np.int64)
+            np.maximum.at(maxima[name], group, column)
+        labels = [time.strftime(self.period_format, time.localtime(hour * 3600)) for hour in hours]
+        for index in np.flatnonzero(sums['games']):
+            key = (labels[index // len(sessions)], sessions[index % len(sessions)])
+            totals = self.groups.setdefault(key, dict.fromkeys(self.SUMS + self.MAXIMA, 0))
+            for name in self.SUMS:
+                totals[name] += sums[name][index]
+            for name in self.MAXIMA:
+                totals[name] = max(totals[name], int(maxima[name][index]))
+
+    def rows(self):
+        for (label, session), totals in sorted(self.groups.items()):
+            games = totals['games']
+            modulo_games = totals['modulo_games']
+            yield (label, session, int(games), int(totals['wins']), totals['wins'] / games, totals['score'] / games,
+                   totals['best_score'], totals['max_tile'] / games, totals['best_tile'], totals['moves'] / games,
+                   totals['duration'] / games,
+                   totals['modulo_merges'] / modulo_games if modulo_games else None,
+                   totals['modulo_clears'] / modulo_games if modulo_games else None,
+                   totals['modulo_clears'] / totals['modulo_merges'] if totals['modulo_merges'] else None)
+
+
+class LossPositions:
+    """Per cabinet and cell, what the final boards of lost games held."""
+    COLUMNS = ('session', 'grid_size', 'row', 'column', 'losses', 'occupied_share', 'average_log2_tile',
+               'max_tile_share', 'modulo_share')
+
+    def __init__(self):
+        self.groups = {}  # (session, grid size) -> {total name: (cells,) array or count}
+
+    def add(self, chunk):
+        lost = chunk['won'] == 0
+        for size, (rows, codes) in chunk['boards'].items():
+            keep = lost[rows]
+            if not keep.any():
+                continue
+            codes = codes[keep].reshape(-1, size * size)
+            sessions = chunk['session'][rows[keep]].astype(str)
+            for session in np.unique(sessions):
+                boards = codes[sessions == session]
+                normal = CODE_IS_NORMAL[boards]
+                values = np.where(normal, CODE_VALUES[boards], 0)
+                totals = self.groups.setdefault((session, size), {
+                    'losses': 0, 'occupied': np.zeros(size * size), 'log2': np.zeros(size * size),
+                    'max_tile': np.zeros(size * size), 'modulo': np.zeros(size * size)})
+                totals['losses'] += len(boards)
+                totals['occupied'] += (boards != 0).sum(axis=0)
+                totals['log2'] += np.log2(np.maximum(values, 1)).sum(axis=0)
+                totals['max_tile'] += np.bincount(values.argmax(axis=1), minlength=size * size)
+                totals['modulo'] += CODE_IS_MODULO[boards].sum(axis=0)
+
+    def rows(self):
+        for (session, size), totals in sorted(self.groups.items()):
+            losses = totals['losses']
+            for cell in range(size * size):
+                occupied = totals['occupied'][cell]
+                yield (session, size, cell // size, cell % size, losses, occupied / losses,
+                       totals['log2'][cell] / occupied if occupied else None, totals['max_tile'][cell] / losses,
+                       totals['modulo'][cell] / losses)
+
+
+def write_table(path, columns, rows, file_format):
+    rows = list(rows)  # Summaries are small: one row per period and cabinet, or per cell
+    if file_format == 'parquet':
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow (pip install pyarrow); use --format csv.")
+        table = pyarrow.table({name: [value.item() if isinstance(value, np.generic) else value
+                                      for value in (row[index] for row in rows)]
+                               for index, name in enumerate(columns)})
+        pyarrow.parquet.write_table(table, path)
+    else:
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(rows)
+    print(f"Wrote {len(rows)} rows to {path}.")
+
+
+def run(chunks, summary, losses):
+    """Feeds every chunk through the aggregates; returns (games, games with a decodable board)."""
+    games = boards = 0
+    for chunk in with_boards(chunks):
+        summary.add(chunk)
+        losses.add(chunk)
+        games += len(chunk['score'])
+        boards += sum(len(rows) for rows, _ in chunk['boards'].values())
+    return games, boards
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Streaming summaries of recorded games.")
+    parser.add_argument('logs', nargs='*', help=f"game log files (default: {GAME_LOG_DIR}/*.csv.gz)")
+    parser.add_argument('--database', help="also read the games recorded in a leaderboard database before the logs")
+    parser.add_argument('--period', choices=sorted(PERIOD_FORMATS), default='hour')
+    parser.add_argument('--out', default="analytics", help="output path prefix")
+    parser.add_argument('--format', choices=('csv', 'parquet'), default='csv')
+    parser.add_argument('--chunk', type=int, default=CHUNK_ROWS, help="games per chunk")
+    args = parser.parse_args()
+
+    logs = args.logs or sorted(glob.glob(os.path.join(GAME_LOG_DIR, "*.csv.gz")))
+    if not logs and not args.database:
+        raise SystemExit(f"No game logs found in {GAME_LOG_DIR}.")
+
+    def sources():
+        if args.database:
+            yield from read_database(args.database, args.chunk, before=first_logged(logs))
+        yield from read_logs(logs, args.chunk)
+
+    start = time.perf_counter()
+    summary = PeriodSummary(args.period)
+    losses = LossPositions()
+    games, boards = run(sources(), summary, losses)
+    elapsed = time.perf_counter() - start
+    print(f"{games} games ({games - boards} without a readable board) in {elapsed:.1f} s "
+          f"({games / max(elapsed, 1e-9):.0f} games/s).")
+    write_table(f"{args.out}_summary.{args.format}", PeriodSummary.COLUMNS, summary.rows(), args.format)
+    write_table(f"{args.out}_losses.{args.format}", LossPositions.COLUMNS, losses.rows(), args.format)
@@ -0,0 +1,173 @@
+# loadtest.py
+#
+# Drives the real input path (InputQueue poller -> GameSession) with synthetic
+# button presses from a fake buttons backend, and reports what became of
+# them at several press rates: moves that changed the board, no-op moves,
+# presses rejected by the debounce, presses the poller never sampled, and
+# presses dropped or ignored. No hardware is needed: the display is a
+# stand-in that takes spi_ms per frame.
+#
+# Usage: python loadtest.py [--rates 2,5,10,20,50] [--duration 10] [--spi-ms 20]
+#                           [--error-every 0] [--seed 1]
+
+import argparse
+import contextlib
+import io
+import random
+import time
+from _buttons import InputQueue, BUTTON_BITS
+from _session import GameSession, STATE_GAME_OVER
+
+IDLE_WAIT = 0.05  # Same loop timing as main.py
+DIRECTIONS = ('left', 'right', 'up', 'down')
+MAX_HOLD = 0.08  # seconds a synthetic press is held at most
+
+
+class FakeButtonReader:
+    """
+    Stand-in for ButtonReader that replays a schedule of presses:
+    (start time, button name, hold time), sorted by start time.
+    """
+    backend = 'fake'
+
+    def __init__(self, presses):
+        self.presses = presses
+        self._first = 0  # First press that may still be held
+        self.sampled = set()  # Indices of the presses some read saw held down
+
+    def read_mask(self):
+        now = time.time()
+        while self._first < len(self.presses) and self.presses[self._first][0] + MAX_HOLD < now:
+            self._first += 1
+        mask = 0
+        for index in range(self._first, len(self.presses)):
+            start, name, hold = self.presses[index]
+            if start > now:
+                break
+            if now < start + hold:
+                mask |= BUTTON_BITS[name]
+                self.sampled.add(index)
+        return mask
+
+    def close(self):
+        pass
+
+
+class FakeDisplay:
+    """
+    Stand-in for the ST7789 that blocks like a real transfer: spi_ms per full
+    frame, and a windowed write in proportion to its area.
+    """
+    def __init__(self, width=240, height=240, spi_ms=20):
+        self.width = width
+        self.height = height
+        self.spi_time = spi_ms / 1000.0
+        self.frames = 0
+
+    def image(self, image, rotation=None, x=0, y=0):
+        self.frames += 1
+        time.sleep(self.spi_time * image.width * image.height / (self.width * self.height))
+
+
+def make_schedule(rate, duration, start, rng):
+    """Evenly spaced presses of random directions, held for half the press period."""
+    period = 1.0 / rate
+    hold = min(period / 2, MAX_HOLD)
+    return [(start + k * period, rng.choice(DIRECTIONS), hold) for k in range(int(duration * rate))]
+
+
+def run_rate(rate, duration, spi_ms, error_every, rng):
+    """
+    Plays for `duration` seconds at `rate` presses per second.
+
+    Returns:
+        dict: counts of generated presses and of what became of them (moved,
+        no_op, debounced, never_sampled, dropped, ignored), queue depth
+        statistics and frames drawn.
+    """
+    start = time.time() + 0.2
+    presses = make_schedule(rate, duration, start, rng)
+    reader = FakeButtonReader(presses)
+    input_queue = InputQueue(reader)
+    display = FakeDisplay(spi_ms=spi_ms)
+    applied = 0
+    depths = []
+
+    with contextlib.redirect_stdout(io.StringIO()):  # The game logs every move
+        session = GameSession(display, name=f"load{rate}", high_score_file="/dev/null")
+        session.rng.seed(rng.random())  # Tile spawns
+        session.start()
+        session.handle_events(['A'])
+        moves_before = session.metrics.moves
+        input_queue.start()
+        end = start + duration + 0.5  # Let the last presses drain
+        next_error = start + error_every if error_every else None
+        idle_work = False
+        while time.time() < end:
+            input_queue.wait(0 if idle_work else IDLE_WAIT)
+            now = time.time()
+            session.tick(now)
+            if next_error and now >= next_error:
+                # Same path as a wrong password: presses during the message are discarded
+                session.draw_error_message("Load test")
+                next_error = now + error_every
+            depths.append(len(input_queue.events))
+            events = input_queue.get_events()
+            if events:
+                if not session.message_until:
+                    applied += len(events)
+                session.handle_events(events)
+                idle_work = True
+                if session.current_state == STATE_GAME_OVER:
+                    session.handle_events(['A'])  # Keep playing
+            else:
+                idle_work = session.speculate()
+        input_queue.stop()
+
+    generated = len(presses)
+    produced = applied + session.ignored_events + input_queue.dropped + len(input_queue.events)
+    never_sampled = generated - len(reader.sampled)  # Released between two polls
+    moved = session.metrics.moves - moves_before
+    return {
+        'rate': rate,
+        'generated': generated,
+        'applied': applied,
+        'moved': moved,
+        'no_op': applied - moved,  # Handed to the game but did not change the board
+        'debounced': generated - produced - never_sampled,  # Sampled, but no press edge got through
+        'never_sampled': never_sampled,
+        'dropped': input_queue.dropped,
+        'ignored': session.ignored_events,
+        'max_depth': max(depths) if depths else 0,
+        'mean_depth': sum(depths) / len(depths) if depths else 0.0,
+        'frames': display.frames,
+        'throughput': applied / duration,
+    }
+
+
+def print_report(results):
+    print(f"{'rate/s':>7} {'presses':>8} {'moved':>6} {'no-op':>6} {'debounced':>10} {'unsampled':>10} "
+          f"{'dropped':>8} {'ignored':>8} {'drop %':>7} {'applied/s':>10} {'depth max':>10} {'depth mean':>11} "
+          f"{'frames':>7}")
+    for r in results:
+        lost = r['debounced'] + r['never_sampled'] + r['dropped'] + r['ignored']
+        drop_rate = 100.0 * lost / r['generated'] if r['generated'] else 0.0
+        print(f"{r['rate']:>7g} {r['generated']:>8} {r['moved']:>6} {r['no_op']:>6} {r['debounced']:>10} "
+              f"{r['never_sampled']:>10} {r['dropped']:>8} {r['ignored']:>8} {drop_rate:>7.1f} "
+              f"{r['throughput']:>10.1f} {r['max_depth']:>10} {r['mean_depth']:>11.2f} {r['frames']:>7}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Synthetic button load test for the game loop.")
+    parser.add_argument('--rates', default="2,5,10,20,50", help="comma-separated presses per second")
+    parser.add_argument('--duration', type=float, default=10, help="seconds per rate")
+    parser.add_argument('--spi-ms', type=float, default=20, help="simulated display transfer time per frame")
+    parser.add_argument('--error-every', type=float, default=0, help="show an error message every N seconds (0: never)")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    results = []
+    for rate in (float(value) for value in args.rates.split(',')):
+        print(f"Running {rate:g} presses/s for {args.duration:g} s...")
+        results.append(run_rate(rate, args.duration, args.spi_ms, args.error_every, rng))
+    print_report(results)
@@ -0,0 +1,212 @@
+# server.py
+#
+# Runs several independent game sessions (one per display + button set) in one
+# process. Sessions share the font, sprite cache and libraries; a round-robin
+# scheduler serves them fairly.
+#
+# Usage: python server.py [config.json]
+
+import json  # For the sessions config file
+import threading  # Shared wake-up condition for all input queues
+import time
+import traceback # For exception tracing
+import sys  # For exception tracing
+import hardware_setup  # Import the hardware setup functions
+from _buttons import InputQueue  # Buffered, debounced button events
+from _session import GameSession, GRID_SIZE, HINT_AFTER  # Game state, rules and screens
+from _leaderboard import Leaderboard, LEADERBOARD_FILE  # Finished games, written in the background
+from _gamelog import GameLog, GAME_LOG_DIR  # Compressed daily logs of finished games, for analytics.py
+from _checkpoint import CheckpointJournal  # Resume each cabinet's game after a restart
+from _latency import LatencyTracker  # Input-to-photon timings per stage
+from _saves import SaveStore  # Each cabinet's save slots
+from _idle import IdleManager, IDLE_AFTER, BACKLIGHT_OFF_AFTER  # Per-cabinet power saving
+from _engine import set_rules  # Game variant for every engine
+from _rules import load_rules, RULES_FILE  # Rules file, or the classic rules
+from _status import StatusExport, STATUS_DIR  # Live state for local monitors (status.py)
+from _metrics import MetricsExporter, METRICS_DIR, WRITE_INTERVAL  # Prometheus textfile for node_exporter
+from _memprofile import MemoryProfiler  # Opt-in allocation profiling for soak tests
+from _ntuple import load_hints, NETWORK_FILE  # Trained networks for hints
+from _tcache import CACHE_FILE  # Evaluation cache shared with train.py and across restarts
+
+CONFIG_FILE = "server.json"
+IDLE_WAIT = 0.05  # seconds to block waiting for input before looping again
+MAX_EVENTS_PER_TURN = 8  # Events one session may handle before the next gets a turn
+
+
+def load_config(path):
+    """
+    Loads the server config. Example:
+
+    {
+        "max_events_per_turn": 8,
+        "rules_file": "rules.json",
+        "game_log_dir": "gamelogs",
+        "status_dir": "/dev/shm",
+        "metrics_dir": "/var/lib/node_exporter/textfile_collector", "metrics_interval": 5,
+        "network": "networks/modulo_{size}x{size}", "eval_cache": "tables/eval_cache_{size}x{size}.bin",
+        "sessions": [
+            {
+                "name": "cabinet1",
+                "display": {"cs": "CE0", "dc": 25, "reset": 24, "spi_bus": 0, "rotation": 180, "y_offset": 80,
+                            "baudrate": 62500000, "transport": "spidev"},
+                "backlight": 26,
+                "idle_after": 60, "backlight_off_after": 600, "attract": true, "hint_after": 10,
+                "buttons": {"A": 5, "B": 6, "C": 4, "left": 27, "right": 23, "up": 17, "down": 22}
+            }
+        ]
+    }
+    """
+    with open(path, 'r') as f:
+        config = json.load(f)
+    if not config.get('sessions'):
+        raise ValueError(f"No sessions defined in {path}.")
+    return config
+
+
+class SessionScheduler:
+    """
+    Serves every session in turn. Each turn a session handles at most
+    max_events_per_turn queued events, and the starting session rotates so a
+    busy cabinet cannot starve the others.
+    """
+    def __init__(self, max_events_per_turn=MAX_EVENTS_PER_TURN):
+        self.max_events_per_turn = max_events_per_turn
+        self.condition = threading.Condition()  # Shared by every InputQueue
+        self.entries = []  # (session, input_queue)
+        self.idle = {}  # session name -> IdleManager
+        self.leaderboard = None
+        self.metrics = None  # MetricsExporter for every session
+        self._next = 0
+        self._idle_work = False  # A session still had speculative work to do last turn
+
+    def add_session(self, session, input_queue, idle=None):
+        self.entries.append((session, input_queue))
+        if self.metrics is not None:
+            self.metrics.register(session.name, session.metrics)
+        if idle is not None:
+            self.idle[session.name] = idle
+
+    def wait_time(self, timeout):
+        """The longest the loop may block: the shortest wait of any session (None if all are asleep)."""
+        waits = [self.idle[session.name].wait_time() if session.name in self.idle else timeout
+                 for session, _ in self.entries]
+        waits = [wait for wait in waits if wait is not None]
+        return min(waits) if waits else None
+
+    def start(self):
+        for session, input_queue in self.entries:
+            session.start()
+            input_queue.start()
+        if self.metrics is not None:
+            self.metrics.start()
+
+    def stop(self):
+        if self.metrics is not None:
+            self.metrics.stop()
+        for session, input_queue in self.entries:
+            input_queue.stop()
+            if session.checkpoint is not None:
+                session.checkpoint.close()
+            if session.save_store is not None:
+                session.save_store.close()
+            if session.status is not None:
+                session.status.close()
+            if session.eval_cache is not None:
+                session.eval_cache.close()  # Shared by sessions of one size; closing twice is harmless
+        if self.leaderboard is not None:
+            self.leaderboard.close()
+
+    def run_once(self, timeout=IDLE_WAIT):
+        # Block until any session has input instead of sleeping a fixed time,
+        # unless idle work is still left to do (with every screen off, block until a press)
+        with self.condition:
+            if not self._idle_work and not any(input_queue.events for _, input_queue in self.entries):
+                self.condition.wait(self.wait_time(timeout))
+        self._idle_work = False
+
+        now = time.time()
+        count = len(self.entries)
+        for offset in range(count):
+            session, input_queue = self.entries[(self._next + offset) % count]
+            idle = self.idle.get(session.name)
+            try:
+                session.tick(now)
+                events = input_queue.get_events(self.max_events_per_turn)
+                if events:
+                    if idle is not None:
+                        events = idle.input(events, now)  # A press that wakes the screen is not played
+                    session.handle_events(events)
+                    self._idle_work = True
+                elif session.speculate():
+                    # Idle: prepare the next move's frames while the player thinks
+                    self._idle_work = True
+                if idle is not None:
+                    idle.tick(now)
+            except Exception as e:
+                # A fault in one session must not take down the other cabinets
+                session.metrics.errors += 1
+                print(f"Error in session '{session.name}':", e)
+                traceback.print_exc(file=sys.stdout)
+        self._next = (self._next + 1) % count
+
+    def run(self):
+        while True:
+            self.run_once()
+
+
+def build_scheduler(config):
+    # One rule set for the whole process, compiled before any session builds move tables
+    set_rules(load_rules(config.get('rules_file', RULES_FILE)))
+    scheduler = SessionScheduler(config.get('max_events_per_turn', MAX_EVENTS_PER_TURN))
+    # One store for every cabinet; each session sees its own top 10
+    scheduler.leaderboard = Leaderboard(config.get('leaderboard_file', LEADERBOARD_FILE),
+                                        game_log=GameLog(config.get('game_log_dir', GAME_LOG_DIR)))
+    scheduler.metrics = MetricsExporter(config.get('metrics_dir', METRICS_DIR),
+                                        interval=config.get('metrics_interval', WRITE_INTERVAL))
+    hints = {}  # grid size -> (network, eval cache), shared by the cabinets of that size
+    for index, entry in enumerate(config['sessions']):
+        name = entry.get('name', f"session{index}")
+        print(f"Initializing session '{name}'.")
+        disp = hardware_setup.init_display(**entry.get('display', {}))
+        backlight = hardware_setup.init_backlight(entry.get('backlight', hardware_setup.BACKLIGHT_PIN))
+        pins = entry.get('buttons', hardware_setup.BUTTON_PINS)
+        buttons = hardware_setup.init_buttons(pins)
+        reader = hardware_setup.init_button_reader(buttons, pins)
+        input_queue = InputQueue(reader, condition=scheduler.condition)
+        grid_size = entry.get('grid_size', GRID_SIZE)
+        if grid_size not in hints:
+            hints[grid_size] = load_hints(grid_size, config.get('network', NETWORK_FILE),
+                                          config.get('eval_cache', CACHE_FILE))
+        network, eval_cache = hints[grid_size]
+        session = GameSession(disp, name=name, high_score_file=entry.get('high_score_file', f"high_score_{name}.txt"),
+                              leaderboard=scheduler.leaderboard, grid_size=grid_size,
+                              checkpoint=CheckpointJournal(name, grid_size), latency=LatencyTracker(name),
+                              save_store=SaveStore(name, grid_size),
+                              status=StatusExport(name, config.get('status_dir', STATUS_DIR), input_queue),
+                              network=network, eval_cache=eval_cache, hint_after=entry.get('hint_after', HINT_AFTER))
+        idle = IdleManager(session, backlight, input_queue, idle_after=entry.get('idle_after', IDLE_AFTER),
+                           backlight_off_after=entry.get('backlight_off_after', BACKLIGHT_OFF_AFTER),
+                           attract=entry.get('attract', True), active_wait=IDLE_WAIT)
+        scheduler.add_session(session, input_queue, idle)
+    return scheduler
+
+
+if __name__ == '__main__':
+    # One profiler for the process (None unless MODULO2048_MEMPROFILE is set)
+    profiler = MemoryProfiler.from_environment("server")
+    if profiler is not None:
+        profiler.start()
+    config_path = sys.argv[1] if len(sys.argv) > 1 else CONFIG_FILE
+    scheduler = build_scheduler(load_config(config_path))
+    try:
+        scheduler.start()
+        scheduler.run()
+    except KeyboardInterrupt:
+        print("Server terminated by user.")
+    except Exception as e:
+        print("Unexpected error:", e)
+        traceback.print_exc(file=sys.stdout)
+    finally:
+        scheduler.stop()
+        if profiler is not None:
+            profiler.stop()
@@ -1,111 +1,115 @@
 # hardware_setup.py
 
 import board
+import busio
 import digitalio
 from digitalio import DigitalInOut, Direction, Pull
-from PIL import Image, ImageDraw, ImageFont
 from adafruit_rgb_display import st7789
+from _buttons import ButtonReader
+from _display import ST7789, SpidevBus  # Bulk-write display transport
 
-# Grid Parameters
-GRID_SIZE = 4  # 4x4 grid for 2048
-TILE_SIZE = 55  # Size of each tile in pixels
-TILE_THICKNESS = 4  # Thickness of grid lines in pixels
-GRID_COLOR = (255, 255, 255)  # White grid lines
-
-# Calculate total grid width and height
-TOTAL_GRID_SIZE = GRID_SIZE * TILE_SIZE + (GRID_SIZE + 1) * TILE_THICKNESS
-
-# Offsets to center the grid on the display
+# Display size; the game scales its board to fit
 DISPLAY_WIDTH = 240
 DISPLAY_HEIGHT = 240
-offset_x = (DISPLAY_WIDTH - TOTAL_GRID_SIZE) // 2
-offset_y = (DISPLAY_HEIGHT - TOTAL_GRID_SIZE) // 2
 
-# Display setup
-def init_display():
-    cs_pin = DigitalInOut(board.CE0)
-    dc_pin = DigitalInOut(board.D25)
-    reset_pin = DigitalInOut(board.D24)
-    BAUDRATE = 24000000
+# Default display pins and bus settings
+DISPLAY_CS = "CE0"
+DISPLAY_DC = 25
+DISPLAY_RESET = 24
+BAUDRATE = 24000000  # SPI clock; the spidev transport is usually fine at 40000000-62500000
+DISPLAY_TRANSPORT = "spidev"  # "spidev" for bulk writes, "adafruit" for the adafruit_rgb_display driver
+SPIDEV_DEVICES = {"CE0": 0, "CE1": 1}  # Chip selects the spidev transport can drive
+
+def board_pin(pin):
+    """Looks up a board pin from a BCM number (25 -> board.D25) or a name ("CE0")."""
+    if isinstance(pin, int):
+        return getattr(board, f"D{pin}")
+    return getattr(board, pin)
+
+# SPI buses are shared by every display wired to them
+_spi_buses = {}
+
+def init_spi(bus=0):
+    if bus not in _spi_buses:
+        if bus == 0:
+            _spi_buses[bus] = board.SPI()
+        else:
+            _spi_buses[bus] = busio.SPI(board_pin(f"SCK_{bus}"), MOSI=board_pin(f"MOSI_{bus}"), MISO=board_pin(f"MISO_{bus}"))
+    return _spi_buses[bus]
 
-    spi = board.SPI()
+# Display setup
+def init_display(cs=DISPLAY_CS, dc=DISPLAY_DC, reset=DISPLAY_RESET, spi_bus=0,
+                 rotation=180, y_offset=80, baudrate=BAUDRATE, transport=DISPLAY_TRANSPORT):
+    dc_pin = DigitalInOut(board_pin(dc))
+    reset_pin = DigitalInOut(board_pin(reset))
+
+    if transport == "spidev" and cs in SPIDEV_DEVICES:
+        try:
+            bus = SpidevBus(spi_bus, SPIDEV_DEVICES[cs], baudrate)
+            return ST7789(bus, dc_pin, reset_pin, width=DISPLAY_WIDTH, height=DISPLAY_HEIGHT,
+                          rotation=rotation, y_offset=y_offset)
+        except Exception as e:
+            print("spidev display transport unavailable, using the adafruit driver:", e)
+
+    cs_pin = DigitalInOut(board_pin(cs))
+    spi = init_spi(spi_bus)
     disp = st7789.ST7789(
         spi,
         height=DISPLAY_HEIGHT,
         width=DISPLAY_WIDTH,
-        y_offset=80,
-        rotation=180,  # Adjust based on your display orientation
+        y_offset=y_offset,
+        rotation=rotation,  # Adjust based on your display orientation
         cs=cs_pin,
         dc=dc_pin,
         rst=reset_pin,
-        baudrate=BAUDRATE,
+        baudrate=baudrate,
     )
     return disp
 
-# Define a font
-FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
-FONT_SIZE = 24
-
-try:
-    font = ImageFont.truetype(FONT_PATH, FONT_SIZE)
-except IOError:
-    # Fallback to default font if the specified font is not found
-    font = ImageFont.load_default()
-
 # Backlight setup
-def init_backlight():
-    backlight = DigitalInOut(board.D26)
+BACKLIGHT_PIN = 26
+
+def init_backlight(pin=BACKLIGHT_PIN):
+    backlight = DigitalInOut(board_pin(pin))
     backlight.switch_to_output()
     backlight.value = True
     return backlight
 
+# Joystick input pins (BCM GPIO numbers)
+BUTTON_PINS = {
+    'A': 5,
+    'B': 6,
+    'C': 4,
+    'left': 27,
+    'right': 23,
+    'up': 17,
+    'down': 22
+}
+
 # Joystick input pins setup
-def init_buttons():
-    button_A = DigitalInOut(board.D5)
-    button_A.direction = Direction.INPUT
-    button_A.pull = Pull.UP
-
-    button_B = DigitalInOut(board.D6)
-    button_B.direction = Direction.INPUT
-    button_B.pull = Pull.UP
-
-    button_C = DigitalInOut(board.D4)
-    button_C.direction = Direction.INPUT
-    button_C.pull = Pull.UP
-
-    button_L = DigitalInOut(board.D27)
-    button_L.direction = Direction.INPUT
-    button_L.pull = Pull.UP
-
-    button_R = DigitalInOut(board.D23)
-    button_R.direction = Direction.INPUT
-    button_R.pull = Pull.UP
-
-    button_U = DigitalInOut(board.D17)
-    button_U.direction = Direction.INPUT
-    button_U.pull = Pull.UP
-
-    button_D = DigitalInOut(board.D22)
-    button_D.direction = Direction.INPUT
-    button_D.pull = Pull.UP
-
-    return {
-        'A': button_A,
-        'B': button_B,
-        'C': button_C,
-        'left': button_L,
-        'right': button_R,
-        'up': button_U,
-        'down': button_D
-    }
-
-# Initialize all hardware components and expose them
-disp = init_display()
-backlight = init_backlight()
-buttons = init_buttons()
-
-# Create blank image for drawing
-width = disp.width  # Should be 240
-height = disp.height  # Should be 240
-image = Image.new("RGB", (width, height))
-draw = ImageDraw.Draw(image)
+def init_buttons(pins=BUTTON_PINS):
+    buttons = {}
+    for name, pin in pins.items():
+        button = DigitalInOut(board_pin(pin))
+        button.direction = Direction.INPUT
+        button.pull = Pull.UP
+        buttons[name] = button
+    return buttons
+
+# Bulk button sampling (one read for all pins)
+def init_button_reader(buttons, pins=BUTTON_PINS):
+    return ButtonReader(pins, buttons, make_buttons=lambda: init_buttons(pins))
+
+# Initialize all hardware components and expose them (single display setup used by main.py)
+disp = None
+backlight = None
+buttons = None
+button_reader = None
+
+def init_hardware():
+    global disp, backlight, buttons, button_reader
+    disp = init_display()
+    backlight = init_backlight()
+    buttons = init_buttons()
+    button_reader = init_button_reader(buttons)
+    buttons = button_reader.buttons  # New objects if the reader had to claim the pins again
@@ -0,0 +1,170 @@
+# spitest.py
+#
+# Checks the display transport (_display.py) without a display: frames and
+# windows are written through a fake SPI panel that decodes the ST7789
+# command stream, and the panel is compared with one driven by the
+# adafruit_rgb_display driver at the same rotation (or a model of it, where
+# the library is not installed). Also reports the bytes, transfers and
+# modelled bus time per full frame at several clocks.
+#
+# With --device, also runs a loopback check on a real spidev device
+# (jumper MOSI to MISO) at each clock.
+#
+# Usage: python spitest.py [--clocks 24,40,62.5] [--windows 200] [--device 0.0] [--seed 1]
+
+import argparse
+import random
+import time
+import numpy as np
+from PIL import Image
+from _display import ST7789, FakePanel, FakePin, panel_origin, to_rgb565, MADCTL, MADCTL_MX, MADCTL_MY, CASET, RASET, RAMWR
+
+
+class FakeSPI:
+    """busio.SPI stand-in that passes adafruit_rgb_display's writes to a FakePanel."""
+    def __init__(self, panel):
+        self.panel = panel
+
+    def try_lock(self):
+        return True
+
+    def unlock(self):
+        pass
+
+    def configure(self, **settings):
+        pass
+
+    def write(self, data, start=0, end=None):
+        self.panel.write(bytes(data)[start:end])
+
+
+class AdafruitModel:
+    """
+    What adafruit_rgb_display's ST7789 sends, for hosts without the library:
+    MADCTL MX|MY at init, then every image turned counter-clockwise by the
+    rotation and written at x, y plus the offsets.
+    """
+    def __init__(self, panel, rotation=180, x_offset=0, y_offset=80):
+        self.panel = panel
+        self.width = panel.width
+        self.height = panel.height
+        self.rotation = rotation
+        self.x_offset = x_offset
+        self.y_offset = y_offset
+        self._write(MADCTL, bytes([MADCTL_MY | MADCTL_MX]))
+
+    def _write(self, command, data=None):
+        self.panel.dc.value = False
+        self.panel.write(bytes([command]))
+        if data is not None:
+            self.panel.dc.value = True
+            self.panel.write(data)
+
+    def image(self, image, rotation=None, x=0, y=0):
+        rotation = self.rotation if rotation is None else rotation
+        if rotation:
+            image = image.rotate(rotation, expand=True)
+        width, height = image.size
+        if x + width > self.width or y + height > self.height:
+            raise ValueError(f"Image must not exceed dimensions of display ({self.width}x{self.height}).")
+        x += self.x_offset
+        y += self.y_offset
+        self._write(CASET, bytes([x >> 8, x & 0xFF, (x + width - 1) >> 8, (x + width - 1) & 0xFF]))
+        self._write(RASET, bytes([y >> 8, y & 0xFF, (y + height - 1) >> 8, (y + height - 1) & 0xFF]))
+        self._write(RAMWR, to_rgb565(np.asarray(image.convert("RGB"))))
+
+
+def adafruit_display(panel, rotation, y_offset=80):
+    """adafruit_rgb_display's ST7789 driving a fake panel, or an AdafruitModel where the library cannot be loaded."""
+    try:
+        from adafruit_rgb_display import st7789
+    except Exception:  # Not installed, or Blinka does not know this host
+        return AdafruitModel(panel, rotation, y_offset=y_offset)
+    return st7789.ST7789(FakeSPI(panel), dc=panel.dc, cs=FakePin(), rst=panel.reset, width=panel.width,
+                         height=panel.height, y_offset=y_offset, rotation=rotation)
+
+
+def check_transport(rotation, windows, rng):
+    """
+    Writes a full frame and then random windows through a fake panel, and
+    the same through the adafruit driver (windows placed as GameSession
+    places them) into a second one.
+
+    Returns:
+        bool: True if both panels show the same after every write.
+    """
+    reference_panel = FakePanel()
+    reference = adafruit_display(reference_panel, rotation)
+    panel = FakePanel()
+    display = ST7789(panel, panel.dc, panel.reset, rotation=rotation)  # Same offsets as the adafruit driver
+    frame = rng.integers(0, 256, (display.height, display.width, 3), dtype=np.uint8)
+    display.write_pixels(0, 0, frame)
+    reference.image(Image.fromarray(frame))
+    if not (panel.glass() == reference_panel.glass()).all():
+        print(f"rotation {rotation}: full frame differs from the adafruit driver")
+        return False
+    for _ in range(windows):
+        width = int(rng.integers(1, display.width + 1))
+        height = int(rng.integers(1, display.height + 1))
+        x = int(rng.integers(0, display.width - width + 1))
+        y = int(rng.integers(0, display.height - height + 1))
+        pixels = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        display.write_pixels(x, y, pixels)
+        panel_x, panel_y = panel_origin((x, y, x + width, y + height), display.width, display.height, rotation)
+        reference.image(Image.fromarray(pixels), x=panel_x, y=panel_y)
+        if not (panel.glass() == reference_panel.glass()).all():
+            print(f"rotation {rotation}: window {width}x{height} at ({x}, {y}) differs from the adafruit driver")
+            return False
+    return True
+
+
+def frame_cost(clock_mhz):
+    """Bytes, transfers and modelled bus time of one full frame."""
+    panel = FakePanel(baudrate=clock_mhz * 1e6)
+    display = ST7789(panel, panel.dc, panel.reset)
+    panel.transfers = panel.bytes_sent = 0
+    panel.bus_time = 0.0
+    display.write_pixels(0, 0, np.zeros((display.height, display.width, 3), dtype=np.uint8))
+    return panel.bytes_sent, panel.transfers, panel.bus_time
+
+
+def loopback(device, clock_mhz, size=65536):
+    """Sends a random buffer through a spidev device wired MOSI to MISO; returns (ok, seconds)."""
+    import spidev
+    bus, chip = (int(part) for part in device.split('.'))
+    spi = spidev.SpiDev()
+    spi.open(bus, chip)
+    try:
+        spi.max_speed_hz = int(clock_mhz * 1e6)
+        data = bytes(random.getrandbits(8) for _ in range(size))
+        start = time.perf_counter()
+        received = bytes(spi.xfer3(data))
+        return received == data, time.perf_counter() - start
+    finally:
+        spi.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Display transport self-test.")
+    parser.add_argument('--clocks', default="24,40,62.5", help="comma-separated SPI clocks in MHz")
+    parser.add_argument('--windows', type=int, default=200, help="random windows written per rotation")
+    parser.add_argument('--device', help="spidev device for a loopback test, e.g. 0.0 (MOSI jumpered to MISO)")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+    clocks = [float(value) for value in args.clocks.split(',')]
+
+    reference = adafruit_display(FakePanel(), 180)
+    print(f"Reference: {'model of the adafruit driver' if isinstance(reference, AdafruitModel) else 'adafruit_rgb_display'}")
+    passed = all([check_transport(rotation, args.windows, rng) for rotation in (0, 90, 180, 270)])
+    print(f"Fake panel check: {'passed' if passed else 'FAILED'}")
+
+    print(f"{'clock MHz':>10} {'bytes':>8} {'transfers':>10} {'bus ms':>7}")
+    for clock in clocks:
+        sent, transfers, bus_time = frame_cost(clock)
+        print(f"{clock:>10g} {sent:>8} {transfers:>10} {bus_time * 1000:>7.2f}")
+
+    if args.device:
+        for clock in clocks:
+            ok, seconds = loopback(args.device, clock)
+            print(f"Loopback {args.device} at {clock:g} MHz: {'ok' if ok else 'MISMATCH'}, {seconds * 1000:.2f} ms for 64 KB")
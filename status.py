@@ -0,0 +1,109 @@
+# status.py
+#
+# Shows the live state of running games (main.py or every server.py cabinet)
+# from their shared status records (see _status.py): state, score, board,
+# input counters and frame timings. Reading a record is a memory read, so
+# --watch can run at any rate without disturbing the game.
+#
+# Exits with status 1 if a named game is not running, so it can serve as a
+# watchdog probe.
+#
+# Usage: python status.py [name ...] [--dir /dev/shm] [--watch 1.0] [--json]
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from _pass import BoardEncoder  # Tile codes -> values
+from _status import StatusReader, STATUS_DIR, STATUS_PREFIX, STATUS_SUFFIX, status_path
+
+TILE_VALUES = BoardEncoder().TILE_VALUES
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def format_tile(code):
+    value, tile_type = TILE_VALUES[code]
+    if tile_type == 'empty':
+        return '.'
+    return f"%{value}" if tile_type == 'modulo' else str(value)
+
+
+def format_status(name, status, now):
+    if status is None:
+        return f"{name}: no status published"
+    age = now - status['updated_at']
+    running = process_alive(status['pid'])
+    lines = [
+        f"{name}: {status['state']}{' (idle)' if status['suspended'] else ''}, pid {status['pid']}"
+        f"{'' if running else ' (not running)'}, updated {age:.1f} s ago",
+        f"  score {status['score']}, high score {status['high_score']}, {status['move_count']} moves "
+        f"this game, {status['moves_since_modulo']} since the last modulo block",
+        f"  input: {status['events']} events, {status['moves']} moves, {status['ignored_events']} ignored, "
+        f"{status['dropped_events']} dropped",
+        f"  display: {status['frames']} frames, {status['pixels_sent']} pixels, last "
+        f"{status['last_frame_time'] * 1000:.1f} ms, average {status['average_frame_time'] * 1000:.1f} ms",
+    ]
+    for row in status['board']:
+        lines.append("  " + " ".join(f"{format_tile(code):>5}" for code in row))
+    return "\n".join(lines)
+
+
+def find_games(directory):
+    paths = sorted(glob.glob(os.path.join(directory, f"{STATUS_PREFIX}*{STATUS_SUFFIX}")))
+    return {os.path.basename(path)[len(STATUS_PREFIX):-len(STATUS_SUFFIX)]: path for path in paths}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Live state of running games.")
+    parser.add_argument('names', nargs='*', help="session names (default: every game found)")
+    parser.add_argument('--dir', default=STATUS_DIR, help="directory of the status records")
+    parser.add_argument('--watch', type=float, help="refresh every this many seconds")
+    parser.add_argument('--json', action='store_true', help="print one JSON object per game")
+    args = parser.parse_args()
+
+    games = {name: status_path(name, args.dir) for name in args.names} if args.names else find_games(args.dir)
+    if not games:
+        print(f"No running games found in {args.dir}.")
+        sys.exit(1)
+    readers = {}
+    missing = False
+    for name, path in games.items():
+        try:
+            readers[name] = StatusReader(path)
+        except (OSError, ValueError) as e:
+            print(f"{name}: {e}")
+            missing = True
+
+    try:
+        while True:
+            now = time.time()
+            for name, reader in readers.items():
+                status = reader.read()
+                if args.json:
+                    print(json.dumps({'name': name, **status} if status is not None else {'name': name}))
+                else:
+                    print(format_status(name, status, now))
+                if status is None or not process_alive(status['pid']):
+                    missing = True
+            if not args.watch:
+                break
+            time.sleep(args.watch)
+            if not args.json:
+                print()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for reader in readers.values():
+            reader.close()
+    sys.exit(1 if missing else 0)
@@ -0,0 +1,7 @@
+# conftest.py
+
+import os
+import sys
+
+# The game's modules sit at the top of the repository, next to main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,48 @@
+# test_analytics.py
+
+import numpy as np
+import pytest
+from _gamelog import GameLog
+from _pass import BoardEncoder
+from analytics import decode_passwords, read_logs, first_logged
+
+encoder = BoardEncoder()
+
+
+@pytest.mark.parametrize('size', [3, 4, 5, 6])
+def test_bulk_decoder_matches_board_encoder(size):
+    rng = np.random.default_rng(size)
+    boards = rng.integers(0, encoder.MAX_TILE_INDEX + 1, (300, size * size)).astype(np.uint8)
+    boards[0] = 0
+    boards[1] = encoder.MAX_TILE_INDEX
+    passwords = [encoder.save_codes_to_password(codes, size) for codes in boards]
+    codes, valid = decode_passwords(passwords, size)
+    assert valid.all()
+    assert (codes.reshape(len(boards), -1) == boards).all()
+    for password, board in zip(passwords[:20], codes):
+        assert encoder.number_to_codes(encoder.decode(password), size) == board.ravel().tolist()
+
+
+def test_bulk_decoder_flags_invalid_passwords():
+    length = encoder.password_length(4)
+    good = encoder.save_codes_to_password(list(range(16)), 4)
+    passwords = [good, '#' * length, '/' * length, good[:-1] + '*']  # '/' * 11 is past the largest board
+    codes, valid = decode_passwords(passwords, 4)
+    assert valid.tolist() == [True, False, False, False]
+    assert codes[0].ravel().tolist() == list(range(16))
+    assert decode_passwords([], 5)[0].shape == (0, 5, 5)
+
+
+def test_logged_games_keep_zeros(tmp_path):
+    log = GameLog(str(tmp_path))
+    games = [{'finished_at': 1000.0 + index, 'session': 'main', 'grid_size': 4, 'score': 0, 'max_tile': 2,
+              'moves': index, 'duration': 1.5, 'won': 0, 'modulo_merges': 0, 'modulo_clears': 0,
+              'password': encoder.save_codes_to_password([0] * 16)} for index in range(5)]
+    games[4]['modulo_clears'] = ''
+    log.write(games)
+    paths = [log.path_for(1000.0)]
+    chunks = list(read_logs(paths, chunk_rows=2))
+    assert [len(chunk['score']) for chunk in chunks] == [2, 2, 1]
+    assert np.concatenate([chunk['won'] for chunk in chunks]).tolist() == [0] * 5
+    assert np.concatenate([chunk['modulo_clears'] for chunk in chunks]).tolist() == [0, 0, 0, 0, -1]
+    assert first_logged(paths) == 1000.0
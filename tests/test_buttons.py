@@ -0,0 +1,78 @@
+# test_buttons.py
+
+import threading
+import time
+from _buttons import InputQueue, BTN_A
+from _idle import IdleManager, IDLE_POLL_INTERVAL, OFF_POLL_INTERVAL
+
+
+class EdgeReader:
+    """ButtonReader stand-in with edge events: wait_edge() blocks until press() or release()."""
+    can_wait = True
+
+    def __init__(self):
+        self.mask = 0
+        self.reads = 0
+        self.waits = 0
+        self._edge = threading.Event()
+
+    def read_mask(self):
+        self.reads += 1
+        return self.mask
+
+    def wait_edge(self, timeout):
+        self.waits += 1
+        edge = self._edge.wait(timeout)
+        self._edge.clear()
+        return edge
+
+    def press(self, mask):
+        self.mask = mask
+        self._edge.set()
+
+
+class Session:
+    name = "test"
+    current_state = None
+    suspended = False
+    screen_frame = None
+
+    def present(self, frame=None):
+        pass
+
+    def publish_status(self):
+        pass
+
+
+def test_idle_poller_blocks_on_edges_until_a_press():
+    reader = EdgeReader()
+    queue = InputQueue(reader, debounce_time=0)
+    idle = IdleManager(Session(), input_queue=queue, idle_after=10, backlight_off_after=20, attract=False)
+    idle.tick(idle.last_input + 10)
+    assert queue.edge_wait and queue.poll_interval == IDLE_POLL_INTERVAL
+    queue.start()
+    try:
+        time.sleep(0.3)
+        assert reader.reads <= 2 and reader.waits == reader.reads  # No samples without an edge
+        reader.press(BTN_A)
+        assert queue.wait(1.0)
+        assert queue.get_events() == ['A']
+        reads, waits = reader.reads, reader.waits
+        time.sleep(0.3)
+        # A held button is sampled every poll interval, for its release
+        assert reader.reads >= reads + 3 and reader.waits == waits
+    finally:
+        reader.press(0)
+        queue.stop()
+
+
+def test_polling_backends_slow_down_further_with_the_backlight_off():
+    queue = InputQueue(object())  # A reader without edge events
+    active_interval = queue.poll_interval
+    idle = IdleManager(Session(), input_queue=queue, idle_after=10, backlight_off_after=20, attract=False)
+    idle.tick(idle.last_input + 10)
+    assert idle.mode == 'idle' and queue.poll_interval == IDLE_POLL_INTERVAL
+    idle.tick(idle.last_input + 20)
+    assert idle.mode == 'off' and queue.poll_interval == OFF_POLL_INTERVAL
+    assert idle.input(['A']) == []
+    assert idle.mode == 'active' and queue.poll_interval == active_interval and not queue.edge_wait
@@ -0,0 +1,99 @@
+# test_checkpoint.py
+
+import os
+import numpy as np
+import pytest
+from _checkpoint import CheckpointJournal
+from _engine import get_engine, DIRECTIONS
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # Move tables are cached in the working directory
+    journal = CheckpointJournal("test", directory=str(tmp_path / "checkpoints"), fsync_batch=4)
+    yield journal
+    journal.close()
+
+
+def play(journal, grid, moves, seed=0):
+    """Makes and journals up to moves random moves; returns the states after each one."""
+    engine = get_engine(4)
+    rng = np.random.default_rng(seed)
+    score, counter = 0, 0
+    states = []
+    for _ in range(moves):
+        direction = DIRECTIONS[int(rng.integers(4))]
+        grid, changed, points = engine.move(grid, direction)
+        score += points
+        counter += 1
+        empty = np.flatnonzero(grid.ravel() == 0)
+        cell = int(rng.choice(empty)) if len(empty) else None
+        if cell is not None:
+            grid.flat[cell] = int(rng.integers(1, 3))
+        journal.log_move(direction, cell, int(grid.flat[cell]) if cell is not None else 0, counter)
+        states.append((grid.copy(), score, min(counter, 63)))
+    return states
+
+
+def start(journal):
+    grid = np.zeros((4, 4), dtype=np.uint8)
+    grid[0, 0] = grid[3, 3] = 1
+    journal.snapshot(grid, 0, 0, 10, 12.5, 'GAME')
+    return grid
+
+
+def test_restore_replays_the_journal(journal):
+    states = play(journal, start(journal), 70)
+    restored = CheckpointJournal("test", directory=os.path.dirname(journal.snapshot_path)).restore()
+    grid, score, counter = states[-1]
+    assert (restored['grid'] == grid).all()
+    assert restored['score'] == score
+    assert restored['moves_since_last_modulo_block'] == counter == 63  # The journal keeps six bits
+    assert restored['move_count'] == 10 + 70
+    assert (restored['elapsed'], restored['state']) == (12.5, 'GAME')
+
+
+def test_truncated_journal_replays_the_complete_moves(journal):
+    states = play(journal, start(journal), 20)
+    journal.close()
+    with open(journal.journal_path, 'r+b') as f:
+        f.truncate(os.path.getsize(journal.journal_path) - 2)  # Torn last record
+    restored = CheckpointJournal("test", directory=os.path.dirname(journal.snapshot_path)).restore()
+    grid, score, counter = states[-2]
+    assert (restored['grid'] == grid).all()
+    assert (restored['score'], restored['moves_since_last_modulo_block']) == (score, counter)
+    assert restored['move_count'] == 10 + 19
+
+
+def test_garbled_record_ends_the_replay(journal):
+    states = play(journal, start(journal), 20)
+    journal.close()
+    with open(journal.journal_path, 'r+b') as f:
+        f.seek(-4 * 5 + 3, os.SEEK_END)  # Check byte of the fifth record from the end
+        f.write(b'\x00')
+    restored = CheckpointJournal("test", directory=os.path.dirname(journal.snapshot_path)).restore()
+    assert (restored['grid'] == states[14][0]).all()
+    assert restored['move_count'] == 10 + 15
+
+
+def test_journal_of_an_older_snapshot_is_ignored(journal):
+    grid = start(journal)
+    play(journal, grid, 5)
+    journal.close()
+    with open(journal.journal_path, 'rb') as f:
+        old_journal = f.read()
+    journal.snapshot(grid, 7, 3, 42, 1.0, 'GAME_OVER')
+    with open(journal.journal_path, 'wb') as f:
+        f.write(old_journal)
+    restored = CheckpointJournal("test", directory=os.path.dirname(journal.snapshot_path)).restore()
+    assert (restored['grid'] == grid).all()
+    assert (restored['score'], restored['move_count'], restored['state']) == (7, 42, 'GAME_OVER')
+
+
+def test_corrupted_snapshot_is_not_restored(journal):
+    start(journal)
+    journal.close()
+    with open(journal.snapshot_path, 'r+b') as f:
+        f.seek(20)
+        f.write(b'\xff')
+    assert CheckpointJournal("test", directory=os.path.dirname(journal.snapshot_path)).restore() is None
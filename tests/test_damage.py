@@ -0,0 +1,59 @@
+# test_damage.py
+
+import numpy as np
+from _damage import DamageTracker
+
+
+def covered(boxes, height, width):
+    mask = np.zeros((height, width), dtype=bool)
+    for x0, y0, x1, y1 in boxes:
+        assert 0 <= x0 < x1 <= width and 0 <= y0 < y1 <= height
+        mask[y0:y1, x0:x1] = True
+    return mask
+
+
+def test_first_frame_and_reset_send_everything():
+    tracker = DamageTracker(240, 240)
+    frame = np.zeros((240, 240, 3), dtype=np.uint8)
+    assert tracker.damage(frame) == [(0, 0, 240, 240)]
+    assert tracker.damage(frame) == []
+    tracker.reset()
+    assert tracker.damage(frame) == [(0, 0, 240, 240)]
+    assert tracker.frames == 3
+    assert tracker.pixels_sent == 2 * 240 * 240
+
+
+def test_windows_cover_every_change():
+    rng = np.random.default_rng(0)
+    tracker = DamageTracker(240, 200)
+    frame = rng.integers(0, 256, (200, 240, 3), dtype=np.uint8)
+    tracker.damage(frame)
+    for _ in range(50):
+        previous = frame.copy()
+        for _ in range(int(rng.integers(1, 6))):
+            x, y = (int(value) for value in rng.integers(0, 230, 2))
+            frame[y:y + int(rng.integers(1, 30)), x:x + int(rng.integers(1, 30))] = rng.integers(0, 256, 3)
+        boxes = tracker.damage(frame)
+        assert len(boxes) <= tracker.max_windows
+        changed = (frame != previous).any(axis=2)
+        assert not (changed & ~covered(boxes, 200, 240)).any()
+        for x0, y0, x1, y1 in boxes:
+            assert x0 % 16 == 0 and y0 % 16 == 0  # Windows are whole blocks, cut at the frame edge
+        assert (tracker.shown == frame).all()
+
+
+def test_nearby_changes_share_a_window():
+    tracker = DamageTracker(240, 240)
+    frame = np.zeros((240, 240, 3), dtype=np.uint8)
+    tracker.damage(frame)
+    frame[0, 0] = frame[0, 20] = 255  # Neighbouring blocks
+    frame[200, 200] = 255  # Far away: a window of its own
+    assert sorted(tracker.damage(frame)) == [(0, 0, 32, 16), (192, 192, 208, 208)]
+
+
+def test_many_changes_become_one_bounding_box():
+    tracker = DamageTracker(240, 240, max_windows=2, window_cost=0)
+    frame = np.zeros((240, 240, 3), dtype=np.uint8)
+    tracker.damage(frame)
+    frame[::48, ::48] = 255  # 25 separate blocks
+    assert tracker.damage(frame) == [(0, 0, 208, 208)]
@@ -0,0 +1,58 @@
+# test_display.py
+
+import numpy as np
+import pytest
+from PIL import Image
+from _display import FakePanel
+from _session import GameSession
+from spitest import AdafruitModel, check_transport
+
+
+def changed_frames(rng, count=20):
+    """A random first frame, then frames with a few small rectangles changed in each."""
+    frame = rng.integers(0, 256, (240, 240, 3), dtype=np.uint8)
+    yield frame.copy()
+    for _ in range(count):
+        for _ in range(int(rng.integers(1, 4))):
+            x, y = (int(value) for value in rng.integers(0, 220, 2))
+            frame[y:y + int(rng.integers(1, 40)), x:x + int(rng.integers(1, 40))] = rng.integers(0, 256, 3)
+        yield frame.copy()
+
+
+@pytest.mark.parametrize('rotation', [180, 0, 90, 270])
+def test_adafruit_windows_match_full_frames(tmp_path, rotation):
+    panel = FakePanel()
+    session = GameSession(AdafruitModel(panel, rotation=rotation), high_score_file=str(tmp_path / "high_score.txt"))
+    reference_panel = FakePanel()
+    reference = AdafruitModel(reference_panel, rotation=rotation)
+    for frame in changed_frames(np.random.default_rng(rotation)):
+        session.show_frame(frame)
+        reference.image(Image.fromarray(frame))
+        assert (panel.glass() == reference_panel.glass()).all()
+    assert session.windowed
+    assert session.damage.pixels_sent < 21 * 240 * 240 / 4  # Windows were sent, not whole frames
+
+
+def test_display_without_windows_gets_one_push_per_frame(tmp_path):
+    class WholeFrames:
+        width = 240
+        height = 240
+
+        def __init__(self):
+            self.pushes = 0
+
+        def image(self, image):
+            self.pushes += 1
+
+    disp = WholeFrames()
+    session = GameSession(disp, high_score_file=str(tmp_path / "high_score.txt"))
+    frames = changed_frames(np.random.default_rng(1), count=5)
+    session.show_frame(next(frames))
+    session.show_frame(next(frames))
+    assert disp.pushes == 2
+    assert not session.windowed
+
+
+@pytest.mark.parametrize('rotation', [0, 90, 180, 270])
+def test_spidev_transport_matches_adafruit(rotation):
+    assert check_transport(rotation, 20, np.random.default_rng(rotation))
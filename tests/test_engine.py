@@ -0,0 +1,109 @@
+# test_engine.py
+
+import numpy as np
+import pytest
+from _engine import BoardEngine, DIRECTIONS, MOVE_BITS
+from _pass import BoardEncoder
+from _rules import Rules
+
+encoder = BoardEncoder()
+
+
+def merge_tiles(tile1, tile2):
+    """The original game's merge rule, on (value, type) tiles: the merged tile, or None."""
+    if tile1[1] == 'normal' and tile2[1] == 'normal' and tile1[0] == tile2[0]:
+        return (tile1[0] * 2, 'normal')
+    if {tile1[1], tile2[1]} == {'normal', 'modulo'}:
+        normal, modulo = (tile1, tile2) if tile1[1] == 'normal' else (tile2, tile1)
+        result = normal[0] % modulo[0]
+        return (0, 'empty') if result == 0 else (result, 'normal')
+    return None
+
+
+def slide_left(row):
+    """The original compress / merge / compress of one row; returns (row, points)."""
+    tiles = [tile for tile in row if tile[1] != 'empty']
+    merged_row = []
+    score = 0
+    i = 0
+    while i < len(tiles):
+        merged = merge_tiles(tiles[i], tiles[i + 1]) if i + 1 < len(tiles) else None
+        if merged is not None:
+            merged_row.append(merged)
+            score += merged[0]
+            i += 2
+        else:
+            merged_row.append(tiles[i])
+            i += 1
+    merged_row = [tile for tile in merged_row if tile[1] != 'empty']
+    return merged_row + [(0, 'empty')] * (len(row) - len(merged_row)), score
+
+
+def reference_move(board, direction):
+    tiles = [[encoder.TILE_VALUES[code] for code in row] for row in board]
+    if direction in ('UP', 'DOWN'):
+        tiles = [list(column) for column in zip(*tiles)]
+    reverse = direction in ('RIGHT', 'DOWN')
+    score = 0
+    rows = []
+    for row in tiles:
+        new_row, points = slide_left(row[::-1] if reverse else row)
+        rows.append(new_row[::-1] if reverse else new_row)
+        score += points
+    if direction in ('UP', 'DOWN'):
+        rows = [list(column) for column in zip(*rows)]
+    return np.array([[encoder.TILE_INDEX[tile] for tile in row] for row in rows], dtype=np.uint8), score
+
+
+def random_boards(rng, size, count):
+    """Boards without 2048 tiles (2048 + 2048 has no code) and with plenty of equal neighbours."""
+    for _ in range(count):
+        codes = rng.choice([0, 0, 1, 2, 3, 4, 5, 10, 12, 13, 14, 15, 16], size * size)
+        yield codes.reshape(size, size).astype(np.uint8)
+
+
+@pytest.fixture(scope='module')
+def engines(tmp_path_factory):
+    cache_dir = str(tmp_path_factory.mktemp("tables"))
+    return {size: BoardEngine(size, cache_dir=cache_dir, rules=Rules()) for size in range(3, 7)}
+
+
+@pytest.mark.parametrize('size', [3, 4, 5, 6])
+def test_moves_match_original_merge_rules(engines, size):
+    engine = engines[size]
+    rng = np.random.default_rng(size)
+    for board in random_boards(rng, size, 300):
+        mask = 0
+        for direction in DIRECTIONS:
+            expected, expected_score = reference_move(board, direction)
+            new_board, changed, score = engine.move(board, direction)
+            assert (new_board == expected).all(), (board, direction)
+            assert score == expected_score
+            assert changed == (not (expected == board).all())
+            if changed:
+                mask |= MOVE_BITS[direction]
+        assert engine.legal_moves(board) == mask
+
+
+def test_move_events_count_modulo_merges(engines):
+    engine = engines[4]
+    board = np.zeros((4, 4), dtype=np.uint8)
+    board[0] = [2, 13, 3, 13]  # 4 % 4 clears, 8 % 4 clears
+    board[1] = [3, 15, 0, 0]  # 8 % 16 leaves an 8
+    board[2] = [1, 1, 12, 12]  # Normal merge; modulo blocks do not merge under classic rules
+    assert engine.move_events(board, 'LEFT') == (3, 2)
+    new_board, _, score = engine.move(board, 'LEFT')
+    assert new_board[0].tolist() == [0, 0, 0, 0]
+    assert new_board[1].tolist() == [3, 0, 0, 0]
+    assert new_board[2].tolist() == [2, 12, 12, 0]
+    assert score == 8 + 4
+
+
+def test_tables_are_cached(tmp_path):
+    built = BoardEngine(3, cache_dir=str(tmp_path), rules=Rules())
+    loaded = BoardEngine(3, cache_dir=str(tmp_path), rules=Rules())
+    assert (built.left_rows == loaded.left_rows).all()
+    assert (built.right_score == loaded.right_score).all()
+    modulo_merges = BoardEngine(3, cache_dir=str(tmp_path), rules=Rules(modulo_merges=True))
+    assert modulo_merges.rules_hash() != built.rules_hash()
+    assert modulo_merges.merge_table[12, 12] == 13
@@ -0,0 +1,88 @@
+# test_history.py
+
+import numpy as np
+from _history import GameHistory
+from _pass import BoardEncoder
+
+
+def board(size, seed):
+    return np.random.default_rng(seed).integers(0, 17, (size, size)).astype(np.uint8)
+
+
+def test_undo_returns_states_newest_first():
+    history = GameHistory(BoardEncoder())
+    assert history.record_size == 16
+    assert history.capacity == 1024
+    assert not history.can_undo() and history.undo(board(4, 0), 0, 0) is None
+    for move in range(5):
+        history.push(board(4, move), 100 * move, move, merges=move % 3, clears=move % 2)
+    for move in reversed(range(5)):
+        grid, score, counter, merges, clears = history.undo(board(4, move + 1), 100 * move + 100, move + 1)
+        assert (grid == board(4, move)).all()
+        assert (score, counter, merges, clears) == (100 * move, move, move % 3, move % 2)
+    assert history.undo(board(4, 0), 0, 0) is None
+
+
+def test_redo_replays_undone_moves_until_a_new_move():
+    history = GameHistory(BoardEncoder())
+    assert not history.can_redo() and history.redo(board(4, 0), 0, 0) is None
+    # States 0..3, with the move into state k making k merges and k % 2 clears
+    for move in range(3):
+        history.push(board(4, move), move, move, merges=move + 1, clears=(move + 1) % 2)
+    current = (board(4, 3), 3, 3)
+    for move in (2, 1):
+        state = history.undo(*current)
+        assert (state[0] == board(4, move)).all()
+        current = state[:3]
+    assert history.can_redo()
+    for move in (2, 3):
+        grid, score, counter, merges, clears = history.redo(*current)
+        assert (grid == board(4, move)).all()
+        assert (score, counter, merges, clears) == (move, move, move, move % 2)
+        current = (grid, score, counter)
+    assert not history.can_redo()
+
+    # Undo after redo still steps through every state; a new move drops the redo entries
+    assert history.undo(*current)[1] == 2
+    assert history.can_redo()
+    history.push(board(4, 9), 2, 2)
+    assert not history.can_redo()
+    assert [history.undo(board(4, 0), 0, 0)[1], history.undo(board(4, 0), 0, 0)[1]] == [2, 1]
+
+
+def test_full_history_drops_the_oldest_moves():
+    history = GameHistory(BoardEncoder(), grid_size=3, max_bytes=100)
+    assert history.capacity == 100 // history.record_size
+    moves = history.capacity + 7
+    for move in range(moves):
+        history.push(board(3, move), move, move % 64)
+    undone = []
+    while history.can_undo():
+        grid, score, _, _, _ = history.undo(board(3, 0), 0, 0)
+        assert (grid == board(3, score)).all()
+        undone.append(score)
+    assert undone == list(reversed(range(moves - history.capacity, moves)))
+
+    # Everything undone can be redone, and pushes and undos keep working from any ring position
+    redone = 0
+    while history.redo(board(3, 0), 0, 0) is not None:
+        redone += 1
+    assert redone == history.capacity
+    history.clear()
+    history.push(board(3, 1), 1, 1)
+    history.push(board(3, 2), 2, 2)
+    assert history.undo(board(3, 0), 0, 0)[1] == 2
+    history.push(board(3, 3), 3, 3)
+    assert [history.undo(board(3, 0), 0, 0)[1], history.undo(board(3, 0), 0, 0)[1],
+            history.undo(board(3, 0), 0, 0)] == [3, 1, None]
+
+
+def test_clear_and_large_boards():
+    history = GameHistory(BoardEncoder(), grid_size=6)
+    full = np.full((6, 6), 16, dtype=np.uint8)  # The largest board number still fits
+    history.push(full, 2 ** 32 - 1, 63, 255, 255)
+    grid, score, counter, merges, clears = history.undo(full, 0, 0)
+    assert (grid == full).all() and (score, counter, merges, clears) == (2 ** 32 - 1, 63, 255, 255)
+    history.push(full, 0, 0)
+    history.clear()
+    assert not history.can_undo() and not history.can_redo()
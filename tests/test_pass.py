@@ -0,0 +1,38 @@
+# test_pass.py
+
+import numpy as np
+import pytest
+from _pass import BoardEncoder
+
+encoder = BoardEncoder()
+
+
+@pytest.mark.parametrize('size, length', [(3, 10), (4, 11), (5, 18), (6, 25)])
+def test_code_passwords_round_trip(size, length):
+    assert encoder.password_length(size) == length
+    rng = np.random.default_rng(size)
+    boards = [np.zeros(size * size, dtype=np.uint8), np.full(size * size, encoder.MAX_TILE_INDEX, dtype=np.uint8)]
+    boards += [rng.integers(0, encoder.MAX_TILE_INDEX + 1, size * size).astype(np.uint8) for _ in range(200)]
+    for codes in boards:
+        password = encoder.save_codes_to_password(codes, size)
+        assert len(password) == length
+        assert encoder.number_to_codes(encoder.decode(password), size) == codes.tolist()
+
+
+def test_empty_board_password_is_padded():
+    assert encoder.encode(0) == 'A' * 10
+    assert encoder.save_codes_to_password([0] * 16) == 'A' * 11
+    assert encoder.decode('A' * 11) == 0
+
+
+def test_board_passwords_match_code_passwords():
+    codes = [0, 1, 12, 11, 16, 2, 0, 0, 3, 13, 4, 0, 5, 14, 10, 15]
+    board = encoder.number_to_board(encoder.codes_to_number(codes))
+    assert board[0][2] == {'value': 2, 'type': 'modulo'}
+    assert encoder.board_to_number(board) == encoder.codes_to_number(codes)
+    assert encoder.decode(encoder.save_board_to_password(board)) == encoder.codes_to_number(codes)
+
+
+def test_number_too_large_for_the_board():
+    with pytest.raises(ValueError):
+        encoder.number_to_codes((encoder.MAX_TILE_INDEX + 1) ** 9, 3)
@@ -0,0 +1,84 @@
+# test_saves.py
+
+import os
+import random
+import numpy as np
+import pytest
+from _saves import SaveStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # Move tables are cached in the working directory
+    store = SaveStore("test", directory=str(tmp_path / "saves"))
+    yield store
+    store.close()
+
+
+def save(store, slot, score, seed=0):
+    rng = random.Random(seed)
+    grid = np.array([rng.randrange(17) for _ in range(16)], dtype=np.uint8).reshape(4, 4)
+    store.save(slot, grid, score, score % 10, score // 2, score / 4, rng.getstate())
+    return grid, rng.getstate()
+
+
+def garble(store, offset):
+    data = bytearray(os.pread(store._fd, 1, offset))
+    data[0] ^= 0xFF
+    os.pwrite(store._fd, bytes(data), offset)
+
+
+def test_save_and_load_round_trip(store):
+    assert store.list_slots() == [None] * store.slots
+    grid, rng_state = save(store, 2, 1234, seed=5)
+    game = store.load(2)
+    assert (game['grid'] == grid).all()
+    assert (game['score'], game['moves_since_last_modulo_block'], game['move_count'], game['elapsed']) == \
+        (1234, 4, 617, 308.5)
+    assert game['rng_state'] == rng_state
+    assert store.load(3) is None
+    assert [slot is not None for slot in store.list_slots()] == [False, False, True] + [False] * 5
+
+
+def test_saves_alternate_copies(store):
+    save(store, 0, 10, seed=1)
+    save(store, 0, 20, seed=2)
+    assert store._current(0)[:2] == (2, 1)
+    assert store.load(0)['score'] == 20
+
+
+def test_torn_record_falls_back_to_the_previous_save(store):
+    first, _ = save(store, 0, 10, seed=1)
+    save(store, 0, 20, seed=2)
+    garble(store, store._record_offset(0, 1) + 30)  # The copy the index points at
+    game = store.load(0)
+    assert game['score'] == 10
+    assert (game['grid'] == first).all()
+
+
+def test_torn_index_is_rebuilt_from_the_records(store):
+    save(store, 0, 10, seed=1)
+    second, _ = save(store, 0, 20, seed=2)
+    garble(store, store._index_offset(0) + 8)
+    assert store.list_slots()[0][0] == 20
+    assert (store.load(0)['grid'] == second).all()
+
+
+def test_both_copies_torn(store):
+    save(store, 0, 10, seed=1)
+    save(store, 0, 20, seed=2)
+    garble(store, store._record_offset(0, 0) + 30)
+    garble(store, store._record_offset(0, 1) + 30)
+    assert store.load(0) is None
+
+
+def test_other_layout_is_moved_aside(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    directory = str(tmp_path / "saves")
+    store = SaveStore("test", directory=directory)
+    save(store, 0, 10)
+    store.close()
+    store = SaveStore("test", grid_size=3, directory=directory)
+    assert store.list_slots() == [None] * store.slots
+    assert os.path.exists(store.path + ".old")
+    store.close()
@@ -0,0 +1,139 @@
+# test_session.py
+
+import contextlib
+import io
+import numpy as np
+import pytest
+from _ntuple import NTupleNetwork
+from _saves import SaveStore
+from _session import GameSession, STATE_GAME, STATE_MAIN_MENU, STATE_SLOT_SAVE, HINT_COLOR
+from _tcache import TranspositionCache
+
+
+class Screen:
+    """Display stand-in that keeps the last whole frame."""
+    width = 240
+    height = 240
+
+    def __init__(self):
+        self.frame = None
+
+    def image(self, image):
+        self.frame = np.asarray(image)
+
+
+@pytest.fixture
+def make_session(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # Move tables are cached in the working directory
+
+    def make_session(**kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            session = GameSession(Screen(), high_score_file=str(tmp_path / "high_score.txt"), **kwargs)
+            session.start()
+            session.handle_events(['A'])
+        assert session.current_state == STATE_GAME
+        return session
+    return make_session
+
+
+def test_hint_is_shown_after_the_player_stops(make_session, tmp_path):
+    network = NTupleNetwork(4)
+    network.weights[:] = np.random.default_rng(0).normal(size=network.weights.shape)
+    cache = TranspositionCache(str(tmp_path / "eval_cache.bin"), slots=256, tag=network.fingerprint())
+    session = make_session(network=network, eval_cache=cache, hint_after=5)
+    direction = network.best_move(session.grid)[0]
+
+    session.tick(session.last_input + 1)
+    assert not (session.disp.frame == HINT_COLOR).all(axis=2).any()
+    session.tick(session.last_input + 5)
+    marked = (session.disp.frame == HINT_COLOR).all(axis=2)
+    assert marked.any()
+    ys, xs = np.nonzero(marked)
+    side = {'LEFT': xs.max() < 10, 'RIGHT': xs.min() > 230, 'UP': ys.max() < 10, 'DOWN': ys.min() > 230}
+    assert side[direction]
+    assert (session.frame != HINT_COLOR).any(axis=2).all()  # The board frame itself is not marked
+    assert cache.misses == 1
+
+    # A second cabinet on the same board is answered from the cache
+    other = make_session(network=network, eval_cache=cache)
+    other.grid = session.grid.copy()
+    other.moves_since_last_modulo_block = session.moves_since_last_modulo_block
+    assert other.hint() == direction
+    assert cache.hits == 1
+    cache.close()
+
+
+def test_no_hint_without_a_network(make_session):
+    session = make_session()
+    assert session.hint() is None
+    session.tick(session.last_input + 3600)
+    assert not (session.disp.frame == HINT_COLOR).all(axis=2).any()
+
+
+def play(session, moves):
+    """Makes up to moves grid-changing moves; returns the states before each one."""
+    states = []
+    for _ in range(moves):
+        for direction in ('LEFT', 'UP', 'RIGHT', 'DOWN'):
+            before = state(session)
+            with contextlib.redirect_stdout(io.StringIO()):
+                changed = session.handle_move(direction)
+            if changed:
+                states.append(before)
+                break
+    return states
+
+
+def state(session):
+    return (session.grid.copy(), session.score, session.move_count,
+            session.moves_since_last_modulo_block, session.game_modulo_merges)
+
+
+def same(first, second):
+    return (first[0] == second[0]).all() and first[1:] == second[1:]
+
+
+def test_undo_and_redo_during_play(make_session):
+    session = make_session()
+    states = play(session, 4)
+    assert len(states) == 4
+    final = state(session)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert session.undo_move() and session.undo_move()
+        assert same(state(session), states[2])
+        assert (session.disp.frame == session.frame).all()  # The rewound board is on screen
+        assert session.redo_move()
+        assert same(state(session), states[3])
+        assert session.redo_move()
+        assert same(state(session), final)
+        assert not session.redo_move()
+
+        # A new move drops the moves that were undone
+        assert session.undo_move()
+    play(session, 1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert not session.redo_move()
+    assert session.current_state == STATE_GAME
+
+
+def test_unreadable_save_slots_go_back_to_the_game(make_session, tmp_path):
+    store = SaveStore("test", directory=str(tmp_path / "saves"))
+    session = make_session(save_store=store)
+    board = session.frame.copy()
+    with contextlib.redirect_stdout(io.StringIO()):
+        session.handle_events(['C', 'down'])
+        assert session.current_state == STATE_SLOT_SAVE
+        session.handle_events(['up', 'up'])  # The selection wraps around the slots
+        assert session.slot_selection == store.slots - 1
+
+        session.handle_events(['B'])
+        store.close()  # list_slots() now fails
+        session.handle_events(['C', 'down'])
+        assert session.current_state == STATE_GAME and session.message_until
+        session.tick(session.message_until)
+    assert (session.disp.frame == board).all()  # The board is back once the message is over
+
+    session.current_state = STATE_MAIN_MENU
+    with contextlib.redirect_stdout(io.StringIO()):
+        session.handle_events(['C'])
+    assert session.current_state == STATE_MAIN_MENU
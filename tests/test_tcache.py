@@ -0,0 +1,118 @@
+# test_tcache.py
+
+import multiprocessing
+import numpy as np
+import pytest
+from _engine import DIRECTIONS
+from _ntuple import NTupleNetwork, load_hints
+from _tcache import TranspositionCache, PROBE_LIMIT
+
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # Move tables are cached in the working directory
+    return str(tmp_path / "eval_cache_{size}x{size}.bin")
+
+
+def board(seed):
+    return np.random.default_rng(seed).integers(0, 17, (4, 4)).astype(np.uint8)
+
+
+def test_put_and_get(cache_path):
+    cache = TranspositionCache(cache_path, slots=1024)
+    assert cache.path.endswith("eval_cache_4x4.bin")
+    assert cache.get(board(1), 3) is None
+    cache.put(board(1), 3, 12.5, 'LEFT', depth=2)
+    cache.put(board(2), 3, -1.0)
+    assert cache.get(board(1), 3) == (12.5, 'LEFT', 2)
+    assert cache.get(board(1), 4) is None  # The modulo counter is part of the key
+    assert cache.get(board(1), 3, min_depth=3) is None
+    assert cache.get(board(2), 3) == (-1.0, None, 0)
+    cache.put(board(1), 3, 20.0, 'UP', depth=3)  # Replaces the old entry
+    assert cache.get(board(1), 3) == (20.0, 'UP', 3)
+    assert (cache.hits, cache.misses) == (3, 3)
+    cache.close()
+
+
+def test_clock_eviction_spares_referenced_entries(cache_path):
+    cache = TranspositionCache(cache_path, slots=PROBE_LIMIT)  # Every key probes the whole table
+    boards = [board(seed) for seed in range(PROBE_LIMIT + 1)]
+    for index, grid in enumerate(boards[:PROBE_LIMIT]):
+        cache.put(grid, 0, float(index))
+    kept = [index for index in range(PROBE_LIMIT) if index % 2]
+    for index in kept:
+        assert cache.get(boards[index], 0) is not None  # Sets the reference bit
+    cache.put(boards[-1], 0, 99.0)
+    assert cache.get(boards[-1], 0)[0] == 99.0
+    stored = [index for index in range(PROBE_LIMIT) if cache.get(boards[index], 0) is not None]
+    assert len(stored) == PROBE_LIMIT - 1
+    assert set(kept) <= set(stored)  # The victim was an entry nobody had read
+    cache.close()
+
+
+def test_read_of_a_record_being_written_misses(cache_path):
+    cache = TranspositionCache(cache_path, slots=64)
+    cache.put(board(1), 0, 1.0, 'DOWN')
+    low, high = cache.key(board(1), 0)
+    offset = cache._offset(cache._slot(low, high))
+    seq = cache.SEQ.unpack_from(cache._mem, offset)[0]
+    cache.SEQ.pack_into(cache._mem, offset, seq + 1)  # A writer is half way through
+    assert cache.get(board(1), 0) is None
+    cache.SEQ.pack_into(cache._mem, offset, seq + 2)
+    assert cache.get(board(1), 0) == (1.0, 'DOWN', 0)
+    cache.close()
+
+
+def write_many(path, count):
+    cache = TranspositionCache(path, slots=64)
+    for index in range(count):
+        cache.put(board(1), 0, float(index), DIRECTIONS[index % 4], depth=index % 200)
+    cache.close()
+
+
+def test_reads_during_concurrent_writes_are_never_torn(cache_path):
+    cache = TranspositionCache(cache_path, slots=64)
+    writer = multiprocessing.get_context('fork').Process(target=write_many, args=(cache_path, 20000))
+    writer.start()
+    while writer.is_alive():
+        entry = cache.get(board(1), 0)
+        if entry is not None:
+            value, move, depth = entry
+            assert (move, depth) == (DIRECTIONS[int(value) % 4], int(value) % 200)
+    writer.join()
+    assert writer.exitcode == 0
+    assert cache.get(board(1), 0) == (19999.0, DIRECTIONS[19999 % 4], 19999 % 200)
+    cache.close()
+
+
+def test_entries_survive_a_reopen(cache_path):
+    cache = TranspositionCache(cache_path, slots=256, tag="net1")
+    cache.put(board(5), 7, 3.0, 'RIGHT')
+    cache.close()
+    cache = TranspositionCache(cache_path, slots=256, tag="net1")
+    assert cache.get(board(5), 7) == (3.0, 'RIGHT', 0)
+    cache.close()
+    cache = TranspositionCache(cache_path, slots=256, tag="net2")  # Another network starts over
+    assert cache.get(board(5), 7) is None
+    cache.close()
+
+
+def test_hints_fill_and_read_the_shared_cache(cache_path, tmp_path):
+    network = NTupleNetwork(4)
+    network.weights[:] = np.random.default_rng(0).normal(size=network.weights.shape)
+    network_path = str(tmp_path / "networks" / "modulo_{size}x{size}")
+    network.save(network_path.format(size=4))
+    loaded, cache = load_hints(4, network_path, cache_path)
+    assert loaded.fingerprint() == network.fingerprint()
+    grid = board(3)
+    direction = loaded.hint(grid, 2, cache)
+    assert direction == network.best_move(grid)[0]
+    assert (cache.hits, cache.misses) == (0, 1)
+    cache.close()
+
+    # Another process (or a restart) gets the move from the cache
+    _, cache = load_hints(4, network_path, cache_path)
+    assert loaded.hint(grid, 2, cache) == direction
+    assert cache.hits == 1
+    cache.close()
+    assert load_hints(5, network_path, cache_path) == (None, None)
@@ -0,0 +1,148 @@
+# train.py
+#
+# Trains an n-tuple value network for Modulo 2048 by TD self-play. Worker
+# processes each play a share of every round on a copy of the weights; their
+# weight changes are averaged into the master weights, which are checkpointed
+# as a memory-mappable .npy file after every round.
+#
+# With --eval-games N the workers then play N greedy games with the trained
+# network through the shared evaluation cache (the same file the game's hints
+# read, see _tcache.py), so the cabinets start with a warm cache.
+#
+# Usage: python train.py [--size 4] [--rounds 100] [--games 200] [--workers N]
+#                        [--alpha 0.0025] [--lambda 0.5] [--out networks/modulo_4x4]
+#                        [--rules rules.json] [--eval-games 0] [--cache tables/eval_cache_4x4.bin]
+
+import argparse
+import multiprocessing
+import os
+import time
+import traceback # For exception tracing
+import sys  # For exception tracing
+import numpy as np # Weight deltas
+from _ntuple import NTupleNetwork, NETWORK_FILE, LEARNING_RATE, TD_LAMBDA, play_episode
+from _tcache import CACHE_FILE  # Evaluation cache shared with the game's hints
+from _engine import set_rules
+from _rules import load_rules, RULES_FILE
+
+
+def self_play(task):
+    """
+    Worker: plays games on a private copy of the weights and returns the change.
+
+    Args:
+        task (tuple): (weights path, size, games, alpha, lambda, seed)
+
+    Returns:
+        tuple: (weight delta, list of game results)
+    """
+    path, size, games, alpha, td_lambda, seed = task
+    start = np.load(path)  # Private, writable copy
+    network = NTupleNetwork(size, weights=start.copy())
+    rng = np.random.default_rng(seed)
+    results = [play_episode(network, rng, alpha, td_lambda) for _ in range(games)]
+    return network.weights - start, results
+
+
+def evaluate(task):
+    """
+    Worker: plays greedy games with the saved network through the shared evaluation cache.
+
+    Args:
+        task (tuple): (network path, cache path, games, seed)
+
+    Returns:
+        tuple: (list of game results, cache hits, cache misses)
+    """
+    path, cache_path, games, seed = task
+    network = NTupleNetwork.load(path)  # Memory-mapped: the workers share one copy of the weights
+    cache = network.open_cache(cache_path)
+    try:
+        rng = np.random.default_rng(seed)
+        results = [play_episode(network, rng, learn=False, cache=cache) for _ in range(games)]
+        return results, cache.hits, cache.misses
+    finally:
+        cache.close()
+
+
+def evaluate_network(out, cache_path, games, workers):
+    started = time.time()
+    share = [games // workers + (1 if k < games % workers else 0) for k in range(workers)]
+    seed = int(time.time())
+    tasks = [(out, cache_path, count, seed + k) for k, count in enumerate(share) if count]
+    results = []
+    hits = misses = 0
+    with multiprocessing.Pool(workers) as pool:
+        for worker_results, worker_hits, worker_misses in pool.imap_unordered(evaluate, tasks):
+            results.extend(worker_results)
+            hits += worker_hits
+            misses += worker_misses
+    scores = [result['score'] for result in results]
+    wins = sum(result['won'] for result in results)
+    print(f"Evaluation: {len(results)} games, mean score {np.mean(scores):.0f}, max {max(scores)}, wins {wins}, "
+          f"cache hit rate {100.0 * hits / max(hits + misses, 1):.1f}%, {time.time() - started:.1f} s")
+
+
+def train(size, rounds, games, workers, alpha, td_lambda, out):
+    if os.path.exists(out + ".npy"):
+        network = NTupleNetwork.load(out, mmap=False)
+        network.weights = np.array(network.weights)
+        print(f"Resuming from {out}.npy.")
+    else:
+        network = NTupleNetwork(size)
+    # Workers read the round's starting weights from this file
+    snapshot_path = out + ".round.npy"
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    seed = int(time.time())
+    total_games = 0
+
+    with multiprocessing.Pool(workers) as pool:
+        for round_index in range(rounds):
+            started = time.time()
+            np.save(snapshot_path, network.weights)
+            share = [games // workers + (1 if k < games % workers else 0) for k in range(workers)]
+            tasks = [(snapshot_path, size, count, alpha, td_lambda, seed + round_index * workers + k)
+                     for k, count in enumerate(share) if count]
+            results = []
+            deltas = []
+            for delta, worker_results in pool.imap_unordered(self_play, tasks):
+                deltas.append(delta)
+                results.extend(worker_results)
+            # Merge: average of the workers' changes
+            network.weights += np.mean(deltas, axis=0, dtype=np.float32)
+            total_games += len(results)
+            network.save(out, games=total_games)
+
+            scores = [result['score'] for result in results]
+            wins = sum(result['won'] for result in results)
+            best_tile = max(result['max_tile'] for result in results)
+            print(f"Round {round_index + 1}/{rounds}: {len(results)} games, mean score {np.mean(scores):.0f}, "
+                  f"max {max(scores)}, best tile {best_tile}, wins {wins}, {time.time() - started:.1f} s")
+    os.remove(snapshot_path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train a Modulo 2048 n-tuple network by TD self-play.")
+    parser.add_argument('--size', type=int, default=4, help="board size (3-6)")
+    parser.add_argument('--rounds', type=int, default=100, help="merge rounds")
+    parser.add_argument('--games', type=int, default=200, help="self-play games per round")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument('--alpha', type=float, default=LEARNING_RATE, help="learning rate")
+    parser.add_argument('--lambda', dest='td_lambda', type=float, default=TD_LAMBDA, help="TD(lambda); 0 for TD(0)")
+    parser.add_argument('--out', default=None, help="checkpoint path without extension")
+    parser.add_argument('--rules', default=RULES_FILE, help="rules file (classic rules if it does not exist)")
+    parser.add_argument('--eval-games', type=int, default=0, help="greedy games played through the cache after training")
+    parser.add_argument('--cache', default=CACHE_FILE, help="evaluation cache shared with the game's hints")
+    args = parser.parse_args()
+    set_rules(load_rules(args.rules))  # Before the workers fork, so they play the same variant
+    out = args.out or NETWORK_FILE.format(size=args.size)
+    try:
+        if args.rounds:
+            train(args.size, args.rounds, args.games, args.workers, args.alpha, args.td_lambda, out)
+        if args.eval_games:
+            evaluate_network(out, args.cache, args.eval_games, args.workers)
+    except KeyboardInterrupt:
+        print("Training stopped; the last round is saved.")
+    except Exception as e:
+        print("Unexpected error:", e)
+        traceback.print_exc(file=sys.stdout)